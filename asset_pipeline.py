@@ -0,0 +1,306 @@
+"""
+Batch asset pipeline for the app logo, launcher icons and splash images.
+
+Replaces crop_logo.py, create_padded_logo.py and resize_icon.py. Every source listed in the
+manifest is decoded once, and crop -> pad -> resize is applied in memory for all of its outputs
+(including every Android density), so the PNG is no longer decoded and re-encoded at each step.
+
+Manifest (JSON, paths relative to the repository root):
+
+    {
+      "sources": [
+        {
+          "source": "assets/images/app_logo_blue_void_right.png",
+          "outputs": [
+            {"path": "assets/images/app_logo_blue_void_right_tight.png"},
+            {"path": "assets/images/app_logo_blue_void_right_padded.png", "padding_factor": 0.6, "square": true},
+            {"path": "assets/images/app_logo_blue_void_right_70.png", "content_ratio": 0.7, "square": true}
+          ]
+        }
+      ]
+    }
+
+The launcher icons and splash drawables under android/ are not in the manifest: flutter_launcher_icons
+and flutter_native_splash (configured in pubspec.yaml) generate them from the _70 and _padded outputs.
+
+    python asset_pipeline.py
+    dart run flutter_launcher_icons
+    dart run flutter_native_splash:create
+
+Source options:
+- crop: {"white_threshold": N, "alpha_threshold": N} crops to the content box before padding
+  (see content_bbox). Without it the whole source is used, which is how the committed logo
+  assets are framed (the logo source has an opaque white background).
+
+Output options:
+- padding_factor: transparent padding on each side, relative to the cropped size (create_padded_logo.py)
+- content_ratio: canvas size so the cropped content fills this ratio of it (resize_icon.py)
+- square: center the content on a square canvas
+- size: final size of the longest side in px at base_density (default mdpi)
+- densities: "android" (mdpi..xxxhdpi) or a list of density names; {density} in path is replaced
+
+Outputs are skipped when neither the source nor the output options changed since the last run
+(tracked in a cache file next to the manifest), and files whose pixels already match the rendered
+output are not rewritten.
+
+Requires Pillow and NumPy:  pip install pillow numpy
+
+    python asset_pipeline.py --manifest assets/asset_manifest.json --jobs 4 --force
+"""
+import argparse
+import hashlib
+import io
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+# Bump when rendering changes so cached outputs are regenerated.
+PIPELINE_VERSION = 1
+
+DEFAULT_MANIFEST = os.path.join("assets", "asset_manifest.json")
+CACHE_FILENAME = ".asset_pipeline_cache.json"
+
+# Android density scale factors relative to mdpi.
+ANDROID_DENSITIES = {
+    "mdpi": 1.0,
+    "hdpi": 1.5,
+    "xhdpi": 2.0,
+    "xxhdpi": 3.0,
+    "xxxhdpi": 4.0,
+}
+
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return sha256_bytes(f.read())
+
+
+def same_pixels(path, data):
+    """
+    True if the PNG at path decodes to the same RGBA pixels as the PNG bytes in data.
+    Files written by other encoders (or the old scripts) then count as up to date.
+    """
+    if not os.path.exists(path):
+        return False
+    with Image.open(path) as existing, Image.open(io.BytesIO(data)) as rendered:
+        if existing.size != rendered.size:
+            return False
+        return existing.convert("RGBA").tobytes() == rendered.convert("RGBA").tobytes()
+
+
+def content_bbox(pixels, white_threshold=0, alpha_threshold=0):
+    """
+    Returns the (left, top, right, bottom) box of pixels that are neither transparent nor white,
+    or None if the image has no such pixels.
+
+    pixels is an RGBA uint8 array. A pixel counts as white when every RGB channel is at least
+    255 - white_threshold, and as transparent when its alpha is at most alpha_threshold.
+    """
+    visible = pixels[..., 3] > alpha_threshold
+    white = (pixels[..., :3] >= 255 - white_threshold).all(axis=-1)
+    mask = visible & ~white
+    rows = np.flatnonzero(mask.any(axis=1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(mask.any(axis=0))
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def pad(pixels, padding_factor=None, content_ratio=None, square=False):
+    """
+    Centers pixels on a larger transparent canvas.
+
+    padding_factor adds int(side * factor) on each side, content_ratio sizes the canvas so the
+    content fills that ratio of it, and square makes the canvas square using the longer side.
+    The content is copied as-is, so semi-transparent edges keep their original alpha.
+    """
+    height, width = pixels.shape[:2]
+    content_w, content_h = (max(width, height),) * 2 if square else (width, height)
+
+    if padding_factor is not None:
+        canvas_w = content_w + 2 * int(content_w * padding_factor)
+        canvas_h = content_h + 2 * int(content_h * padding_factor)
+    elif content_ratio is not None:
+        canvas_w = int(math.ceil(content_w / content_ratio))
+        canvas_h = int(math.ceil(content_h / content_ratio))
+    else:
+        canvas_w, canvas_h = content_w, content_h
+
+    if (canvas_w, canvas_h) == (width, height):
+        return pixels
+    canvas = np.zeros((canvas_h, canvas_w, 4), dtype=np.uint8)
+    x = (canvas_w - width) // 2
+    y = (canvas_h - height) // 2
+    canvas[y:y + height, x:x + width] = pixels
+    return canvas
+
+
+def density_sizes(size, densities, base_density="mdpi"):
+    """
+    Expands a base size into {density: px}. Sizes are truncated like flutter_native_splash does
+    (858 at xxxhdpi -> 643 at xxhdpi).
+    """
+    names = list(ANDROID_DENSITIES) if densities == "android" else list(densities)
+    base_scale = ANDROID_DENSITIES[base_density]
+    return {name: int(size * ANDROID_DENSITIES[name] / base_scale) for name in names}
+
+
+def expand_outputs(outputs):
+    """
+    Turns manifest output entries into (path, options) pairs, one per density.
+    options keeps only what affects rendering and becomes part of the cache key.
+    """
+    expanded = []
+    for output in outputs:
+        options = {key: output[key] for key in ("padding_factor", "content_ratio", "square") if key in output}
+        densities = output.get("densities")
+        if densities:
+            sizes = density_sizes(output["size"], densities, output.get("base_density", "mdpi"))
+            for density, size in sizes.items():
+                expanded.append((output["path"].format(density=density), dict(options, size=size)))
+        else:
+            if "size" in output:
+                options["size"] = output["size"]
+            expanded.append((output["path"], options))
+    return expanded
+
+
+def render(pixels, options):
+    """
+    Applies pad -> resize to an RGBA array (already cropped if the source asks for it) and returns the PNG bytes.
+    """
+    padded = pad(pixels, options.get("padding_factor"), options.get("content_ratio"), options.get("square", False))
+    img = Image.fromarray(padded, "RGBA")
+    size = options.get("size")
+    if size:
+        scale = size / max(img.size)
+        target = (max(1, round(img.size[0] * scale)), max(1, round(img.size[1] * scale)))
+        if target != img.size:
+            # Pillow resizes RGBA with premultiplied alpha, so transparent edges do not bleed color.
+            img = img.resize(target, Image.LANCZOS)
+    out = io.BytesIO()
+    img.save(out, "PNG")
+    return out.getvalue()
+
+
+def cache_key(source_digest, crop, options):
+    spec = json.dumps({"version": PIPELINE_VERSION, "crop": crop, "options": options}, sort_keys=True)
+    return sha256_bytes(f"{source_digest}:{spec}".encode("utf-8"))
+
+
+def process_source(entry, root, cache, force=False, dry_run=False):
+    """
+    Renders every output of one manifest entry. The source is decoded at most once, and not at all
+    when every output is up to date. Returns a list of (path, key, digest, status) tuples with
+    status 'written', 'unchanged' (rendered pixels matched the file) or 'skipped' (cache hit).
+    """
+    source_path = os.path.join(root, entry["source"])
+    with open(source_path, "rb") as f:
+        source_bytes = f.read()
+    source_digest = sha256_bytes(source_bytes)
+    crop = entry.get("crop")
+
+    pending = []
+    results = []
+    for path, options in expand_outputs(entry["outputs"]):
+        key = cache_key(source_digest, crop, options)
+        cached = cache.get(path)
+        full_path = os.path.join(root, path)
+        if not force and cached and cached["key"] == key and sha256_file(full_path) == cached["sha256"]:
+            results.append((path, key, cached["sha256"], "skipped"))
+        else:
+            pending.append((path, options, key))
+
+    if not pending:
+        return results
+
+    pixels = np.asarray(Image.open(io.BytesIO(source_bytes)).convert("RGBA"))
+    if crop is not None:
+        bbox = content_bbox(pixels, crop.get("white_threshold", 0), crop.get("alpha_threshold", 0))
+        if bbox is None:
+            raise ValueError(f"{entry['source']}: no content found (image is empty or all white/transparent)")
+        left, top, right, bottom = bbox
+        pixels = pixels[top:bottom, left:right]
+
+    for path, options, key in pending:
+        data = render(pixels, options)
+        digest = sha256_bytes(data)
+        full_path = os.path.join(root, path)
+        existing_digest = sha256_file(full_path)
+        if existing_digest == digest:
+            status = "unchanged"
+        elif existing_digest is not None and same_pixels(full_path, data):
+            # Keep the existing file; cache its digest so the next run skips it.
+            status = "unchanged"
+            digest = existing_digest
+        else:
+            status = "written"
+            if not dry_run:
+                os.makedirs(os.path.dirname(full_path) or ".", exist_ok=True)
+                with open(full_path, "wb") as f:
+                    f.write(data)
+        results.append((path, key, digest, status))
+    return results
+
+
+def load_manifest(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_cache(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def run(manifest_path=DEFAULT_MANIFEST, root=".", jobs=None, force=False, dry_run=False):
+    """
+    Processes every source in the manifest in parallel (one process per source) and returns
+    {output path: status}. The cache file next to the manifest is updated unless dry_run is set.
+    """
+    manifest = load_manifest(manifest_path)
+    cache_path = os.path.join(os.path.dirname(manifest_path), CACHE_FILENAME)
+    cache = load_cache(cache_path)
+    entries = manifest["sources"]
+
+    statuses = {}
+    with ProcessPoolExecutor(max_workers=jobs or min(len(entries), os.cpu_count() or 1) or 1) as pool:
+        futures = [pool.submit(process_source, entry, root, cache, force, dry_run) for entry in entries]
+        for entry, future in zip(entries, futures):
+            for path, key, digest, status in future.result():
+                statuses[path] = status
+                if status != "skipped":
+                    cache[path] = {"key": key, "sha256": digest, "source": entry["source"]}
+
+    if not dry_run:
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2, sort_keys=True)
+    return statuses
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crop, pad and resize app assets listed in a manifest")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    parser.add_argument("--root", default=".", help="directory the manifest paths are relative to")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: one per source, up to CPUs)")
+    parser.add_argument("--force", action="store_true", help="ignore the cache and render every output")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing files")
+    args = parser.parse_args()
+
+    statuses = run(args.manifest, args.root, args.jobs, args.force, args.dry_run)
+    for path, status in sorted(statuses.items()):
+        print(f"{status:<9} {path}")
+    counts = {s: sum(1 for v in statuses.values() if v == s) for s in ("written", "unchanged", "skipped")}
+    print(f"{counts['written']} written, {counts['unchanged']} unchanged, {counts['skipped']} skipped")
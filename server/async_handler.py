@@ -0,0 +1,386 @@
+"""
+analyze_crashed_car의 asyncio 버전.
+
+동기 핸들러는 이벤트마다 스레드 하나가 메타데이터 조회, 다운로드, /predict 호출을 차례로 기다립니다.
+이 모듈은 같은 파이프라인을 하나의 이벤트 루프에서 처리합니다.
+- GCS JSON API와 AI 서비스를 커넥션 풀이 있는 aiohttp 세션 하나로 호출합니다.
+- 빠진 메타데이터 조회, 이미지 다운로드, ID Token 발급을 동시에 진행합니다.
+  다운로드는 중복/캐시 확인 전에 미리 시작하고, 필요 없어지면 취소합니다.
+- 멱등성 장부, 예측 캐시, 결과 저장소, 이미지 정규화는 main과 같은 객체를 스레드 풀에서 호출합니다.
+
+배포: functions-framework --source=async_handler.py --target=analyze_crashed_car_async
+(requirements-async.txt 필요. STORAGE_EMULATOR_HOST가 있으면 그 주소를 GCS 대신 사용)
+"""
+import asyncio
+import os
+import threading
+from urllib.parse import quote
+
+import aiohttp
+import functions_framework
+
+import main
+import tracing
+from gcs_objects import describe_event
+from http_client import RETRYABLE_STATUS, CircuitOpenError, parse_retry_after
+from idempotency import CLAIMED, COMPLETED, ClaimInProgressError, event_key, new_owner, object_key
+from prediction_cache import cache_key
+from results_sink import result_doc_id
+from tracing import traced
+
+# GCS JSON API 주소 (에뮬레이터/로컬 대역을 쓰면 인증 없이 호출)
+STORAGE_EMULATOR_HOST = os.environ.get("STORAGE_EMULATOR_HOST")
+STORAGE_API_URL = (STORAGE_EMULATOR_HOST or "https://storage.googleapis.com").rstrip('/')
+# aiohttp 커넥션 풀 크기 (GCS와 AI 서비스 합계)
+ASYNC_POOL_SIZE = int(os.environ.get("ASYNC_POOL_SIZE", 100))
+# 중복/캐시 확인 전에 다운로드를 미리 시작할지 여부
+ASYNC_SPECULATIVE_DOWNLOAD = os.environ.get("ASYNC_SPECULATIVE_DOWNLOAD", "1") == "1"
+
+_STORAGE_SCOPE = "https://www.googleapis.com/auth/devstorage.read_only"
+
+
+class StorageToken:
+    """
+    GCS 호출용 OAuth 액세스 토큰. 만료되었을 때만 스레드 풀에서 갱신하며, 동시 갱신은 하나로 합칩니다.
+    에뮬레이터를 쓰면 토큰을 붙이지 않습니다.
+    """
+
+    def __init__(self, emulator=None):
+        self.emulator = STORAGE_EMULATOR_HOST if emulator is None else emulator
+        self._credentials = None
+        self._lock = asyncio.Lock()
+
+    async def header(self):
+        if self.emulator:
+            return {}
+        async with self._lock:
+            if self._credentials is None or not self._credentials.valid:
+                await asyncio.to_thread(self._refresh)
+        return {'Authorization': f"Bearer {self._credentials.token}"}
+
+    def _refresh(self):
+        import google.auth
+        import google.auth.transport.requests
+
+        if self._credentials is None:
+            self._credentials, _ = google.auth.default(scopes=[_STORAGE_SCOPE])
+        self._credentials.refresh(google.auth.transport.requests.Request())
+
+
+class AsyncStorage:
+    """
+    GCS JSON API의 fields 제한 메타데이터 조회와 미디어 다운로드.
+    """
+
+    def __init__(self, session, token, base_url=None):
+        self._session = session
+        self._token = token
+        self.base_url = base_url or STORAGE_API_URL
+
+    def _object_url(self, bucket, name):
+        return f"{self.base_url}/storage/v1/b/{quote(bucket, safe='')}/o/{quote(name, safe='')}"
+
+    async def fetch_fields(self, bucket, name, fields, generation=None):
+        params = {'projection': 'noAcl', 'fields': ','.join(fields)}
+        if generation is not None:
+            params['generation'] = str(generation)
+        async with self._session.get(self._object_url(bucket, name), params=params,
+                                     headers=await self._token.header()) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def download(self, bucket, name, generation=None):
+        """
+        (bytes, 응답의 generation)을 반환합니다. generation을 모를 때 받은 버전을 확인하는 데 씁니다.
+        """
+        params = {'alt': 'media'}
+        if generation is not None:
+            params['generation'] = str(generation)
+        async with self._session.get(self._object_url(bucket, name), params=params,
+                                     headers=await self._token.header()) as response:
+            response.raise_for_status()
+            data = await response.read()
+            return data, response.headers.get('x-goog-generation')
+
+
+class AsyncAIClient:
+    """
+    AIServiceClient와 같은 타임아웃/재시도/서킷 브레이커 설정으로 /predict를 호출하는 비동기 클라이언트.
+    브레이커와 ID Token 캐시는 동기 클라이언트와 공유합니다.
+    """
+
+    def __init__(self, session, sync_client):
+        self._session = session
+        self.sync = sync_client
+
+    async def _headers(self):
+        provider = self.sync.token_provider
+        if provider is None:
+            return {}
+        with tracing.stage('token'):
+            token = await asyncio.to_thread(provider.get, self.sync.base_url)
+        return {'Authorization': f"Bearer {token}"}
+
+    async def predict(self, filename, image_bytes, mime_type, fields):
+        def build_form():
+            form = aiohttp.FormData()
+            for name, value in fields.items():
+                form.add_field(name, str(value))
+            form.add_field('file', image_bytes, filename=filename, content_type=mime_type)
+            return form
+
+        sync = self.sync
+        timeout = aiohttp.ClientTimeout(sock_connect=sync.connect_timeout, sock_read=sync.read_timeout)
+        refreshed_token = False
+        attempt = 0
+
+        while True:
+            # 토큰 발급은 브레이커 밖에서 합니다. (AIServiceClient._send와 같은 이유)
+            headers = await self._headers()
+            form = build_form()
+            if not sync.breaker.allow():
+                raise CircuitOpenError(f"AI service circuit is open; rejecting request to {sync.predict_url}")
+
+            recorded = False
+            try:
+                async with self._session.post(sync.predict_url, data=form, headers=headers,
+                                              timeout=timeout) as response:
+                    status = response.status
+                    # 아래의 모든 분기가 브레이커에 결과를 남깁니다.
+                    recorded = True
+                    if status == 401 and sync.token_provider is not None and not refreshed_token:
+                        # 캐시된 토큰이 거부되면 한 번만 새로 발급받아 재시도
+                        refreshed_token = True
+                        tracing.add('token_refreshes')
+                        sync.breaker.record_success()
+                        sync.token_provider.invalidate(sync.base_url)
+                        continue
+
+                    if status not in RETRYABLE_STATUS:
+                        if status >= 500:
+                            sync.breaker.record_failure()
+                        else:
+                            sync.breaker.record_success()
+                        response.raise_for_status()
+                        return await response.json(content_type=None)
+
+                    sync.breaker.record_failure()
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    if attempt >= sync.max_retries or (retry_after is not None and retry_after > sync.backoff_max):
+                        response.raise_for_status()
+                    delay = sync._backoff(attempt)
+                    if retry_after is not None:
+                        delay = max(delay, retry_after)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                sync.breaker.record_failure()
+                if attempt >= sync.max_retries:
+                    raise
+                delay = sync._backoff(attempt)
+            except BaseException:
+                # 응답 상태를 받기 전에 끝난 시도(ClientPayloadError, 취소 등)도 실패로 기록해
+                # half-open 시험 요청이 결과 없이 남지 않게 합니다.
+                if not recorded:
+                    sync.breaker.record_failure()
+                raise
+
+            attempt += 1
+            tracing.add('retries')
+            print(f"Retrying AI request in {delay:.2f}s (attempt {attempt}/{sync.max_retries})")
+            await asyncio.sleep(delay)
+
+
+class AsyncPipeline:
+    """
+    이벤트 루프 하나와 그 루프에 묶인 aiohttp 세션. 세션은 루프 안에서 처음 쓸 때 만듭니다.
+    """
+
+    def __init__(self, pool_size=None):
+        self.pool_size = pool_size or ASYNC_POOL_SIZE
+        self._session = None
+        self.storage = None
+        self.ai = None
+
+    async def ensure_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self.storage = AsyncStorage(self._session, StorageToken())
+            self.ai = AsyncAIClient(self._session, main.ai_client)
+        return self
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+pipeline = AsyncPipeline()
+
+
+async def _blocking(func, *args):
+    # 장부/캐시/저장소는 Firestore 백엔드일 때 블로킹 I/O이므로 스레드 풀에서 실행합니다.
+    return await asyncio.to_thread(func, *args)
+
+
+def _cancel(*tasks):
+    for task in tasks:
+        if task is not None and not task.done():
+            task.cancel()
+
+
+@traced('analyze_crashed_car_async')
+async def analyze_event_async(cloud_event):
+    """
+    analyze_crashed_car와 같은 단계(검증 → 중복 확인 → 캐시 → 다운로드/정규화/추론 → 저장)를 비동기로 처리합니다.
+    """
+    data = cloud_event.data
+    event_id = cloud_event["id"]
+    tracing.set_fields(event_id=event_id, event_type=cloud_event["type"])
+
+    try:
+        descriptor = describe_event(data)
+    except ValueError as e:
+        print(f"Error: {e}")
+        tracing.skip('unparsable_resource')
+        return
+    bucket_name = descriptor.bucket_name
+    file_name = descriptor.name
+    tracing.set_fields(source=descriptor.source, bucket=bucket_name, object=file_name)
+    if not bucket_name or not file_name:
+        print("Error: Bucket or Name not found in event data.")
+        tracing.skip('missing_object_name')
+        return
+
+    file_basename, uid = main.check_target(file_name, descriptor.content_type or "image/unknown")
+    if not uid:
+        return
+
+    owner = new_owner()
+    claimed_keys = [event_key(event_id)]
+    with tracing.stage('claim'):
+        status = await _blocking(main.event_ledger.claim, claimed_keys[0], owner)
+    if status == COMPLETED:
+        print(f"Skipping duplicate event {event_id} ({status})")
+        tracing.skip(f'duplicate_event_{status}')
+        return
+    if status != CLAIMED:
+        raise ClaimInProgressError(f"Event {event_id} is still being processed by another run")
+
+    await pipeline.ensure_session()
+    storage = pipeline.storage
+    known_generation = descriptor.resource.get('generation')
+    missing = descriptor.missing_fields()
+    use_ai = main.AI_SERVICE_URL and "YOUR_AI_SERVICE_URL_HERE" not in main.AI_SERVICE_URL
+
+    # 빠진 메타데이터 조회, 다운로드, ID Token 발급을 동시에 시작
+    fetch_task = asyncio.create_task(storage.fetch_fields(bucket_name, file_name, missing, known_generation)) \
+        if missing else None
+    download_task = asyncio.create_task(storage.download(bucket_name, file_name, known_generation)) \
+        if ASYNC_SPECULATIVE_DOWNLOAD else None
+    if use_ai and main.ai_client.token_provider is not None:
+        main.token_provider.prefetch(main.AI_SERVICE_URL)
+
+    try:
+        if fetch_task is not None:
+            with tracing.stage('resolve'):
+                descriptor.resource.update(await fetch_task)
+            descriptor.fetched_fields = tuple(missing)
+        tracing.set_fields(fetched_fields=list(descriptor.fetched_fields))
+        generation = descriptor.generation
+
+        object_claim = object_key(bucket_name, file_name, generation)
+        with tracing.stage('claim'):
+            status = await _blocking(main.event_ledger.claim, object_claim, owner)
+        if status == COMPLETED:
+            _cancel(download_task)
+            print(f"Skipping {file_name} generation {generation}: already {status} by another event")
+            await _blocking(main.event_ledger.complete, claimed_keys[0], owner)
+            tracing.skip(f'duplicate_object_{status}')
+            return
+        if status != CLAIMED:
+            raise ClaimInProgressError(f"{file_name} generation {generation} is still being processed by another event")
+        claimed_keys.append(object_claim)
+
+        car_model = descriptor.car_model
+        result_key = cache_key(descriptor.content_hash, car_model, uid)
+        with tracing.stage('cache_lookup'):
+            prediction_result = await _blocking(main.prediction_cache.get, result_key)
+        if prediction_result is not None:
+            _cancel(download_task)
+            tracing.set_fields(cache='hit')
+        else:
+            tracing.set_fields(cache='miss' if result_key else 'no_hash')
+            if not use_ai:
+                raise ValueError("AI_SERVICE_URL not configured")
+
+            with tracing.stage('download'):
+                if download_task is None:
+                    download_task = asyncio.create_task(storage.download(bucket_name, file_name, generation))
+                raw, downloaded_generation = await download_task
+                if generation is not None and downloaded_generation and int(downloaded_generation) != generation:
+                    # 메타데이터와 동시에 받은 사이 객체가 덮어써졌으면 확정한 버전을 다시 받습니다.
+                    raw, _ = await storage.download(bucket_name, file_name, generation)
+            tracing.add('bytes_downloaded', len(raw))
+
+            with tracing.stage('normalize'):
+                image_bytes, upload_name, mime_type = await asyncio.to_thread(main.prepare_image, raw, file_basename)
+            tracing.add('bytes_uploaded', len(image_bytes))
+
+            with tracing.stage('predict'):
+                prediction_result = await pipeline.ai.predict(
+                    upload_name, image_bytes, mime_type, {'car_model': car_model, 'user_id': uid})
+            with tracing.stage('cache_store'):
+                await _blocking(main.prediction_cache.set, result_key, prediction_result)
+
+        prediction_result['imageUrl'] = main.image_url(bucket_name, file_basename)
+        print(f"Analysis completed for user: {uid}")
+
+        if main.results_sink is not None:
+            record = main.result_record(prediction_result, uid, car_model, file_name, event_id)
+            with tracing.stage('persist'):
+                await _blocking(main.results_sink.write, result_doc_id(bucket_name, file_name, generation), record)
+
+        with tracing.stage('complete'):
+            for key in claimed_keys:
+                await _blocking(main.event_ledger.complete, key, owner)
+        return prediction_result
+
+    except BaseException as e:
+        _cancel(fetch_task, download_task)
+        print(f"Error processing image: {e}")
+        for key in claimed_keys:
+            await _blocking(main.event_ledger.release, key, owner)
+        raise
+
+
+class _LoopThread:
+    """
+    모든 요청이 공유하는 백그라운드 이벤트 루프. functions-framework의 요청 스레드는
+    코루틴을 이 루프에 넘기고 결과만 기다리므로, 동시 요청 수만큼 I/O 대기 스레드가 늘지 않습니다.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def run(self, coro):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='analysis-loop', daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+
+_loop_thread = _LoopThread()
+
+
+@functions_framework.cloud_event
+def analyze_crashed_car_async(cloud_event):
+    """
+    analyze_crashed_car와 같은 트리거를 받는 비동기 파이프라인 진입점.
+    실패한 이벤트는 동기 진입점과 같은 dead-letter 저장소에 넣습니다.
+    """
+    try:
+        _loop_thread.run(analyze_event_async(cloud_event))
+    except Exception as e:
+        if not main.park_failure(cloud_event, e):
+            raise
@@ -0,0 +1,150 @@
+import base64
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+# 토큰의 exp를 읽지 못했을 때 가정하는 수명 (Google ID Token은 보통 1시간)
+DEFAULT_TOKEN_LIFETIME = 3600
+# 토큰 발급을 기다리는 최대 시간(초). 메타데이터 서버가 응답하지 않아도 요청이 무한정 멈추지 않게 합니다.
+ID_TOKEN_FETCH_TIMEOUT = float(os.environ.get("ID_TOKEN_FETCH_TIMEOUT", 30))
+
+
+def _token_expiry(token, now):
+    """
+    JWT 페이로드의 exp(만료 시각)를 서명 검증 없이 읽습니다.
+    캐시 갱신 시점을 정하는 용도로만 사용하므로 검증은 필요 없습니다.
+    """
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))['exp'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return now + DEFAULT_TOKEN_LIFETIME
+
+
+class _TokenEntry:
+    __slots__ = ('lock', 'token', 'expiry', 'pending')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.token = None
+        self.expiry = 0.0
+        self.pending = None
+
+
+class IdTokenProvider:
+    """
+    audience(호출 대상 URL)별로 ID Token을 캐시하고 만료 전에 미리 갱신합니다.
+
+    - 토큰이 충분히 유효하면 네트워크 요청 없이 캐시된 값을 반환합니다.
+    - 만료 refresh_margin초 전부터는 기존 토큰을 반환하면서 백그라운드로 갱신합니다.
+    - 만료 min_validity초 이내이거나 토큰이 없으면 갱신이 끝날 때까지 기다립니다.
+    - 같은 audience에 대한 동시 요청은 하나의 fetch로 합쳐집니다.
+      기다리는 요청은 fetch_timeout초가 지나면 TimeoutError를 받고, 다음 요청은 새 fetch를 시작합니다.
+
+    Cloud Run은 요청 처리 중이 아닐 때 CPU를 제한하므로 타이머 대신
+    요청 시점에 갱신을 시작합니다.
+    """
+
+    def __init__(self, fetcher=None, refresh_margin=300, min_validity=30, clock=time.time, fetch_timeout=None):
+        self._fetcher = fetcher or self._fetch_google_id_token
+        self._refresh_margin = refresh_margin
+        self._min_validity = min_validity
+        self._fetch_timeout = ID_TOKEN_FETCH_TIMEOUT if fetch_timeout is None else fetch_timeout
+        self._clock = clock
+        self._entries = {}
+        self._entries_lock = threading.Lock()
+        self._auth_request = None
+
+    def _fetch_google_id_token(self, audience):
+        import google.auth.transport.requests
+        import google.oauth2.id_token
+
+        # Request 객체는 내부 세션을 재사용하므로 한 번만 생성합니다.
+        # audience가 다른 fetch가 동시에 실행될 수 있으므로 생성은 잠금 안에서 합니다.
+        with self._entries_lock:
+            if self._auth_request is None:
+                self._auth_request = google.auth.transport.requests.Request()
+            auth_request = self._auth_request
+        return google.oauth2.id_token.fetch_id_token(auth_request, audience)
+
+    def _entry(self, audience):
+        with self._entries_lock:
+            entry = self._entries.get(audience)
+            if entry is None:
+                entry = self._entries[audience] = _TokenEntry()
+            return entry
+
+    def _start_fetch(self, audience, entry):
+        # entry.lock을 잡은 상태에서 호출해야 합니다.
+        if entry.pending is None:
+            future = Future()
+            entry.pending = future
+            thread = threading.Thread(
+                target=self._run_fetch, args=(audience, entry, future), daemon=True
+            )
+            thread.start()
+        return entry.pending
+
+    def _run_fetch(self, audience, entry, future):
+        try:
+            token = self._fetcher(audience)
+        except Exception as e:
+            with entry.lock:
+                if entry.pending is future:
+                    entry.pending = None
+            future.set_exception(e)
+            return
+
+        with entry.lock:
+            entry.token = token
+            entry.expiry = _token_expiry(token, self._clock())
+            if entry.pending is future:
+                entry.pending = None
+        future.set_result(token)
+
+    def prefetch(self, audience):
+        """
+        토큰이 없거나 곧 만료되면 백그라운드 fetch를 시작하고 바로 반환합니다.
+        콜드 스타트 시 GCS 다운로드와 토큰 발급을 동시에 진행하기 위해 사용합니다.
+        """
+        entry = self._entry(audience)
+        with entry.lock:
+            if entry.token and self._clock() < entry.expiry - self._refresh_margin:
+                return
+            self._start_fetch(audience, entry)
+
+    def get(self, audience, timeout=None):
+        """
+        audience에 대한 유효한 ID Token을 반환합니다.
+        발급을 기다려야 하는데 timeout(기본 fetch_timeout)초 안에 끝나지 않으면 TimeoutError를 발생시킵니다.
+        """
+        entry = self._entry(audience)
+        with entry.lock:
+            remaining = entry.expiry - self._clock() if entry.token else 0
+            if remaining > self._refresh_margin:
+                return entry.token
+            if remaining > self._min_validity:
+                # 아직 쓸 수 있는 토큰이므로 반환하고 갱신은 뒤에서 진행
+                self._start_fetch(audience, entry)
+                return entry.token
+            future = self._start_fetch(audience, entry)
+        try:
+            return future.result(self._fetch_timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            # 멈춘 fetch에 다음 요청이 계속 묶이지 않도록 떼어냅니다. 늦게 끝나면 그 결과는 그대로 캐시됩니다.
+            with entry.lock:
+                if entry.pending is future:
+                    entry.pending = None
+            raise
+
+    def invalidate(self, audience):
+        """
+        401 응답 등으로 토큰이 거부되었을 때 캐시를 비웁니다.
+        """
+        entry = self._entry(audience)
+        with entry.lock:
+            entry.token = None
+            entry.expiry = 0.0
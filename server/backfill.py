@@ -0,0 +1,352 @@
+"""
+crashed_car_picture/ 아래 기존 업로드를 다시 분석하는 일괄 처리 CLI.
+
+모델(AI_SERVICE_URL 뒤의 서비스)을 바꾼 뒤 과거 이미지를 다시 채점할 때 사용합니다.
+analyze_crashed_car와 같은 parse_filename / run_inference 경로를 쓰며,
+결과는 --sink(기본: GCS 버킷이면 RESULTS_SINK 설정, --local-dir이면 none)가 none이 아니면 같은 결과 문서에,
+--output이 있으면 JSONL로 기록합니다. 로컬 실행이 실제 damage_analyses 컬렉션에 쓰지 않도록
+--local-dir에서는 --sink firestore를 직접 주어야만 Firestore에 씁니다.
+
+    # GCS 버킷 전체 재처리 (체크포인트 파일로 중단 후 이어서 실행 가능)
+    python backfill.py --bucket my-bucket --ai-url https://ai-xxxx.run.app --checkpoint backfill.ckpt
+
+    # 로컬 디렉터리 + 스텁 AI 서버로 실행
+    python benchmarks/stub_ai_server.py --port 8081 &
+    python backfill.py --local-dir ./sample --ai-url http://127.0.0.1:8081 --no-auth --uid user123 --since 20240101 \
+        --output rescored.jsonl
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+PREFIX = "crashed_car_picture/"
+_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+class BackfillObject:
+    """
+    처리할 객체 하나. blob은 run_inference가 쓰는 download_to_file / open('rb')를 지원해야 합니다.
+    """
+    __slots__ = ('bucket_name', 'name', 'generation', 'car_model', 'size', 'blob')
+
+    def __init__(self, bucket_name, name, generation, car_model, size, blob):
+        self.bucket_name = bucket_name
+        self.name = name
+        self.generation = generation
+        self.car_model = car_model
+        self.size = size
+        self.blob = blob
+
+    @property
+    def key(self):
+        return f"{self.name}#{self.generation}"
+
+
+class LocalFileBlob:
+    def __init__(self, path):
+        self.path = path
+
+    def download_to_file(self, file_obj):
+        with open(self.path, 'rb') as f:
+            shutil.copyfileobj(f, file_obj)
+
+    def open(self, mode='rb', chunk_size=None):
+        return open(self.path, mode)
+
+
+def list_gcs_objects(bucket_name, prefix=PREFIX, page_size=1000, client=None):
+    """
+    페이지 단위 목록 조회로 객체를 하나씩 내보냅니다. 목록 응답에 metadata가 포함되므로 객체별 reload는 없습니다.
+    """
+    from gcs_objects import get_storage_client
+
+    client = client or get_storage_client()
+    iterator = client.list_blobs(bucket_name, prefix=prefix, page_size=page_size)
+    for page in iterator.pages:
+        for blob in page:
+            car_model = (blob.metadata or {}).get('carModel', 'unknown')
+            yield BackfillObject(bucket_name, blob.name, blob.generation, car_model, blob.size, blob)
+
+
+def list_local_objects(directory, prefix=PREFIX):
+    """
+    directory/crashed_car_picture/ 아래 파일을 GCS 객체처럼 내보냅니다. (이름순, GCS 목록과 같은 순서)
+    <파일>.metadata.json이 있으면 거기서 carModel을 읽고, generation은 수정 시각(ns)으로 대신합니다.
+    """
+    root = os.path.join(directory, prefix)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith('.metadata.json'):
+                continue
+            path = os.path.join(dirpath, filename)
+            name = os.path.relpath(path, directory).replace(os.sep, '/')
+            car_model = 'unknown'
+            sidecar = path + '.metadata.json'
+            if os.path.exists(sidecar):
+                with open(sidecar) as f:
+                    car_model = json.load(f).get('carModel', 'unknown')
+            stat = os.stat(path)
+            yield BackfillObject(os.path.basename(os.path.abspath(directory)), name, stat.st_mtime_ns,
+                                 car_model, stat.st_size, LocalFileBlob(path))
+
+
+def upload_date(file_basename):
+    """
+    {uid}_{YYYYMMDD}.jpg 형식 파일명에서 날짜(YYYYMMDD 문자열)를 꺼냅니다. 없으면 None.
+    """
+    parts = file_basename.rsplit('.', 1)[0].rsplit('_', 1)
+    if len(parts) == 2 and len(parts[1]) == 8 and parts[1].isdigit():
+        return parts[1]
+    return None
+
+
+class RateLimiter:
+    """
+    초당 rate건을 넘지 않도록 호출 간격을 맞추는 토큰 버킷. rate가 0 이하면 제한하지 않습니다.
+    """
+
+    def __init__(self, rate, burst=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = max(1.0, float(burst))
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+class Checkpoint:
+    """
+    처리 결과를 한 줄씩 덧붙이는 JSONL 체크포인트. 다시 실행하면 성공한 객체(이름#generation)는 건너뜁니다.
+    작업이 순서와 상관없이 끝나므로 "마지막 위치" 대신 완료 목록을 기록합니다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self._lock = threading.Lock()
+        self._file = None
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # 중단 시 잘린 마지막 줄
+                    if entry.get('status') == 'ok':
+                        self.done.add(entry['key'])
+        if path:
+            self._file = open(path, 'a')
+
+    def record(self, key, status, error=None):
+        if self._file is None:
+            return
+        entry = {'key': key, 'status': status}
+        if error:
+            entry['error'] = error
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class Progress:
+    def __init__(self, interval, clock=time.monotonic):
+        self.interval = interval
+        self._clock = clock
+        self._started = clock()
+        self._last_report = self._started
+        self._lock = threading.Lock()
+        self.counts = {'listed': 0, 'skipped': 0, 'ok': 0, 'errors': 0, 'bytes': 0}
+
+    def add(self, name, amount=1):
+        with self._lock:
+            self.counts[name] += amount
+            now = self._clock()
+            due = self.interval > 0 and now - self._last_report >= self.interval
+            if due:
+                self._last_report = now
+        if due:
+            self.report()
+
+    def report(self, final=False):
+        with self._lock:
+            counts = dict(self.counts)
+        elapsed = max(self._clock() - self._started, 1e-9)
+        done = counts['ok'] + counts['errors']
+        print(f"[backfill{' done' if final else ''}] listed={counts['listed']} skipped={counts['skipped']} "
+              f"ok={counts['ok']} errors={counts['errors']} "
+              f"{done / elapsed:.1f} obj/s {counts['bytes'] / elapsed / 1e6:.2f} MB/s elapsed={elapsed:.1f}s",
+              flush=True)
+
+
+def select(objects, uids=None, since=None, until=None):
+    """
+    이미지 파일 중 UID/날짜 조건에 맞는 것만 (객체, uid) 쌍으로 내보냅니다.
+    """
+    from main import parse_filename
+
+    for obj in objects:
+        basename = obj.name.split('/')[-1]
+        if not basename.lower().endswith(_IMAGE_EXTENSIONS):
+            continue
+        uid = parse_filename(basename)
+        if not uid or (uids and uid not in uids):
+            continue
+        if since or until:
+            date = upload_date(basename)
+            if date is None or (since and date < since) or (until and date > until):
+                continue
+        yield obj, uid
+
+
+def process(obj, uid, output=None, output_lock=None):
+    """
+    analyze_crashed_car와 같은 추론/저장 경로로 객체 하나를 다시 분석합니다.
+    모델이 바뀐 뒤의 재채점이므로 예측 캐시는 읽지 않고 새 결과로 덮어씁니다.
+    """
+    import main
+    from prediction_cache import cache_key
+    from results_sink import result_doc_id
+
+    file_basename = obj.name.split('/')[-1]
+    result = main.run_inference(obj.blob, obj.name, file_basename, uid, obj.car_model)
+    result['imageUrl'] = main.image_url(obj.bucket_name, file_basename)
+
+    md5_hash = getattr(obj.blob, 'md5_hash', None)
+    if md5_hash:
+        main.prediction_cache.set(cache_key(md5_hash, obj.car_model, uid), result)
+
+    if main.results_sink is not None:
+        # timestamp는 원래 분석 시각을 유지하도록 넣지 않습니다. (앱은 최신 timestamp 문서를 새 결과로 봄)
+        record = dict(result, userId=uid, carModel=obj.car_model, sourceObject=obj.name,
+                      rescoredAt=datetime.now(timezone.utc))
+        main.results_sink.write(result_doc_id(obj.bucket_name, obj.name, obj.generation), record)
+
+    if output is not None:
+        line = json.dumps({'object': obj.name, 'generation': obj.generation, 'uid': uid,
+                           'carModel': obj.car_model, 'result': result}, ensure_ascii=False, default=str)
+        with output_lock:
+            output.write(line + '\n')
+    return result
+
+
+def run(objects, workers=4, rate=0.0, checkpoint=None, progress=None, output=None, limit=None):
+    """
+    객체를 최대 workers개씩 동시에 처리합니다. 제출 대기열을 workers * 2로 제한해
+    목록이 아무리 길어도 메모리에 올라가는 작업 수는 일정합니다.
+    """
+    checkpoint = checkpoint or Checkpoint(None)
+    progress = progress or Progress(0)
+    limiter = RateLimiter(rate, burst=workers)
+    slots = threading.BoundedSemaphore(workers * 2)
+    output_lock = threading.Lock()
+
+    def work(obj, uid):
+        try:
+            limiter.acquire()
+            process(obj, uid, output, output_lock)
+        except Exception as e:
+            print(f"Error re-analyzing {obj.name}: {e}")
+            checkpoint.record(obj.key, 'error', str(e))
+            progress.add('errors')
+        else:
+            checkpoint.record(obj.key, 'ok')
+            progress.add('ok')
+            progress.add('bytes', obj.size or 0)
+        finally:
+            slots.release()
+
+    submitted = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='backfill') as pool:
+        for obj, uid in objects:
+            progress.add('listed')
+            if obj.key in checkpoint.done:
+                progress.add('skipped')
+                continue
+            if limit is not None and submitted >= limit:
+                break
+            slots.acquire()
+            pool.submit(work, obj, uid)
+            submitted += 1
+    progress.report(final=True)
+    return progress.counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-analyze historical crashed_car_picture uploads")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--bucket', help="GCS bucket to list")
+    source.add_argument('--local-dir', help="directory containing crashed_car_picture/ (instead of GCS)")
+    parser.add_argument('--prefix', default=PREFIX)
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--uid', action='append', help="only these UIDs (repeatable)")
+    parser.add_argument('--since', help="first upload date to include, YYYYMMDD")
+    parser.add_argument('--until', help="last upload date to include, YYYYMMDD")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=0, help="max objects per second (0 = unlimited)")
+    parser.add_argument('--limit', type=int, help="process at most N objects")
+    parser.add_argument('--checkpoint', help="JSONL checkpoint file; completed objects are skipped on resume")
+    parser.add_argument('--output', help="append results as JSONL")
+    parser.add_argument('--progress-every', type=float, default=10, help="seconds between progress lines")
+    parser.add_argument('--ai-url', help="overrides AI_SERVICE_URL")
+    parser.add_argument('--no-auth', action='store_true', help="do not attach ID tokens (local stub server)")
+    parser.add_argument('--sink', choices=['firestore', 'memory', 'none'],
+                        help="where to write result documents (default: RESULTS_SINK for --bucket, none for --local-dir)")
+    args = parser.parse_args(argv)
+
+    # main 모듈이 import 시점에 환경 변수를 읽으므로 먼저 설정합니다.
+    if args.ai_url:
+        os.environ['AI_SERVICE_URL'] = args.ai_url
+    if args.sink or args.local_dir:
+        os.environ['RESULTS_SINK'] = args.sink or 'none'
+    os.environ.setdefault('STORAGE_WARMUP', '0')
+    import main as analysis
+
+    if args.no_auth:
+        analysis.ai_client.token_provider = None
+
+    if args.local_dir:
+        listing = list_local_objects(args.local_dir, args.prefix)
+    else:
+        listing = list_gcs_objects(args.bucket, args.prefix, args.page_size)
+
+    checkpoint = Checkpoint(args.checkpoint)
+    output = open(args.output, 'a') if args.output else None
+    try:
+        counts = run(select(listing, set(args.uid or ()), args.since, args.until), workers=args.workers,
+                     rate=args.rate, checkpoint=checkpoint, progress=Progress(args.progress_every),
+                     output=output, limit=args.limit)
+    finally:
+        checkpoint.close()
+        if output is not None:
+            output.close()
+    return 1 if counts['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
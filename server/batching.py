@@ -0,0 +1,182 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from io import BytesIO
+
+# 마이크로 배치 설정 (환경 변수로 조정)
+AI_BATCH_MODE = os.environ.get("AI_BATCH_MODE", "0") in ("1", "true", "True")
+AI_BATCH_MAX_SIZE = int(os.environ.get("AI_BATCH_MAX_SIZE", 8))
+AI_BATCH_MAX_WAIT_MS = float(os.environ.get("AI_BATCH_MAX_WAIT_MS", 20))
+# 결과를 기다리는 최대 시간(초). create_batcher()는 클라이언트의 타임아웃/재시도 설정으로 계산한 값을 씁니다.
+AI_BATCH_RESULT_TIMEOUT = float(os.environ.get("AI_BATCH_RESULT_TIMEOUT", 300))
+
+# 배치 엔드포인트가 없다는 뜻으로 보는 상태 코드
+BATCH_UNSUPPORTED_STATUS = (404, 405, 415, 501)
+
+
+class BatchItem:
+    """
+    배치에 담길 이미지 한 장. fields에는 car_model, user_id 등 폼 필드가 들어갑니다.
+    """
+    __slots__ = ('filename', 'data', 'mime_type', 'fields', 'future', 'enqueued_at')
+
+    def __init__(self, filename, data, mime_type, fields):
+        self.filename = filename
+        self.data = data
+        self.mime_type = mime_type
+        self.fields = fields
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class PredictBatcher:
+    """
+    동시에 들어온 /predict 요청을 최대 max_size장 또는 max_wait_ms까지 모아 한 번에 전송합니다.
+
+    - send_batch(items)는 items와 같은 순서의 결과 리스트를 반환해야 합니다.
+    - send_single(item)은 배치 엔드포인트를 지원하지 않는 서버용 대체 경로입니다.
+      배치 호출이 BATCH_UNSUPPORTED_STATUS로 실패하면 이후에는 단건 전송만 사용합니다.
+    - 배치 하나가 처리되는 동안에도 다음 배치를 모을 수 있도록 전송은 워커 풀에서 실행합니다.
+      동시에 전송하는 배치는 max_in_flight개로 제한되고, 그동안 요청은 대기열에 남아 다음 배치로 묶입니다.
+    - predict()는 result_timeout(기본 AI_BATCH_RESULT_TIMEOUT)까지만 기다리고 TimeoutError를 발생시킵니다.
+      아직 전송되지 않은 요청은 취소되어 보내지 않습니다.
+    """
+
+    def __init__(self, send_batch, send_single, max_size=None, max_wait_ms=None, max_in_flight=4,
+                 result_timeout=None):
+        self.send_batch = send_batch
+        self.send_single = send_single
+        self.max_size = max_size or AI_BATCH_MAX_SIZE
+        self.max_wait = (AI_BATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000.0
+        self.result_timeout = AI_BATCH_RESULT_TIMEOUT if result_timeout is None else result_timeout
+        self.batch_supported = True
+        self._queue = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='predict-batch')
+        # executor의 작업 큐는 크기 제한이 없으므로, 전송 자리가 날 때까지 다음 배치를 꺼내지 않습니다.
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.stats = {'batches': 0, 'items': 0, 'single_items': 0}
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='predict-batcher', daemon=True)
+                self._thread.start()
+
+    def submit(self, filename, data, mime_type, fields):
+        """
+        이미지를 배치 대기열에 넣고 결과를 받을 Future를 반환합니다.
+        """
+        item = BatchItem(filename, data, mime_type, fields)
+        if not self.batch_supported:
+            item.future.set_running_or_notify_cancel()
+            self._send_one(item)
+            return item.future
+        self._ensure_started()
+        self._queue.put(item)
+        return item.future
+
+    def predict(self, filename, data, mime_type, fields, timeout=None):
+        future = self.submit(filename, data, mime_type, fields)
+        try:
+            return future.result(self.result_timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            # 아직 배치에 실려 나가지 않았다면 취소해서, 호출자가 포기한 요청을 보내지 않습니다.
+            future.cancel()
+            raise
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            self._in_flight.acquire()
+            batch = self._collect()
+            self._executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        try:
+            # 기다리다 취소된 요청은 빼고, 나머지는 실행 중으로 표시해 더 이상 취소되지 않게 합니다.
+            batch = [item for item in batch if item.future.set_running_or_notify_cancel()]
+            if batch:
+                self._dispatch_batch(batch)
+        finally:
+            self._in_flight.release()
+
+    def _dispatch_batch(self, batch):
+        with self._lock:
+            self.stats['batches'] += 1
+            self.stats['items'] += len(batch)
+
+        if len(batch) == 1 or not self.batch_supported:
+            self._dispatch_single(batch)
+            return
+
+        try:
+            results = self.send_batch(batch)
+            if len(results) != len(batch):
+                raise ValueError(f"batch response has {len(results)} results for {len(batch)} images")
+        except Exception as e:
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            if status in BATCH_UNSUPPORTED_STATUS:
+                print(f"Batch endpoint unsupported (HTTP {status}); falling back to single-image requests")
+                self.batch_supported = False
+                self._dispatch_single(batch)
+                return
+            for item in batch:
+                item.future.set_exception(e)
+            return
+
+        for item, result in zip(batch, results):
+            item.future.set_result(result)
+
+    def _dispatch_single(self, batch):
+        with self._lock:
+            self.stats['single_items'] += len(batch)
+        # 배치 미지원을 알게 된 뒤 이미 대기열에 있던 요청만 여기로 옵니다(이후 요청은 submit()에서 바로 전송).
+        # 풀에 따로 넣지 않고 현재 워커에서 차례로 보내 동시 전송 수 제한을 지킵니다.
+        for item in batch:
+            self._send_one(item)
+
+    def _send_one(self, item):
+        try:
+            item.future.set_result(self.send_single(item))
+        except Exception as e:
+            item.future.set_exception(e)
+
+
+def request_deadline(client):
+    """
+    AIServiceClient.post() 한 번이 걸릴 수 있는 최대 시간(초)을 계산합니다.
+    시도는 재시도 max_retries번에 401 토큰 갱신 한 번을 더한 수이고, 시도 사이 대기는 backoff_max를 넘지 않습니다
+    (그보다 긴 Retry-After는 기다리지 않고 실패합니다).
+    """
+    attempts = client.max_retries + 2
+    return attempts * (client.connect_timeout + client.read_timeout) + client.max_retries * client.backoff_max
+
+
+def create_batcher(client):
+    """
+    AIServiceClient의 배치/단건 호출을 사용하는 PredictBatcher를 만듭니다.
+    결과 대기 시간은 배치를 모으는 시간에 요청 한 번의 최대 시간을 더한 값입니다.
+    """
+    def send_single(item):
+        files = {'file': (item.filename, BytesIO(item.data), item.mime_type)}
+        return client.predict(files=files, data=item.fields)
+
+    result_timeout = AI_BATCH_MAX_WAIT_MS / 1000.0 + request_deadline(client)
+    return PredictBatcher(client.predict_batch, send_single, result_timeout=result_timeout)
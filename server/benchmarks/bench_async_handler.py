@@ -0,0 +1,153 @@
+"""
+동기 핸들러(analyze_crashed_car)와 asyncio 핸들러(analyze_crashed_car_async)의 처리량 비교.
+
+GCS는 별도 프로세스의 JSON API 스텁(stub_gcs_server)으로, AI 서비스는 스텁 서버로 대신하고,
+같은 이벤트 수를 높은 동시성으로 흘려보내며 다음을 잽니다.
+- events/s: 벽시계 기준 처리량
+- CPU ms/event: 핸들러 프로세스의 CPU 시간(스텁 프로세스 제외) / 이벤트 수
+- events/s/vCPU: 핸들러 프로세스에 허용한 vCPU 하나당 처리량 (--cpus로 고정, Linux만)
+- events/CPU-s: 이벤트 수 / CPU 시간 (vCPU를 모두 쓰지 못하는 구성에서도 비교 가능한 효율 지표)
+
+Audit Log 이벤트(기본)는 메타데이터 조회가 필요하므로 조회/다운로드/토큰 발급이 겹치는 효과가 드러납니다.
+
+    python benchmarks/bench_async_handler.py --events 1000 --concurrency 200 --cpus 1
+    python benchmarks/bench_async_handler.py --event-kind storage --metadata-ms 20 --media-ms 40 --ai-ms 80
+"""
+import argparse
+import asyncio
+import base64
+import contextlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+import stub_ai_server  # noqa: E402
+import stub_gcs_server  # noqa: E402
+from cloud_events import analysis_event  # noqa: E402
+
+
+def restrict_cpus(count):
+    if not count:
+        return os.cpu_count()
+    if not hasattr(os, 'sched_setaffinity'):
+        print("CPU pinning is not supported on this platform; using all CPUs")
+        return os.cpu_count()
+    cpus = sorted(os.sched_getaffinity(0))[:count]
+    os.sched_setaffinity(0, cpus)
+    return len(cpus)
+
+
+def measure(run):
+    # 스텁은 별도 프로세스이므로 process_time()에는 핸들러 쪽 CPU만 잡힙니다.
+    wall, cpu = time.perf_counter(), time.process_time()
+    failures = run()
+    return time.perf_counter() - wall, time.process_time() - cpu, failures
+
+
+def run_sync(sync_handler, events, concurrency):
+    def one(event):
+        try:
+            sync_handler.analyze_crashed_car(event)
+            return 0
+        except Exception:
+            return 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return sum(pool.map(one, events))
+
+
+def run_async(async_handler, events, concurrency):
+    async def runner():
+        limit = asyncio.Semaphore(concurrency)
+
+        async def one(event):
+            async with limit:
+                try:
+                    await async_handler.analyze_event_async(event)
+                    return 0
+                except Exception:
+                    return 1
+
+        try:
+            return sum(await asyncio.gather(*(one(event) for event in events)))
+        finally:
+            await async_handler.pipeline.close()
+
+    return asyncio.run(runner())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the asyncio handler against the sync handler")
+    parser.add_argument('--events', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--event-kind', choices=['audit', 'storage'], default='audit')
+    parser.add_argument('--cpus', type=int, default=1, help="pin the handler process to N CPUs (0 = all)")
+    parser.add_argument('--object-kb', type=int, default=200)
+    parser.add_argument('--metadata-ms', type=float, default=20, help="stub GCS metadata latency")
+    parser.add_argument('--media-ms', type=float, default=40, help="stub GCS download latency")
+    parser.add_argument('--ai-ms', type=float, default=80, help="stub AI inference latency")
+    parser.add_argument('--token-ms', type=float, default=0, help="fake ID token fetch latency (cold start)")
+    parser.add_argument('--normalize', action='store_true', help="run image normalization (needs real images)")
+    parser.add_argument('--modes', nargs='+', choices=['sync', 'async'], default=['sync', 'async'])
+    args = parser.parse_args()
+
+    gcs_url, gcs_process = stub_gcs_server.start_in_process(
+        object_bytes=args.object_kb * 1024, metadata_ms=args.metadata_ms, media_ms=args.media_ms)
+    ai_url, ai_process = stub_ai_server.start_in_process(base_ms=args.ai_ms, slots=args.concurrency)
+
+    # 모듈 상수가 import 시점에 환경 변수를 읽으므로 main을 가져오기 전에 설정합니다.
+    os.environ.update({
+        'AI_SERVICE_URL': ai_url,
+        'AI_HTTP_POOL_SIZE': str(args.concurrency),
+        'AI_MAX_RETRIES': '0',
+        'STORAGE_EMULATOR_HOST': gcs_url,
+        'STORAGE_WARMUP': '0',
+        'IMAGE_NORMALIZE': '1' if args.normalize else '0',
+        'IDEMPOTENCY_BACKEND': 'memory',
+        'PREDICTION_CACHE_BACKEND': 'none',
+        'RESULTS_SINK': 'none',
+        'ASYNC_POOL_SIZE': str(args.concurrency * 2),
+    })
+    import gcs_objects
+    storage_client = stub_gcs_server.StubStorageClient(gcs_url, args.concurrency)
+    gcs_objects.get_storage_client = lambda: storage_client
+
+    import async_handler
+    import main as sync_handler
+
+    payload = base64.urlsafe_b64encode(json.dumps({'exp': time.time() + 3600}).encode()).decode().rstrip('=')
+
+    def fetch_token(audience):
+        time.sleep(args.token_ms / 1000.0)
+        return f"header.{payload}.signature"
+
+    sync_handler.token_provider._fetcher = fetch_token
+
+    cpus = restrict_cpus(args.cpus)
+    runners = {'sync': lambda events: run_sync(sync_handler, events, args.concurrency),
+               'async': lambda events: run_async(async_handler, events, args.concurrency)}
+
+    print(f"{args.events} {args.event_kind} events, concurrency {args.concurrency}, {cpus} vCPU "
+          f"(GCS {args.metadata_ms:.0f}/{args.media_ms:.0f} ms, AI {args.ai_ms:.0f} ms)")
+    print(f"{'handler':<8} {'events/s':>9} {'events/s/vCPU':>14} {'CPU ms/event':>13} {'events/CPU-s':>13} "
+          f"{'failed':>7}")
+    try:
+        for mode in args.modes:
+            events = [analysis_event(args.event_kind, mode, n) for n in range(args.events)]
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                elapsed, cpu, failures = measure(lambda: runners[mode](events))
+            rate = args.events / elapsed
+            print(f"{mode:<8} {rate:>9.1f} {rate / cpus:>14.1f} {cpu * 1000 / args.events:>13.2f} "
+                  f"{args.events / cpu:>13.1f} {failures:>7}")
+    finally:
+        gcs_process.terminate()
+        ai_process.terminate()
+
+
+if __name__ == '__main__':
+    main()
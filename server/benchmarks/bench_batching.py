@@ -0,0 +1,82 @@
+"""
+마이크로 배치 모드의 처리량/지연 시간 벤치마크.
+
+별도 프로세스의 스텁 AI 서버(요청당 고정 지연 + 이미지당 지연, 동시 추론 슬롯 제한)에
+동시 이벤트를 흘려보내며 배치 크기별 처리량과 p50/p99 지연을 비교합니다.
+배치 크기 1은 기존 단건 /predict 경로입니다.
+
+    python benchmarks/bench_batching.py --events 400 --concurrency 64 --batch-sizes 1 4 8 16
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batching import create_batcher  # noqa: E402
+from http_client import AIServiceClient  # noqa: E402
+
+from stub_ai_server import start_in_process  # noqa: E402
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def run(client, batch_size, max_wait_ms, events, concurrency, image):
+    fields = {'car_model': 'bench', 'user_id': 'bench'}
+    if batch_size > 1:
+        batcher = create_batcher(client)
+        batcher.max_size = batch_size
+        batcher.max_wait = max_wait_ms / 1000.0
+        call = lambda: batcher.predict('bench.jpg', image, 'image/jpeg', fields)  # noqa: E731
+    else:
+        batcher = None
+        call = lambda: client.predict(files={'file': ('bench.jpg', BytesIO(image), 'image/jpeg')}, data=fields)  # noqa: E731
+
+    def one(_):
+        started = time.perf_counter()
+        call()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(events)))
+    elapsed = time.perf_counter() - started
+    return elapsed, latencies, batcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark micro-batched /predict calls")
+    parser.add_argument('--events', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--max-wait-ms', type=float, default=20)
+    parser.add_argument('--image-kb', type=int, default=200)
+    parser.add_argument('--base-ms', type=float, default=40, help="stub: fixed inference latency per request")
+    parser.add_argument('--per-image-ms', type=float, default=5, help="stub: additional latency per image")
+    parser.add_argument('--slots', type=int, default=4, help="stub: concurrent inference slots")
+    args = parser.parse_args()
+
+    base_url, server = start_in_process(base_ms=args.base_ms, per_image_ms=args.per_image_ms, slots=args.slots)
+    client = AIServiceClient(base_url, max_retries=0, pool_size=args.concurrency)
+    image = os.urandom(args.image_kb * 1024)
+
+    print(f"{'batch':>5} {'events/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'requests':>9}")
+    try:
+        for batch_size in args.batch_sizes:
+            elapsed, latencies, batcher = run(client, batch_size, args.max_wait_ms, args.events,
+                                              args.concurrency, image)
+            requests_sent = batcher.stats['batches'] if batcher else args.events
+            print(f"{batch_size:>5} {args.events / elapsed:>9.1f} {percentile(latencies, 50) * 1000:>8.1f} "
+                  f"{percentile(latencies, 99) * 1000:>8.1f} {requests_sent:>9}")
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
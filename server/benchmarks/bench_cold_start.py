@@ -0,0 +1,235 @@
+"""
+analyze_crashed_car 콜드 스타트 벤치마크.
+
+1. `python -X importtime -c "import main"`으로 main 모듈이 직접 가져오는 모듈별 import 비용을 보여주고,
+   첫 이벤트 시점으로 미룬(lazy) 모듈의 비용도 따로 측정합니다.
+2. 매번 새 인터프리터에서 main을 import하고 로컬 CloudEvent 하나를 처리할 때까지의 시간
+   (time-to-first-event)을 잽니다. GCS는 로컬 파일로, AI 서비스는 스텁 서버로 대신합니다.
+
+    python benchmarks/bench_cold_start.py --runs 5
+    python benchmarks/bench_cold_start.py --max-import-ms 400 --max-first-event-ms 900   # 기준 초과 시 exit 1
+"""
+import argparse
+import base64
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+# 첫 이벤트 시점으로 미룬 모듈 (시작 경로에서 빠져 있어야 함)
+DEFERRED_MODULES = ['google.cloud.storage', 'google.cloud.firestore', 'google.auth.transport.requests',
+                    'google.oauth2.id_token', 'PIL.Image']
+
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def _bench_env(**extra):
+    env = dict(os.environ)
+    env.update({'IDEMPOTENCY_BACKEND': 'memory', 'PREDICTION_CACHE_BACKEND': 'none', 'RESULTS_SINK': 'none'})
+    env.update(extra)
+    return env
+
+
+def importtime(code, env):
+    """
+    -X importtime 출력을 (self_us, cumulative_us, depth, module) 목록으로 파싱합니다.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=SERVER_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            rows.append((int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2, match.group(4)))
+    return rows
+
+
+def report_importtime(top):
+    # 백그라운드 warm-up 스레드의 import가 출력에 섞이지 않도록 끕니다.
+    rows = importtime('import main', _bench_env(STORAGE_WARMUP='0'))
+    total = next((cum for _, cum, depth, name in rows if depth == 0 and name == 'main'), 0)
+    children = sorted((row for row in rows if row[2] == 1), key=lambda row: row[1], reverse=True)
+
+    print(f"import main: {total / 1000:.1f} ms cumulative")
+    print(f"{'module':<40} {'cumulative ms':>14} {'self ms':>9}")
+    for self_us, cum_us, _, name in children[:top]:
+        print(f"{name:<40} {cum_us / 1000:>14.1f} {self_us / 1000:>9.1f}")
+
+    print("\ndeferred until first use:")
+    for module in DEFERRED_MODULES:
+        try:
+            rows = importtime(f'import main; import {module}', _bench_env(STORAGE_WARMUP='0'))
+        except subprocess.CalledProcessError:
+            print(f"{module:<40} {'not installed':>14}")
+            continue
+        cost = next((cum for _, cum, depth, name in rows if depth == 0 and name == module), 0)
+        print(f"{module:<40} {cost / 1000:>14.1f}")
+    return total / 1000
+
+
+class LocalBlob:
+    """
+    gcs_objects가 쓰는 Blob 인터페이스(generation, download/open)만 흉내 냅니다.
+    """
+
+    def __init__(self, bucket_name, name, path, generation=None):
+        self.bucket_name = bucket_name
+        self.name = name
+        self.local_path = path
+        self.generation = generation
+
+    def download_to_file(self, file_obj):
+        with open(self.local_path, 'rb') as f:
+            file_obj.write(f.read())
+
+    def open(self, mode='rb', chunk_size=None):
+        return open(self.local_path, mode)
+
+
+class LocalStorageClient:
+    def __init__(self, path):
+        self.path = path
+
+    def bucket(self, bucket_name):
+        client = self
+
+        class _Bucket:
+            def blob(self, name, generation=None):
+                return LocalBlob(bucket_name, name, client.path, generation)
+
+        return _Bucket()
+
+
+def child(image_path):
+    """
+    새 인터프리터에서 실행되는 측정 본체. 결과를 JSON 한 줄로 출력합니다.
+    """
+    started = time.perf_counter()
+    import gcs_objects
+
+    local_client = LocalStorageClient(image_path)
+
+    def get_storage_client():
+        # 실제 배포와 같은 import 비용을 치르되, 자격 증명이 필요한 Client 생성은 건너뜁니다.
+        from google.cloud import storage  # noqa: F401
+        return local_client
+
+    gcs_objects.get_storage_client = get_storage_client
+
+    import main
+    imported = time.perf_counter()
+
+    from cloudevents.http import CloudEvent
+
+    payload = base64.urlsafe_b64encode(json.dumps({'exp': time.time() + 3600}).encode()).decode().rstrip('=')
+    main.token_provider._fetcher = lambda audience: f"header.{payload}.signature"
+
+    def event(n):
+        attributes = {
+            'id': f'bench-{n}',
+            'type': 'google.cloud.storage.object.v1.finalized',
+            'source': '//storage.googleapis.com/projects/_/buckets/bench',
+        }
+        data = {
+            'bucket': 'bench',
+            'name': f'crashed_car_picture/bench{n}_20240122.jpg',
+            'contentType': 'image/jpeg',
+            'generation': str(1000 + n),
+            'md5Hash': base64.b64encode(os.urandom(16)).decode(),
+            'metadata': {'carModel': 'bench'},
+        }
+        return CloudEvent(attributes, data)
+
+    main.analyze_crashed_car(event(1))
+    first = time.perf_counter()
+    main.analyze_crashed_car(event(2))
+    second = time.perf_counter()
+
+    print(json.dumps({
+        'import_ms': (imported - started) * 1000,
+        'first_event_ms': (first - imported) * 1000,
+        'time_to_first_event_ms': (first - started) * 1000,
+        'warm_event_ms': (second - first) * 1000,
+    }))
+
+
+def sample_image(size_kb):
+    """
+    정규화 경로(Pillow 디코드/리사이즈)까지 타도록 가능하면 실제 JPEG을 만듭니다.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return os.urandom(size_kb * 1024)
+    from io import BytesIO
+
+    side = max(64, int((size_kb * 1024 / 3) ** 0.5) * 2)
+    buffer = BytesIO()
+    Image.frombytes('RGB', (side, side), os.urandom(side * side * 3)).save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def run_child(image_path, base_url):
+    env = _bench_env(AI_SERVICE_URL=base_url)
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', image_path], cwd=SERVER_DIR,
+                            env=env, capture_output=True, text=True, check=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings['process_wall_ms'] = wall_ms
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import time and time-to-first-event")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help="number of modules in the importtime breakdown")
+    parser.add_argument('--image-kb', type=int, default=300)
+    parser.add_argument('--max-import-ms', type=float, help="fail if median import time exceeds this")
+    parser.add_argument('--max-first-event-ms', type=float, help="fail if median time-to-first-event exceeds this")
+    parser.add_argument('--child', metavar='IMAGE', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    from stub_ai_server import start_in_process
+
+    report_importtime(args.top)
+
+    base_url, server = start_in_process()
+    with tempfile.NamedTemporaryFile(suffix='.jpg') as image:
+        image.write(sample_image(args.image_kb))
+        image.flush()
+        try:
+            runs = [run_child(image.name, base_url) for _ in range(args.runs)]
+        finally:
+            server.terminate()
+
+    print(f"\n{'metric':<24} {'median ms':>10} {'max ms':>9}")
+    medians = {}
+    for metric in ('import_ms', 'first_event_ms', 'time_to_first_event_ms', 'warm_event_ms', 'process_wall_ms'):
+        values = [run[metric] for run in runs]
+        medians[metric] = statistics.median(values)
+        print(f"{metric:<24} {medians[metric]:>10.1f} {max(values):>9.1f}")
+
+    failed = []
+    if args.max_import_ms is not None and medians['import_ms'] > args.max_import_ms:
+        failed.append(f"import {medians['import_ms']:.1f}ms > {args.max_import_ms}ms")
+    if args.max_first_event_ms is not None and medians['time_to_first_event_ms'] > args.max_first_event_ms:
+        failed.append(f"time-to-first-event {medians['time_to_first_event_ms']:.1f}ms > {args.max_first_event_ms}ms")
+    if failed:
+        print("REGRESSION: " + "; ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+FCM 팬아웃 벤치마크 (가짜 messaging 모듈 사용).
+
+정비소 규모(토큰 수)별로 청크를 순서대로 보낼 때와 동시에 보낼 때의 초당 전송 수를 비교합니다.
+가짜 send_each_for_multicast는 호출마다 고정 지연 + 토큰당 지연을 흉내 내고,
+일부 토큰은 UnregisteredError로 실패시켜 죽은 토큰 집계도 함께 확인합니다.
+
+    python benchmarks/bench_fcm_fanout.py --shop-sizes 10 100 500 2000 10000 --workers 1 4 8
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'notifications'))
+
+from fanout import fan_out  # noqa: E402
+
+
+class UnregisteredError(Exception):
+    code = 'NOT_FOUND'
+
+
+class FakeSendResponse:
+    def __init__(self, exception=None):
+        self.exception = exception
+        self.success = exception is None
+
+
+class FakeBatchResponse:
+    def __init__(self, responses):
+        self.responses = responses
+        self.success_count = sum(1 for r in responses if r.success)
+        self.failure_count = len(responses) - self.success_count
+
+
+class FakeMulticastMessage:
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+
+class FakeMessaging:
+    def __init__(self, call_ms, per_token_us, dead_every):
+        self.call_ms = call_ms
+        self.per_token_us = per_token_us
+        self.dead_every = dead_every
+        self.calls = 0
+
+    def send_each_for_multicast(self, message):
+        if len(message.tokens) > 500:
+            raise ValueError("tokens must not contain more than 500 items")
+        self.calls += 1
+        time.sleep(self.call_ms / 1000.0 + len(message.tokens) * self.per_token_us / 1e6)
+        return FakeBatchResponse([
+            FakeSendResponse(UnregisteredError("Requested entity was not found.")
+                             if self.dead_every and int(token.rsplit('-', 1)[1]) % self.dead_every == 0 else None)
+            for token in message.tokens
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chunked concurrent FCM fan-out")
+    parser.add_argument('--shop-sizes', type=int, nargs='+', default=[10, 100, 500, 2000, 10000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--call-ms', type=float, default=80, help="fake latency per send_each_for_multicast call")
+    parser.add_argument('--per-token-us', type=float, default=100, help="fake latency per token")
+    parser.add_argument('--dead-every', type=int, default=50, help="every Nth token is unregistered (0 = none)")
+    args = parser.parse_args()
+
+    print(f"{'tokens':>7} {'workers':>8} {'chunks':>7} {'sends/s':>10} {'ms':>8} {'dead':>6}")
+    for size in args.shop_sizes:
+        tokens = [f"token-{n}" for n in range(size)]
+        for workers in args.workers:
+            messaging = FakeMessaging(args.call_ms, args.per_token_us, args.dead_every)
+            started = time.perf_counter()
+            result = fan_out(messaging, FakeMulticastMessage, tokens, chunk_size=args.chunk_size, max_workers=workers)
+            elapsed = time.perf_counter() - started
+            print(f"{size:>7} {workers:>8} {result.chunks:>7} {size / elapsed:>10.0f} {elapsed * 1000:>8.1f} "
+                  f"{len(result.dead_tokens):>6}")
+
+
+if __name__ == '__main__':
+    main()
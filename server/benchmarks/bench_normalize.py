@@ -0,0 +1,71 @@
+"""
+이미지 정규화 단계(decode/resize/encode) 시간과 업로드 바이트 절감량 벤치마크.
+
+인자로 이미지 파일 경로를 주면 해당 파일을, 없으면 휴대폰 카메라 해상도의
+합성 JPEG(EXIF 회전 포함)을 생성하여 측정합니다.
+
+    python benchmarks/bench_normalize.py photo1.jpg photo2.png
+    python benchmarks/bench_normalize.py --max-side 1024 --quality 80
+"""
+import argparse
+import os
+import sys
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from imaging import normalize_image  # noqa: E402
+
+# (이름, 가로, 세로, EXIF Orientation)
+SYNTHETIC_IMAGES = [
+    ('phone_12mp', 4032, 3024, 1),
+    ('phone_12mp_rot90', 4032, 3024, 6),
+    ('phone_48mp', 8000, 6000, 1),
+    ('small_800', 800, 600, 1),
+]
+
+
+def synthetic_jpeg(width, height, orientation, quality=95):
+    from PIL import Image
+
+    # 노이즈 + 그라디언트로 실제 사진과 비슷한 압축률을 만듭니다.
+    noise = Image.effect_noise((width, height), 64).convert('RGB')
+    gradient = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    img = Image.blend(noise, gradient, 0.5)
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    out = BytesIO()
+    img.save(out, 'JPEG', quality=quality, exif=exif)
+    return out.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark server-side image normalization")
+    parser.add_argument('paths', nargs='*')
+    parser.add_argument('--max-side', type=int, default=None)
+    parser.add_argument('--quality', type=int, default=None)
+    parser.add_argument('--target-bytes', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.paths:
+        samples = [(os.path.basename(p), open(p, 'rb').read()) for p in args.paths]
+    else:
+        samples = [(name, synthetic_jpeg(w, h, o)) for name, w, h, o in SYNTHETIC_IMAGES]
+
+    print(f"{'image':<20} {'original':>12} {'output':>12} {'in KB':>9} {'out KB':>8} {'saved':>7} "
+          f"{'decode':>8} {'resize':>8} {'encode':>8}")
+    total_in = total_out = 0
+    for name, raw in samples:
+        r = normalize_image(raw, max_side=args.max_side, quality=args.quality, target_bytes=args.target_bytes)
+        total_in += r.original_bytes
+        total_out += len(r.data)
+        saved = 1 - len(r.data) / r.original_bytes
+        original = 'x'.join(map(str, r.original_size)) if r.original_size else '?'
+        output = 'x'.join(map(str, r.size)) if r.size else '?'
+        print(f"{name:<20} {original:>12} {output:>12} {r.original_bytes / 1024:>9.0f} {len(r.data) / 1024:>8.0f} "
+              f"{saved:>6.0%} {r.decode_ms:>6.1f}ms {r.resize_ms:>6.1f}ms {r.encode_ms:>6.1f}ms")
+    print(f"total upload bytes: {total_in} -> {total_out} ({1 - total_out / total_in:.0%} saved)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+결과 저장소(direct vs bulk)의 쓰기 처리량/지연 벤치마크.
+
+GCP 없이 InMemoryWriter(커밋당 고정 지연 + 문서당 지연, 동시 커밋 수 제한)로 Firestore를 대신하고,
+동시 이벤트가 결과를 한 건씩 쓰는 상황에서 writes/s와 쓰기 한 건의 p50/p99 지연을 비교합니다.
+
+    python benchmarks/bench_results_sink.py --writes 2000 --concurrency 64 --batch-sizes 1 10 50 100
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from results_sink import BulkSink, DirectSink, InMemoryWriter  # noqa: E402
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def run(sink, writes, concurrency):
+    record = {'totalCost': 350000, 'details': [{'part': 'Front bumper', 'damage': 'Scratched'}]}
+
+    def one(n):
+        started = time.perf_counter()
+        sink.write(f"bench_{n}", record)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(writes)))
+    return time.perf_counter() - started, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched result writes")
+    parser.add_argument('--writes', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 50, 100],
+                        help="1 = direct sink (one commit per write)")
+    parser.add_argument('--max-wait-ms', type=float, default=20)
+    parser.add_argument('--max-pending', type=int, default=1000)
+    parser.add_argument('--commit-ms', type=float, default=25, help="emulator: fixed latency per commit")
+    parser.add_argument('--per-write-ms', type=float, default=0.2, help="emulator: additional latency per document")
+    parser.add_argument('--slots', type=int, default=8, help="emulator: concurrent commits")
+    args = parser.parse_args()
+
+    print(f"{'batch':>5} {'writes/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'commits':>8}")
+    for batch_size in args.batch_sizes:
+        writer = InMemoryWriter(args.commit_ms, args.per_write_ms, slots=args.slots)
+        if batch_size > 1:
+            sink = BulkSink(writer, max_size=batch_size, max_wait_ms=args.max_wait_ms,
+                            max_pending=args.max_pending)
+        else:
+            sink = DirectSink(writer)
+        elapsed, latencies = run(sink, args.writes, args.concurrency)
+        print(f"{batch_size:>5} {args.writes / elapsed:>9.1f} {percentile(latencies, 50) * 1000:>8.1f} "
+              f"{percentile(latencies, 99) * 1000:>8.1f} {writer.commits:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+정비사 토큰 조회 방식 비교 벤치마크 (가짜 Firestore 사용).
+
+users 컬렉션 쿼리(기존)와 shop_mechanic_tokens/{shopId} 문서 하나 읽기(비정규화)를,
+캐시를 켠 경우와 끈 경우로 나누어 견적 요청 burst를 처리할 때의 요청당 시간과 읽은 문서 수를 비교합니다.
+가짜 Firestore는 요청마다 고정 지연과, 쿼리가 훑는 문서마다 추가 지연을 흉내 냅니다.
+
+    python benchmarks/bench_token_lookup.py --users 5000 --shops 50 --events 500
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'notifications'))
+
+from token_index import MECHANIC_TOKENS_COLLECTION, SHOP_TOKENS_FIELD, MechanicTokenIndex, TokenCache  # noqa: E402
+
+
+class FakeSnapshot:
+    def __init__(self, data):
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, db, collection, doc_id):
+        self.db = db
+        self.collection = collection
+        self.doc_id = doc_id
+
+    def get(self):
+        self.db.charge(requests=1, docs=1)
+        return FakeSnapshot(self.db.data[self.collection].get(self.doc_id))
+
+    def set(self, value, merge=False):
+        self.db.charge(requests=1)
+        docs = self.db.data[self.collection]
+        docs[self.doc_id] = dict(docs.get(self.doc_id) or {}, **value) if merge else dict(value)
+
+
+class FakeQuery:
+    def __init__(self, db, collection, filters):
+        self.db = db
+        self.collection = collection
+        self.filters = filters
+
+    def where(self, field, op, value):
+        return FakeQuery(self.db, self.collection, self.filters + [(field, value)])
+
+    def stream(self):
+        # 복합 색인 없이 훑는 비용을 흉내 내기 위해 컬렉션 전체를 스캔 비용으로 계산합니다.
+        docs = self.db.data[self.collection]
+        matched = [doc for doc in docs.values() if all(doc.get(f) == v for f, v in self.filters)]
+        self.db.charge(requests=1, docs=len(matched), scanned=len(docs))
+        return [FakeSnapshot(doc) for doc in matched]
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db, name):
+        super().__init__(db, name, [])
+
+    def document(self, doc_id):
+        return FakeDocument(self.db, self.collection, doc_id)
+
+
+class FakeFirestore:
+    def __init__(self, request_ms, per_scanned_us):
+        self.request_ms = request_ms
+        self.per_scanned_us = per_scanned_us
+        self.data = {'users': {}, 'service_centers': {}, MECHANIC_TOKENS_COLLECTION: {}}
+        self.stats = {'requests': 0, 'docs': 0}
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def charge(self, requests=0, docs=0, scanned=0):
+        self.stats['requests'] += requests
+        self.stats['docs'] += docs
+        time.sleep((requests * self.request_ms + scanned * self.per_scanned_us / 1000.0) / 1000.0)
+
+
+def populate(db, users, shops, mechanics_per_shop, denormalized):
+    shop_ids = [f"shop{n}" for n in range(shops)]
+    for shop_id in shop_ids:
+        db.data['service_centers'][shop_id] = {'name': shop_id}
+    for n in range(users):
+        db.data['users'][f"user{n}"] = {'role': 'consumer', 'fcmToken': f"consumer-token-{n}"}
+    for shop_id in shop_ids:
+        tokens = []
+        for m in range(mechanics_per_shop):
+            token = f"{shop_id}-mechanic-{m}"
+            db.data['users'][f"{shop_id}-m{m}"] = {'role': 'mechanic', 'serviceCenterId': shop_id, 'fcmToken': token}
+            tokens.append(token)
+        if denormalized:
+            db.data[MECHANIC_TOKENS_COLLECTION][shop_id] = {SHOP_TOKENS_FIELD: tokens}
+    return shop_ids
+
+
+def run(args, mode, ttl):
+    db = FakeFirestore(args.request_ms, args.per_scanned_us)
+    shop_ids = populate(db, args.users, args.shops, args.mechanics, denormalized=(mode == 'denormalized'))
+    index = MechanicTokenIndex(db, mode=mode, cache=TokenCache(ttl=ttl))
+    rng = random.Random(1)
+    # 바쁜 정비소에 요청이 몰리는 burst (상위 10% 정비소가 요청의 절반)
+    hot = shop_ids[:max(1, len(shop_ids) // 10)]
+    events = [rng.choice(hot) if rng.random() < 0.5 else rng.choice(shop_ids) for _ in range(args.events)]
+
+    started = time.perf_counter()
+    for shop_id in events:
+        assert index.tokens(shop_id)
+    elapsed = time.perf_counter() - started
+    return elapsed, db.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mechanic token lookups against a fake Firestore")
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--shops', type=int, default=50)
+    parser.add_argument('--mechanics', type=int, default=3, help="mechanics per shop")
+    parser.add_argument('--events', type=int, default=500)
+    parser.add_argument('--request-ms', type=float, default=5, help="fake latency per Firestore request")
+    parser.add_argument('--per-scanned-us', type=float, default=2, help="fake latency per scanned document")
+    parser.add_argument('--ttl', type=float, default=60)
+    args = parser.parse_args()
+
+    print(f"{'lookup':<14} {'cache':>6} {'ms/event':>9} {'requests':>9} {'docs read':>10}")
+    for mode in ('query', 'denormalized'):
+        for ttl in (0, args.ttl):
+            elapsed, stats = run(args, mode, ttl)
+            print(f"{mode:<14} {'on' if ttl else 'off':>6} {elapsed * 1000 / args.events:>9.2f} "
+                  f"{stats['requests']:>9} {stats['docs']:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+buffered 업로드와 streaming 업로드의 메모리 사용량 비교 벤치마크.
+
+로컬 임시 파일을 GCS Blob처럼 감싸고, 별도 프로세스의 스텁 AI 서버로 전송하면서
+tracemalloc으로 업로드 한 건당 Python 힙 최대 사용량을 측정합니다.
+
+    python benchmarks/bench_upload_memory.py --sizes 1 4 16 32
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_client import AIServiceClient  # noqa: E402
+from upload import blob_upload  # noqa: E402
+
+from stub_ai_server import start_in_process  # noqa: E402
+
+MB = 1024 * 1024
+
+
+class LocalFileBlob:
+    """
+    download_to_file / open('rb')만 흉내 내는 로컬 파일 기반 Blob.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def download_to_file(self, file_obj):
+        with open(self.path, 'rb') as f:
+            shutil.copyfileobj(f, file_obj)
+
+    def open(self, mode='rb', chunk_size=None):
+        return open(self.path, mode)
+
+
+def run_buffered(client, blob, fields):
+    image_data = BytesIO()
+    blob.download_to_file(image_data)
+    image_data.seek(0)
+    files = {'file': ('bench.jpg', image_data, 'image/jpeg')}
+    return client.predict(files=files, data=fields)
+
+
+def run_streaming(client, blob, fields):
+    upload = blob_upload(blob, fields, 'bench.jpg', 'image/jpeg')
+    return client.predict_stream(upload)
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare peak memory of buffered vs streaming uploads")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 4, 16, 32], help="image sizes in MB")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    base_url, server = start_in_process()
+    client = AIServiceClient(base_url, max_retries=0)
+    fields = {'car_model': 'bench', 'user_id': 'bench'}
+    workdir = tempfile.mkdtemp()
+
+    print(f"{'size':>6} {'mode':>10} {'peak MB':>9} {'peak/size':>9} {'ms':>8}")
+    try:
+        for size_mb in args.sizes:
+            path = os.path.join(workdir, f"{size_mb}mb.jpg")
+            with open(path, 'wb') as f:
+                f.write(os.urandom(size_mb * MB))
+            blob = LocalFileBlob(path)
+
+            for mode, fn in (('buffered', run_buffered), ('streaming', run_streaming)):
+                fn(client, blob, fields)  # 커넥션 워밍업
+                peaks, times = [], []
+                for _ in range(args.repeat):
+                    peak, elapsed, result = measure(fn, client, blob, fields)
+                    assert result['received_bytes'] >= size_mb * MB
+                    peaks.append(peak)
+                    times.append(elapsed)
+                peak = max(peaks) / MB
+                print(f"{size_mb:>4}MB {mode:>10} {peak:>9.2f} {peak / size_mb:>9.2f} {min(times) * 1000:>8.1f}")
+    finally:
+        server.terminate()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
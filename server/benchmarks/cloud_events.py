@@ -0,0 +1,77 @@
+"""
+벤치마크/부하 테스트용 CloudEvent 생성기.
+
+- storage_event: Direct Storage 트리거 (google.cloud.storage.object.v1.finalized, 객체 리소스 전체 포함)
+- audit_event: Cloud Audit Log 트리거 (resourceName만 포함, 메타데이터는 핸들러가 조회)
+- estimate_event: Firestore 트리거 service_centers/{shopId}/receive_estimate/{docId} 생성
+- user_event: Firestore 트리거 users/{uid} 쓰기 (정비사 토큰 동기화)
+"""
+import stub_gcs_server
+
+DEFAULT_BUCKET = 'bench-bucket'
+FIRESTORE_SOURCE = '//firestore.googleapis.com/projects/bench/databases/(default)/documents'
+
+
+class BenchEvent:
+    """
+    핸들러가 쓰는 CloudEvent 인터페이스(event["id"], event["type"], event["source"], event.data)만 흉내 냅니다.
+    """
+
+    def __init__(self, attributes, data):
+        self._attributes = attributes
+        self.data = data
+
+    def __getitem__(self, key):
+        return self._attributes[key]
+
+
+def object_name(prefix, n):
+    """
+    분석 대상 경로와 파일명 규칙({uid}_{YYYYMMDD}.jpg)을 따르는 객체 이름.
+    """
+    return f"crashed_car_picture/{prefix}-user{n}_20240122.jpg"
+
+
+def storage_event(event_id, name, bucket=DEFAULT_BUCKET, car_model='sedan', size=0):
+    data = stub_gcs_server.object_resource(bucket, name, size, car_model)
+    return BenchEvent({'id': event_id, 'type': 'google.cloud.storage.object.v1.finalized',
+                       'source': f"//storage.googleapis.com/projects/_/buckets/{bucket}"}, data)
+
+
+def audit_event(event_id, name, bucket=DEFAULT_BUCKET):
+    data = {'protoPayload': {'methodName': 'storage.objects.create',
+                             'resourceName': f"projects/_/buckets/{bucket}/objects/{name}"}}
+    return BenchEvent({'id': event_id, 'type': 'google.cloud.audit.log.v1.written',
+                       'source': '//cloudaudit.googleapis.com/projects/bench/logs/cloudaudit.googleapis.com%2Fdata_access'},
+                      data)
+
+
+def analysis_event(kind, prefix, n, bucket=DEFAULT_BUCKET):
+    """
+    kind('storage' | 'audit')에 맞는 업로드 이벤트. 이벤트 ID와 객체 이름은 prefix와 n으로 고유하게 만듭니다.
+    """
+    name = object_name(prefix, n)
+    if kind == 'audit':
+        return audit_event(f"{prefix}-{n}", name, bucket)
+    return storage_event(f"{prefix}-{n}", name, bucket)
+
+
+def _string_fields(values):
+    return {key: {'stringValue': value} for key, value in values.items()}
+
+
+def estimate_event(event_id, shop_id, damage_type='scratch', user_request='범퍼 수리 견적 부탁드립니다.'):
+    data = {'value': {'fields': _string_fields({'damageType': damage_type, 'userRequest': user_request})}}
+    return BenchEvent({'id': event_id, 'type': 'google.cloud.firestore.document.v1.created',
+                       'source': f"{FIRESTORE_SOURCE}/service_centers/{shop_id}/receive_estimate/{event_id}"},
+                      data)
+
+
+def user_event(event_id, uid, old_fields=None, new_fields=None):
+    data = {}
+    if old_fields is not None:
+        data['oldValue'] = {'fields': _string_fields(old_fields)}
+    if new_fields is not None:
+        data['value'] = {'fields': _string_fields(new_fields)}
+    return BenchEvent({'id': event_id, 'type': 'google.cloud.firestore.document.v1.written',
+                       'source': f"{FIRESTORE_SOURCE}/users/{uid}"}, data)
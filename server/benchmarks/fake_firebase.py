@@ -0,0 +1,309 @@
+"""
+부하 테스트용 Firestore / FCM 대역.
+
+notifications/main.py는 import 시점에 firebase_admin을 초기화하므로, install()로 sys.modules에
+firebase_admin과 google.cloud.firestore 대역을 먼저 넣은 뒤 가져옵니다. (부하 테스트 워커 프로세스 안에서만)
+
+- FakeFirestore: 문서 get/set(merge)/update/delete, where('=='/'in') 쿼리, WriteBatch, 트랜잭션을 지원하며
+  요청마다 request_ms의 지연을 흉내 냅니다. ArrayUnion/ArrayRemove/Increment/DELETE_FIELD 변환도 적용합니다.
+- FakeMessaging: send_each_for_multicast 호출마다 call_ms + 토큰당 per_token_us 지연을 흉내 내고,
+  dead_rate 비율의 토큰을 UnregisteredError로 실패시킵니다.
+"""
+import random
+import sys
+import threading
+import time
+import types
+
+DELETE_FIELD = object()
+
+
+class ArrayUnion:
+    def __init__(self, values):
+        self.values = list(values)
+
+
+class ArrayRemove:
+    def __init__(self, values):
+        self.values = list(values)
+
+
+class Increment:
+    def __init__(self, value):
+        self.value = value
+
+
+def _apply(doc, data):
+    doc = dict(doc or {})
+    for key, value in data.items():
+        if value is DELETE_FIELD:
+            doc.pop(key, None)
+        elif isinstance(value, ArrayUnion):
+            current = list(doc.get(key) or [])
+            doc[key] = current + [v for v in value.values if v not in current]
+        elif isinstance(value, ArrayRemove):
+            doc[key] = [v for v in doc.get(key) or [] if v not in value.values]
+        elif isinstance(value, Increment):
+            doc[key] = (doc.get(key) or 0) + value.value
+        else:
+            doc[key] = value
+    return doc
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, db, collection, doc_id):
+        self.db = db
+        self.collection = collection
+        self.doc_id = doc_id
+
+    def get(self, transaction=None):
+        self.db.charge('reads')
+        with self.db.lock:
+            return FakeSnapshot(self, self.db.data.setdefault(self.collection, {}).get(self.doc_id))
+
+    def set(self, data, merge=False):
+        self.db.charge('writes')
+        self.db.write(self, data, merge=merge)
+
+    def update(self, data):
+        self.db.charge('writes')
+        self.db.write(self, data, merge=True, must_exist=True)
+
+    def delete(self):
+        self.db.charge('writes')
+        self.db.delete(self)
+
+
+class FakeQuery:
+    def __init__(self, db, collection, filters):
+        self.db = db
+        self.collection = collection
+        self.filters = filters
+
+    def where(self, field, op, value):
+        if op not in ('==', 'in'):
+            raise NotImplementedError(f"fake Firestore does not support '{op}' filters")
+        return FakeQuery(self.db, self.collection, self.filters + [(field, op, value)])
+
+    def _match(self, doc):
+        for field, op, value in self.filters:
+            if op == '==' and doc.get(field) != value:
+                return False
+            if op == 'in' and doc.get(field) not in value:
+                return False
+        return True
+
+    def stream(self):
+        self.db.charge('queries')
+        with self.db.lock:
+            docs = list(self.db.data.setdefault(self.collection, {}).items())
+        return [FakeSnapshot(FakeDocument(self.db, self.collection, doc_id), doc)
+                for doc_id, doc in docs if self._match(doc)]
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db, name):
+        super().__init__(db, name, [])
+
+    def document(self, doc_id):
+        return FakeDocument(self.db, self.collection, doc_id)
+
+
+class FakeWriteBatch:
+    def __init__(self, db):
+        self.db = db
+        self._ops = []
+
+    def set(self, ref, data, merge=False):
+        self._ops.append(('set', ref, data, merge))
+
+    def update(self, ref, data):
+        self._ops.append(('update', ref, data, True))
+
+    def delete(self, ref):
+        self._ops.append(('delete', ref, None, False))
+
+    def commit(self):
+        self.db.charge('commits')
+        with self.db.lock:
+            for op, ref, data, merge in self._ops:
+                if op == 'delete':
+                    self.db.delete(ref)
+                else:
+                    self.db.write(ref, data, merge=merge, must_exist=(op == 'update'))
+        self._ops = []
+
+
+class FakeTransaction(FakeWriteBatch):
+    pass
+
+
+def transactional(func):
+    """
+    google.cloud.firestore.transactional 대역. 트랜잭션 전체를 DB 잠금 안에서 실행해 직렬화합니다.
+    """
+    def wrapper(transaction, *args, **kwargs):
+        with transaction.db.lock:
+            result = func(transaction, *args, **kwargs)
+            transaction.commit()
+        return result
+    return wrapper
+
+
+class FakeFirestore:
+    def __init__(self, request_ms=0.0):
+        self.request_ms = request_ms
+        self.data = {}
+        self.lock = threading.RLock()
+        self.stats = {'reads': 0, 'writes': 0, 'queries': 0, 'commits': 0}
+        self._stats_lock = threading.Lock()
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+    def charge(self, kind):
+        with self._stats_lock:
+            self.stats[kind] += 1
+        if self.request_ms:
+            time.sleep(self.request_ms / 1000.0)
+
+    def write(self, ref, data, merge=False, must_exist=False):
+        with self.lock:
+            docs = self.data.setdefault(ref.collection, {})
+            if must_exist and ref.doc_id not in docs:
+                raise KeyError(f"No document to update: {ref.collection}/{ref.doc_id}")
+            docs[ref.doc_id] = _apply(docs.get(ref.doc_id) if merge else None, data)
+
+    def delete(self, ref):
+        with self.lock:
+            self.data.setdefault(ref.collection, {}).pop(ref.doc_id, None)
+
+
+class UnregisteredError(Exception):
+    code = 'NOT_FOUND'
+
+
+class Notification:
+    def __init__(self, title=None, body=None):
+        self.title = title
+        self.body = body
+
+
+class MulticastMessage:
+    def __init__(self, tokens, notification=None, data=None):
+        if len(tokens) > 500:
+            raise ValueError("tokens must not contain more than 500 items")
+        self.tokens = tokens
+        self.notification = notification
+        self.data = data
+
+
+class SendResponse:
+    def __init__(self, exception=None):
+        self.exception = exception
+        self.success = exception is None
+
+
+class BatchResponse:
+    def __init__(self, responses):
+        self.responses = responses
+        self.success_count = sum(1 for r in responses if r.success)
+        self.failure_count = len(responses) - self.success_count
+
+
+class FakeMessaging:
+    """
+    firebase_admin.messaging 모듈 대역 (MulticastMessage, Notification, send_each_for_multicast).
+    """
+    MulticastMessage = MulticastMessage
+    Notification = Notification
+    UnregisteredError = UnregisteredError
+
+    def __init__(self, call_ms=0.0, per_token_us=0.0, dead_rate=0.0, seed=1):
+        self.call_ms = call_ms
+        self.per_token_us = per_token_us
+        self.dead_rate = dead_rate
+        self.stats = {'calls': 0, 'messages': 0, 'dead': 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def send_each_for_multicast(self, message):
+        time.sleep(self.call_ms / 1000.0 + len(message.tokens) * self.per_token_us / 1e6)
+        with self._lock:
+            dead = [self.dead_rate and self._rng.random() < self.dead_rate for _ in message.tokens]
+            self.stats['calls'] += 1
+            self.stats['messages'] += len(message.tokens)
+            self.stats['dead'] += sum(dead)
+        return BatchResponse([SendResponse(UnregisteredError("Requested entity was not found.") if d else None)
+                              for d in dead])
+
+
+def populate(db, shops, mechanics_per_shop, consumers=0, denormalized=True, token_field='mechanicTokens',
+             token_collection='shop_mechanic_tokens'):
+    """
+    service_centers / users 컬렉션(denormalized면 정비소별 토큰 목록 컬렉션도)을 채우고 정비소 ID 목록을 반환합니다.
+    """
+    shop_ids = [f"shop{n}" for n in range(shops)]
+    users = db.data.setdefault('users', {})
+    centers = db.data.setdefault('service_centers', {})
+    for n in range(consumers):
+        users[f"user{n}"] = {'role': 'consumer', 'fcmToken': f"consumer-token-{n}"}
+    for shop_id in shop_ids:
+        tokens = []
+        for m in range(mechanics_per_shop):
+            token = f"{shop_id}-mechanic-{m}"
+            users[f"{shop_id}-m{m}"] = {'role': 'mechanic', 'serviceCenterId': shop_id, 'fcmToken': token}
+            tokens.append(token)
+        centers[shop_id] = {'name': shop_id}
+        if denormalized:
+            db.data.setdefault(token_collection, {})[shop_id] = {token_field: tokens}
+    return shop_ids
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    return module
+
+
+def install(db, messaging):
+    """
+    sys.modules에 firebase_admin(initialize_app, messaging, firestore.client)과
+    google.cloud.firestore 대역을 등록합니다. 실제 패키지가 있어도 이 프로세스에서는 대역을 씁니다.
+    """
+    firestore_module = _module('google.cloud.firestore', DELETE_FIELD=DELETE_FIELD, ArrayUnion=ArrayUnion,
+                               ArrayRemove=ArrayRemove, Increment=Increment, transactional=transactional,
+                               Client=lambda *a, **k: db)
+    try:
+        import google.cloud as google_cloud
+    except ImportError:
+        google = sys.modules.setdefault('google', _module('google', __path__=[]))
+        google_cloud = sys.modules.setdefault('google.cloud', _module('google.cloud', __path__=[]))
+        google.cloud = google_cloud
+    google_cloud.firestore = firestore_module
+    sys.modules['google.cloud.firestore'] = firestore_module
+
+    admin_firestore = _module('firebase_admin.firestore', client=lambda *a, **k: db)
+    credentials = _module('firebase_admin.credentials')
+    sys.modules['firebase_admin'] = _module('firebase_admin', initialize_app=lambda *a, **k: None,
+                                            credentials=credentials, messaging=messaging, firestore=admin_firestore)
+    sys.modules['firebase_admin.firestore'] = admin_firestore
+    sys.modules['firebase_admin.credentials'] = credentials
+    sys.modules['firebase_admin.messaging'] = messaging
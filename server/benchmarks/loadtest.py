@@ -0,0 +1,432 @@
+"""
+서버 함수(analyze_crashed_car, analyze_crashed_car_async, send_estimate_notification) 부하 테스트.
+
+시나리오마다 새 워커 프로세스를 띄워(모듈 상수가 import 시점에 환경 변수를 읽으므로)
+로컬 대역만으로 이벤트를 동시에 흘려보내고 다음을 기록합니다.
+- throughput (events/s), 이벤트별 지연 p50/p99/max, 실패 수
+- 워커 프로세스의 최대 RSS (스텁 서버 프로세스 제외)
+- 분석 함수는 tracing 히스토그램의 단계별 p50/p99
+
+대역:
+- GCS: stub_gcs_server (JSON API, 메타데이터/다운로드 지연)
+- AI 서비스: stub_ai_server (지연 + jitter, 오류 비율/상태 코드 주입)
+- Firestore / FCM: fake_firebase (요청 지연, 죽은 토큰 비율)
+- 이벤트: cloud_events (Audit Log / Direct Storage / Firestore 트리거)
+
+같은 코드에서도 실행마다 처리량/지연이 15~30% 흔들리므로, 시나리오마다 워커를 --repeat번 띄워
+지표별 중앙값을 기록하고 실행 간 편차(spread)를 함께 남깁니다. 중앙값도 호출마다 20% 가까이 움직일 수 있어
+기본 허용 범위는 25%입니다.
+
+결과는 JSON으로 저장하며(기본은 임시 디렉터리), --baseline으로 저장해 둔 결과와 비교해 허용 범위(--tolerance)를
+넘게 나빠진 지표가 있으면 exit 1로 끝납니다.
+
+    python benchmarks/loadtest.py --list
+    python benchmarks/loadtest.py --output baseline.json
+    python benchmarks/loadtest.py --scenarios analyze-audit notify-estimate --baseline baseline.json
+"""
+import argparse
+import base64
+import contextlib
+import copy
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.dirname(BENCH_DIR)
+NOTIFICATIONS_DIR = os.path.join(SERVER_DIR, 'notifications')
+
+RESULT_FORMAT = 1
+
+# 분석 함수 공통 대역 설정 (시나리오에서 덮어쓸 수 있음)
+GCS_DEFAULTS = {'object_bytes': 200 * 1024, 'metadata_ms': 20, 'media_ms': 40}
+AI_DEFAULTS = {'base_ms': 80, 'jitter_ms': 20}
+ANALYZE_ENV = {
+    'STORAGE_WARMUP': '0',
+    'IMAGE_NORMALIZE': '0',
+    'IDEMPOTENCY_BACKEND': 'memory',
+    'PREDICTION_CACHE_BACKEND': 'none',
+    'RESULTS_SINK': 'memory',
+    'AI_MAX_RETRIES': '0',
+}
+# 알림 함수 공통 대역 설정
+NOTIFY_DEFAULTS = {'shops': 50, 'mechanics': 3, 'firestore_ms': 5, 'fcm_call_ms': 50, 'fcm_per_token_us': 100,
+                   'dead_rate': 0.0}
+
+SCENARIOS = {
+    'analyze-storage': {
+        'target': 'analyze', 'kind': 'storage',
+        'description': "Direct Storage events (object resource in the event), buffered upload",
+    },
+    'analyze-audit': {
+        'target': 'analyze', 'kind': 'audit',
+        'description': "Audit Log events (metadata fetched from GCS), buffered upload",
+    },
+    'analyze-audit-async': {
+        'target': 'analyze_async', 'kind': 'audit',
+        'description': "Audit Log events through the asyncio handler",
+    },
+    'analyze-streaming': {
+        'target': 'analyze', 'kind': 'storage', 'env': {'AI_UPLOAD_MODE': 'streaming'},
+        'description': "Direct Storage events, GCS streamed straight into /predict",
+    },
+    'analyze-ai-errors': {
+        'target': 'analyze', 'kind': 'audit', 'env': {'AI_MAX_RETRIES': '3'},
+        'ai': {'error_rate': 0.05, 'error_status': 503},
+        'description': "5% of /predict calls answer 503; client retries with backoff",
+    },
+    'notify-estimate': {
+        'target': 'notify',
+        'notify': {'dead_rate': 0.01},
+        'description': "Estimate request notifications, 1% dead FCM tokens",
+    },
+    'notify-coalesced': {
+        'target': 'notify',
+        'env': {'NOTIFY_COALESCE_WINDOW': '0.2', 'NOTIFY_COALESCE_BACKEND': 'memory'},
+        'description': "Estimate notifications coalesced per shop in a 200ms window",
+    },
+}
+
+# 기준선과 비교할 지표: (경로, 높을수록 좋은지)
+COMPARED_METRICS = [
+    (('throughput',), True),
+    (('latency_ms', 'p50'), False),
+    (('latency_ms', 'p99'), False),
+    (('peak_rss_mb',), False),
+]
+# 실패율은 비율이 아니라 절대값(퍼센트 포인트)으로 비교
+FAILURE_RATE_TOLERANCE = 0.01
+# 반복 실행에서 중앙값을 기록하는 지표
+MEDIAN_METRICS = [
+    ('throughput',),
+    ('elapsed_s',),
+    ('latency_ms', 'p50'),
+    ('latency_ms', 'p99'),
+    ('latency_ms', 'max'),
+    ('latency_ms', 'mean'),
+    ('peak_rss_mb',),
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def peak_rss_mb():
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux는 KB, macOS는 바이트 단위
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def fake_token_fetcher():
+    payload = base64.urlsafe_b64encode(json.dumps({'exp': time.time() + 3600}).encode()).decode().rstrip('=')
+    return lambda audience: f"header.{payload}.signature"
+
+
+def setup_analyze(spec, concurrency, use_async):
+    """
+    스텁 GCS/AI 서버를 별도 프로세스로 띄우고 분석 핸들러를 가져옵니다.
+    (handler, make_event(prefix, n), stats(), cleanup())를 반환합니다.
+    """
+    import stub_ai_server
+    import stub_gcs_server
+    from cloud_events import analysis_event
+
+    gcs_url, gcs_process = stub_gcs_server.start_in_process(**dict(GCS_DEFAULTS, **spec.get('gcs', {})))
+    ai_url, ai_process = stub_ai_server.start_in_process(**dict(AI_DEFAULTS, slots=concurrency, **spec.get('ai', {})))
+
+    os.environ.update(ANALYZE_ENV)
+    os.environ.update({
+        'AI_SERVICE_URL': ai_url,
+        'AI_HTTP_POOL_SIZE': str(concurrency),
+        'ASYNC_POOL_SIZE': str(concurrency * 2),
+        'STORAGE_EMULATOR_HOST': gcs_url,
+    })
+    os.environ.update(spec.get('env', {}))
+
+    sys.path.insert(0, SERVER_DIR)
+    import gcs_objects
+    import tracing
+
+    tracing.enable_histogram()
+    storage_client = stub_gcs_server.StubStorageClient(gcs_url, concurrency)
+    gcs_objects.get_storage_client = lambda: storage_client
+
+    import main
+    main.token_provider._fetcher = fake_token_fetcher()
+    if use_async:
+        import async_handler
+        handler = async_handler.analyze_crashed_car_async
+    else:
+        handler = main.analyze_crashed_car
+
+    def make_event(prefix, n):
+        return analysis_event(spec['kind'], prefix, n)
+
+    def stats():
+        snapshot = tracing.histogram.snapshot()
+        return {name: {'p50': round(s['p50'], 2), 'p99': round(s['p99'], 2)} for name, s in snapshot.items()}
+
+    def cleanup():
+        gcs_process.terminate()
+        ai_process.terminate()
+
+    return handler, make_event, stats, tracing.histogram.reset, cleanup
+
+
+def setup_notify(spec, concurrency):
+    """
+    가짜 Firestore/FCM을 설치하고 알림 핸들러를 가져옵니다.
+    """
+    import fake_firebase
+    from cloud_events import estimate_event
+
+    config = dict(NOTIFY_DEFAULTS, **spec.get('notify', {}))
+    os.environ.update(spec.get('env', {}))
+    os.environ.setdefault('FCM_MAX_WORKERS', '4')
+
+    db = fake_firebase.FakeFirestore(request_ms=config['firestore_ms'])
+    messaging = fake_firebase.FakeMessaging(call_ms=config['fcm_call_ms'], per_token_us=config['fcm_per_token_us'],
+                                            dead_rate=config['dead_rate'])
+    shop_ids = fake_firebase.populate(db, config['shops'], config['mechanics'])
+    fake_firebase.install(db, messaging)
+
+    sys.path.insert(0, NOTIFICATIONS_DIR)
+    import main
+
+    # 바쁜 정비소에 요청이 몰리는 분포 (상위 10% 정비소가 요청의 절반)
+    rng = random.Random(1)
+    hot = shop_ids[:max(1, len(shop_ids) // 10)]
+    lock = threading.Lock()
+
+    def make_event(prefix, n):
+        with lock:
+            shop_id = rng.choice(hot) if rng.random() < 0.5 else rng.choice(shop_ids)
+        return estimate_event(f"{prefix}-{n}", shop_id)
+
+    def stats():
+        return {'firestore': dict(db.stats), 'fcm': dict(messaging.stats)}
+
+    def reset():
+        for counters in (db.stats, messaging.stats):
+            for key in counters:
+                counters[key] = 0
+
+    return main.send_estimate_notification, make_event, stats, reset, lambda: None
+
+
+def drive(handler, events, concurrency):
+    """
+    concurrency개의 스레드(functions-framework의 요청 스레드에 해당)로 이벤트를 처리합니다.
+    (경과 시간, 이벤트별 지연 ms 목록, 실패 수)를 반환합니다.
+    """
+    def one(event):
+        started = time.perf_counter()
+        try:
+            handler(event)
+            failed = 0
+        except Exception:
+            failed = 1
+        return (time.perf_counter() - started) * 1000, failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, events))
+    elapsed = time.perf_counter() - started
+    return elapsed, [latency for latency, _ in results], sum(failed for _, failed in results)
+
+
+def run_worker(name, events, concurrency, warmup):
+    spec = SCENARIOS[name]
+    if spec['target'] == 'notify':
+        handler, make_event, stats, reset, cleanup = setup_notify(spec, concurrency)
+    else:
+        handler, make_event, stats, reset, cleanup = setup_analyze(spec, concurrency,
+                                                                   use_async=spec['target'] == 'analyze_async')
+    try:
+        # 핸들러 로그는 측정에서 빼고, 연결/토큰/지연 import 같은 1회성 비용은 warmup에서 치릅니다.
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            if warmup:
+                drive(handler, [make_event('warmup', n) for n in range(warmup)], concurrency)
+                reset()
+            elapsed, latencies, failures = drive(handler, [make_event('load', n) for n in range(events)],
+                                                 concurrency)
+    finally:
+        cleanup()
+
+    return {
+        'description': spec['description'],
+        'events': events,
+        'concurrency': concurrency,
+        'failures': failures,
+        'elapsed_s': round(elapsed, 3),
+        'throughput': round(events / elapsed, 2),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 2),
+            'p99': round(percentile(latencies, 99), 2),
+            'max': round(max(latencies), 2),
+            'mean': round(sum(latencies) / len(latencies), 2),
+        },
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'stats': stats(),
+    }
+
+
+def run_scenario(name, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        result_path = os.path.join(tmp, 'result.json')
+        command = [sys.executable, os.path.abspath(__file__), '--worker', name, '--result', result_path,
+                   '--events', str(args.events), '--concurrency', str(args.concurrency), '--warmup', str(args.warmup)]
+        completed = subprocess.run(command, cwd=SERVER_DIR, capture_output=True, text=True)
+        if completed.returncode != 0 or not os.path.exists(result_path):
+            return {'error': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else
+                    f"worker exited with {completed.returncode}"}
+        with open(result_path) as f:
+            return json.load(f)
+
+
+def _metric(result, path):
+    for key in path:
+        result = result[key]
+    return result
+
+
+def combine(runs):
+    """
+    같은 시나리오를 여러 번 실행한 결과를 하나로 합칩니다.
+    지표는 실행별 중앙값, events/failures는 합계이고, spread에는 비교 지표별 (최대 - 최소) / 중앙값을 남깁니다.
+    stats는 throughput이 중앙값인 실행의 것을 씁니다. 실패한 실행이 있으면 그 오류를 반환합니다.
+    """
+    for run in runs:
+        if 'error' in run:
+            return run
+    combined = copy.deepcopy(sorted(runs, key=lambda run: run['throughput'])[len(runs) // 2])
+    for path in MEDIAN_METRICS:
+        target = combined
+        for key in path[:-1]:
+            target = target[key]
+        target[path[-1]] = round(statistics.median(_metric(run, path) for run in runs), 2)
+    combined['events'] = sum(run['events'] for run in runs)
+    combined['failures'] = sum(run['failures'] for run in runs)
+    combined['repeats'] = len(runs)
+    spread = {}
+    for path, _ in COMPARED_METRICS:
+        values = [_metric(run, path) for run in runs]
+        middle = statistics.median(values)
+        spread['.'.join(path)] = round((max(values) - min(values)) / middle, 3) if middle else 0.0
+    combined['spread'] = spread
+    return combined
+
+
+def compare(results, baseline, tolerance):
+    """
+    기준선 대비 지표 변화를 출력하고, 허용 범위를 넘게 나빠진 (시나리오, 지표) 목록을 반환합니다.
+    """
+    regressions = []
+    base_settings, settings = baseline.get('settings', {}), results['settings']
+    if base_settings and base_settings != settings:
+        print(f"Warning: baseline settings {base_settings} differ from this run {settings}")
+
+    print(f"\n{'scenario':<22} {'metric':<16} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None or 'error' in previous or 'error' in current:
+            print(f"{name:<22} (no comparable baseline)")
+            continue
+        for path, higher_is_better in COMPARED_METRICS:
+            old, new = _metric(previous, path), _metric(current, path)
+            change = (new - old) / old if old else 0.0
+            worse = -change if higher_is_better else change
+            flag = ' REGRESSION' if worse > tolerance else ''
+            if flag:
+                regressions.append((name, '.'.join(path)))
+            print(f"{name:<22} {'.'.join(path):<16} {old:>10.1f} {new:>10.1f} {change:>+7.0%}{flag}")
+
+        old_rate = previous['failures'] / previous['events']
+        new_rate = current['failures'] / current['events']
+        if new_rate - old_rate > FAILURE_RATE_TOLERANCE:
+            regressions.append((name, 'failure_rate'))
+            print(f"{name:<22} {'failure_rate':<16} {old_rate:>10.1%} {new_rate:>10.1%} REGRESSION")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the server functions against local stand-ins")
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=None,
+                        help="scenarios to run (default: all)")
+    parser.add_argument('--events', type=int, default=500, help="measured events per scenario")
+    parser.add_argument('--concurrency', type=int, default=50, help="concurrent requests per instance")
+    parser.add_argument('--warmup', type=int, default=20, help="events processed before measuring")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="worker runs per scenario; metrics are the median across runs")
+    parser.add_argument('--output', default=os.path.join(tempfile.gettempdir(), 'loadtest_results.json'),
+                        help="where to write the JSON results (default: in the temp directory)")
+    parser.add_argument('--baseline', help="saved results to compare against (exit 1 on regression)")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed relative regression of a median metric (0.25 = 25%%)")
+    parser.add_argument('--list', action='store_true', help="list scenarios and exit")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.list:
+        for name, spec in SCENARIOS.items():
+            print(f"{name:<22} {spec['description']}")
+        return
+
+    if args.worker:
+        result = run_worker(args.worker, args.events, args.concurrency, args.warmup)
+        with open(args.result, 'w') as f:
+            json.dump(result, f)
+        return
+
+    results = {
+        'format': RESULT_FORMAT,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'host': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'settings': {'events': args.events, 'concurrency': args.concurrency, 'warmup': args.warmup,
+                     'repeat': args.repeat},
+        'scenarios': {},
+    }
+    print(f"{'scenario':<22} {'events/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'failed':>7} {'peak MB':>8} "
+          f"{'spread':>7}")
+    for name in args.scenarios or list(SCENARIOS):
+        result = results['scenarios'][name] = combine([run_scenario(name, args) for _ in range(max(1, args.repeat))])
+        if 'error' in result:
+            print(f"{name:<22} error: {result['error']}")
+            continue
+        latency = result['latency_ms']
+        print(f"{name:<22} {result['throughput']:>9.1f} {latency['p50']:>8.1f} {latency['p99']:>8.1f} "
+              f"{latency['max']:>8.1f} {result['failures']:>7} {result['peak_rss_mb']:>8.1f} "
+              f"{max(result['spread'].values()):>7.0%}")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    failed = [name for name, result in results['scenarios'].items() if 'error' in result]
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}: "
+                  + ', '.join(f"{name}:{metric}" for name, metric in regressions))
+            sys.exit(1)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+로컬 벤치마크용 AI 서비스 스텁.
+
+/predict(단건)와 /predict/batch(배치) 요청 본문(Content-Length 또는 chunked)을 끝까지 읽은 뒤
+고정된 분석 결과 JSON을 반환합니다. 실제 모델 없이 업로드/배치 경로만 측정할 때 사용합니다.
+
+추론 비용은 "요청당 고정 지연 + 이미지당 지연"으로 흉내 내며, slots개의 요청만 동시에
+추론할 수 있습니다(GPU 워커 수). 배치는 요청당 고정 지연을 여러 이미지가 나눠 갖게 됩니다.
+jitter_ms를 주면 요청마다 0~jitter_ms의 지연이 더해지고, error_rate 비율의 요청은
+추론 없이 error_status(기본 503, retry_after가 있으면 Retry-After 헤더 포함)로 응답합니다.
+
+    python benchmarks/stub_ai_server.py --port 8081 --base-ms 40 --per-image-ms 5 --slots 2
+    python benchmarks/stub_ai_server.py --base-ms 80 --jitter-ms 40 --error-rate 0.05 --error-status 503
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_PREDICTION = {
+    "damage_type": "scratch",
+    "severity": "minor",
+    "estimated_cost": 150000,
+}
+
+
+def _read_body(handler, keep=False):
+    # 본문을 읽고 (총 바이트 수, keep=True면 본문 bytes)를 반환합니다.
+    total = 0
+    kept = []
+
+    def consume(n):
+        nonlocal total
+        while n:
+            chunk = handler.rfile.read(min(n, 65536))
+            if not chunk:
+                break
+            n -= len(chunk)
+            total += len(chunk)
+            if keep:
+                kept.append(chunk)
+
+    if handler.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+        while True:
+            size = int(handler.rfile.readline().split(b';')[0].strip(), 16)
+            if size == 0:
+                handler.rfile.readline()
+                break
+            consume(size)
+            handler.rfile.readline()
+    else:
+        consume(int(handler.headers.get('Content-Length', 0)))
+    return total, b''.join(kept)
+
+
+class StubAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _infer(self, images):
+        config = self.server.config
+        jitter = random.uniform(0, config['jitter_ms']) if config['jitter_ms'] else 0.0
+        with self.server.slots:
+            time.sleep((config['base_ms'] + config['per_image_ms'] * images + jitter) / 1000.0)
+
+    def _inject_error(self):
+        # 과부하/장애 중인 서비스를 흉내 냅니다. 본문은 읽어서 버려야 keep-alive 연결이 유지됩니다.
+        config = self.server.config
+        if not config['error_rate'] or random.random() >= config['error_rate']:
+            return False
+        _read_body(self)
+        body = json.dumps({"error": "injected failure"}).encode('utf-8')
+        self.send_response(config['error_status'])
+        if config['retry_after'] is not None:
+            self.send_header('Retry-After', str(config['retry_after']))
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return True
+
+    def do_POST(self):
+        path = self.path.split('?', 1)[0]
+        config = self.server.config
+        if self._inject_error():
+            return
+        if path == config['batch_path']:
+            if not config['batch']:
+                _read_body(self)
+                self._send_json(404, {"error": "batch endpoint not supported"})
+                return
+            received, body = _read_body(self, keep=True)
+            images = body.count(b'name="files"')
+            self._infer(images)
+            self._send_json(200, {"results": [dict(STUB_PREDICTION, index=i) for i in range(images)]})
+            return
+
+        received, _ = _read_body(self)
+        self._infer(1)
+        self._send_json(200, dict(STUB_PREDICTION, received_bytes=received))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 동시 연결이 한꺼번에 몰려도 SYN 재전송(1초 지연)이 생기지 않도록 listen backlog를 넉넉히 잡습니다.
+    request_queue_size = 1024
+
+
+def make_server(host='127.0.0.1', port=0, base_ms=0.0, per_image_ms=0.0, slots=64, batch=True,
+                batch_path='/predict/batch', jitter_ms=0.0, error_rate=0.0, error_status=503, retry_after=None,
+                handler=StubAIHandler):
+    server = StubAIServer((host, port), handler)
+    server.config = {
+        'base_ms': base_ms,
+        'per_image_ms': per_image_ms,
+        'jitter_ms': jitter_ms,
+        'error_rate': error_rate,
+        'error_status': error_status,
+        'retry_after': retry_after,
+        'batch': batch,
+        'batch_path': batch_path,
+    }
+    server.slots = threading.BoundedSemaphore(slots)
+    return server
+
+
+def start_in_thread(host='127.0.0.1', port=0, **config):
+    """
+    같은 프로세스의 데몬 스레드에서 스텁 서버를 띄우고 (base_url, server)를 반환합니다.
+    """
+    server = make_server(host, port, **config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://{host}:{server.server_port}", server
+
+
+def _serve(host, port, config, ready):
+    server = make_server(host, port, **config)
+    ready.put(server.server_port)
+    server.serve_forever()
+
+
+def start_in_process(host='127.0.0.1', port=0, **config):
+    """
+    별도 프로세스에서 스텁 서버를 띄웁니다. 측정에 서버 측 할당/GIL 경합이 섞이지 않게 할 때 사용합니다.
+    (base_url, process)를 반환하며, 끝나면 process.terminate()를 호출하세요.
+    """
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(host, port, config, ready), daemon=True)
+    process.start()
+    return f"http://{host}:{ready.get(timeout=10)}", process
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--base-ms', type=float, default=0.0, help="fixed inference latency per request")
+    parser.add_argument('--per-image-ms', type=float, default=0.0, help="additional latency per image")
+    parser.add_argument('--slots', type=int, default=64, help="requests that can run inference concurrently")
+    parser.add_argument('--no-batch', action='store_true', help="answer 404 on the batch endpoint")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="random extra latency per request (0..N)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument('--error-status', type=int, default=503, help="status code of injected failures")
+    parser.add_argument('--retry-after', type=float, default=None, help="Retry-After seconds on injected failures")
+    args = parser.parse_args()
+    server = make_server(args.host, args.port, base_ms=args.base_ms, per_image_ms=args.per_image_ms,
+                         slots=args.slots, batch=not args.no_batch, jitter_ms=args.jitter_ms,
+                         error_rate=args.error_rate, error_status=args.error_status, retry_after=args.retry_after)
+    print(f"Stub AI service listening on http://{args.host}:{server.server_port}")
+    server.serve_forever()
@@ -0,0 +1,220 @@
+"""
+로컬 벤치마크용 GCS JSON API 스텁.
+
+GET /storage/v1/b/{bucket}/o/{object}는 객체 리소스 JSON을, ?alt=media를 붙이면 본문을 반환합니다.
+모든 객체 이름에 대해 같은 크기의 본문을 돌려주며, md5Hash는 객체 이름에서 만들어
+객체마다 예측 캐시 키가 달라지게 합니다. fields 파라미터가 있으면 그 필드만 담습니다.
+
+지연은 요청 종류별 고정 값(metadata_ms, media_ms)으로 흉내 냅니다.
+StubStorageClient는 동기 핸들러(storage.Client 경로)를 같은 스텁으로 보내는 클라이언트입니다.
+
+    python benchmarks/stub_gcs_server.py --port 8082 --object-kb 200 --metadata-ms 15 --media-ms 30
+"""
+import argparse
+import base64
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+import requests
+
+GENERATION = '1700000000000000'
+
+
+def object_resource(bucket, name, size, car_model):
+    digest = hashlib.md5(f"{bucket}/{name}".encode('utf-8')).digest()
+    return {
+        'bucket': bucket,
+        'name': name,
+        'generation': GENERATION,
+        'size': str(size),
+        'contentType': 'image/jpeg',
+        'md5Hash': base64.b64encode(digest).decode('ascii'),
+        'crc32c': base64.b64encode(digest[:4]).decode('ascii'),
+        'metadata': {'carModel': car_model},
+    }
+
+
+class StubGCSHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        config = self.server.config
+        url = urlsplit(self.path)
+        parts = url.path.split('/')
+        # ['', 'storage', 'v1', 'b', bucket, 'o', object]
+        if len(parts) != 7 or parts[1:4] != ['storage', 'v1', 'b'] or parts[5] != 'o':
+            self._send(404, b'{"error": "not found"}', 'application/json')
+            return
+        bucket, name = unquote(parts[4]), unquote(parts[6])
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if query.get('alt') == 'media':
+            time.sleep(config['media_ms'] / 1000.0)
+            self._send(200, self.server.payload, 'image/jpeg', {'x-goog-generation': GENERATION})
+            return
+
+        time.sleep(config['metadata_ms'] / 1000.0)
+        resource = object_resource(bucket, name, len(self.server.payload), config['car_model'])
+        if query.get('fields'):
+            fields = query['fields'].split(',')
+            resource = {key: value for key, value in resource.items() if key in fields}
+        self._send(200, json.dumps(resource).encode('utf-8'), 'application/json')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubGCSServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 동시 연결이 한꺼번에 몰려도 SYN 재전송(1초 지연)이 생기지 않도록 listen backlog를 넉넉히 잡습니다.
+    request_queue_size = 1024
+
+
+def make_server(host='127.0.0.1', port=0, object_bytes=200 * 1024, metadata_ms=0.0, media_ms=0.0,
+                car_model='sedan', payload=None, handler=StubGCSHandler):
+    server = StubGCSServer((host, port), handler)
+    server.config = {'metadata_ms': metadata_ms, 'media_ms': media_ms, 'car_model': car_model}
+    # 실제 업로드처럼 보이도록 JPEG 시그니처로 시작하는 본문
+    server.payload = payload if payload is not None else b'\xff\xd8\xff\xe0' + os.urandom(max(0, object_bytes - 4))
+    return server
+
+
+def start_in_thread(host='127.0.0.1', port=0, **config):
+    """
+    같은 프로세스의 데몬 스레드에서 스텁 서버를 띄우고 (base_url, server)를 반환합니다.
+    """
+    server = make_server(host, port, **config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://{host}:{server.server_port}", server
+
+
+def _serve(host, port, config, ready):
+    server = make_server(host, port, **config)
+    ready.put(server.server_port)
+    server.serve_forever()
+
+
+def start_in_process(host='127.0.0.1', port=0, **config):
+    """
+    별도 프로세스에서 스텁 서버를 띄웁니다. (base_url, process)를 반환하며, 끝나면 process.terminate()를 호출하세요.
+    """
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(host, port, config, ready), daemon=True)
+    process.start()
+    return f"http://{host}:{ready.get(timeout=10)}", process
+
+
+class StubBlob:
+    """
+    동기 핸들러가 쓰는 Blob 인터페이스(generation, md5_hash, content_type, metadata, download_to_file, open)를
+    스텁 GCS에 대한 HTTP 요청으로 구현합니다.
+    """
+
+    def __init__(self, client, bucket_name, name, generation=None, properties=None):
+        self.client = client
+        self.bucket_name = bucket_name
+        self.name = name
+        self._properties = dict(properties or {})
+        if generation is not None:
+            self._properties['generation'] = str(generation)
+
+    @property
+    def path(self):
+        return f"/b/{quote(self.bucket_name, safe='')}/o/{quote(self.name, safe='')}"
+
+    @property
+    def generation(self):
+        generation = self._properties.get('generation')
+        return int(generation) if generation is not None else None
+
+    @property
+    def md5_hash(self):
+        return self._properties.get('md5Hash')
+
+    @property
+    def content_type(self):
+        return self._properties.get('contentType')
+
+    @property
+    def metadata(self):
+        return self._properties.get('metadata')
+
+    def download_to_file(self, file_obj):
+        params = {'alt': 'media'}
+        if self.generation is not None:
+            params['generation'] = self.generation
+        response = self.client.session.get(self.client.api_url + self.path, params=params)
+        response.raise_for_status()
+        file_obj.write(response.content)
+
+    def open(self, mode='rb', chunk_size=None):
+        # streaming 업로드 모드용: 응답 본문을 청크 단위로 읽는 file-like 객체를 반환합니다.
+        params = {'alt': 'media'}
+        if self.generation is not None:
+            params['generation'] = self.generation
+        response = self.client.session.get(self.client.api_url + self.path, params=params, stream=True)
+        response.raise_for_status()
+        return response.raw
+
+
+class StubStorageClient:
+    """
+    gcs_objects가 쓰는 storage.Client 인터페이스(bucket().blob(), bucket().get_blob())를 스텁 GCS로 보냅니다.
+    gcs_objects.get_storage_client를 이 객체를 반환하도록 바꿔 끼워 사용합니다.
+    """
+
+    def __init__(self, base_url, pool_size):
+        self.api_url = base_url.rstrip('/') + '/storage/v1'
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+
+    def bucket(self, bucket_name):
+        client = self
+
+        class _Bucket:
+            def blob(self, name, generation=None):
+                return StubBlob(client, bucket_name, name, generation)
+
+            def get_blob(self, name, generation=None):
+                blob = StubBlob(client, bucket_name, name, generation)
+                params = {'projection': 'noAcl'}
+                if generation is not None:
+                    params['generation'] = generation
+                response = client.session.get(client.api_url + blob.path, params=params)
+                if response.status_code == 404:
+                    return None
+                response.raise_for_status()
+                return StubBlob(client, bucket_name, name, properties=response.json())
+
+        return _Bucket()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8082)
+    parser.add_argument('--object-kb', type=int, default=200, help="size of every object body")
+    parser.add_argument('--metadata-ms', type=float, default=0.0, help="latency of object metadata requests")
+    parser.add_argument('--media-ms', type=float, default=0.0, help="latency of media downloads")
+    parser.add_argument('--car-model', default='sedan')
+    args = parser.parse_args()
+    server = make_server(args.host, args.port, object_bytes=args.object_kb * 1024, metadata_ms=args.metadata_ms,
+                         media_ms=args.media_ms, car_model=args.car_model)
+    print(f"Stub GCS listening on http://{args.host}:{server.server_port} (STORAGE_EMULATOR_HOST)")
+    server.serve_forever()
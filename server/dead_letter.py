@@ -0,0 +1,464 @@
+"""
+처리에 실패한 분석 이벤트의 dead-letter 저장소와 백오프 재처리 스케줄러.
+
+analyze_crashed_car에서 예외가 나면 이벤트를 다시 발생시키는 대신(플랫폼 재시도는 백오프를 조절할 수 없어
+AI 서비스 장애 중에 재시도 폭주를 만듭니다) 실패를 분류해 저장소에 넣고 이벤트는 정상 처리로 응답합니다.
+- transient(네트워크 오류, 타임아웃, 429/5xx, 서킷 브레이커 열림 등): 지수 백오프로 다음 시도 시각을 정해 대기
+- permanent(디코딩할 수 없는 이미지, 4xx 응답, 설정 오류 등): 재시도하지 않고 parked 상태로 보관
+
+잘못된 파일명이나 이미지가 아닌 업로드처럼 검증 단계에서 걸러지는 이벤트는 예외 없이 건너뛰므로 여기로 오지 않습니다.
+
+RetryScheduler는 다시 시도할 때가 된 이벤트를 동시 처리 수를 제한해 재처리합니다. 첫 이벤트를 카나리로 먼저
+처리해 실패하면 이번 회차를 멈추고, AI 서비스의 서킷 브레이커가 열려 있는 동안에는 새로 꺼내지 않습니다.
+
+    python dead_letter.py list
+    python dead_letter.py drain --loop --interval 60
+    python dead_letter.py requeue EVENT_ID
+"""
+import fcntl
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# dead-letter 설정 (환경 변수로 조정)
+# 백엔드: none(기존처럼 예외를 다시 발생시켜 플랫폼 재시도) | file(로컬 전용) | firestore
+# Cloud Run/Functions에서는 /tmp가 인스턴스마다 따로 있는 메모리 파일시스템이라 file은 쓸 수 없습니다.
+DEAD_LETTER_BACKEND = os.environ.get("DEAD_LETTER_BACKEND", "none").lower()
+DEAD_LETTER_PATH = os.environ.get("DEAD_LETTER_PATH", "/tmp/dead_letters")
+DEAD_LETTER_COLLECTION = os.environ.get("DEAD_LETTER_COLLECTION", "failed_analyses")
+# 재시도 간격: min(max, base * 2^(시도 횟수-1))의 절반 + 나머지 절반 안의 지터
+DEAD_LETTER_BASE_DELAY = float(os.environ.get("DEAD_LETTER_BASE_DELAY", 60))
+DEAD_LETTER_MAX_DELAY = float(os.environ.get("DEAD_LETTER_MAX_DELAY", 3600))
+# 이 횟수만큼 실패하면 더 재시도하지 않고 parked로 보관
+DEAD_LETTER_MAX_ATTEMPTS = int(os.environ.get("DEAD_LETTER_MAX_ATTEMPTS", 8))
+# 재처리 시 동시에 처리할 이벤트 수와 한 회차에 꺼낼 최대 이벤트 수
+DEAD_LETTER_CONCURRENCY = int(os.environ.get("DEAD_LETTER_CONCURRENCY", 4))
+DEAD_LETTER_BATCH_SIZE = int(os.environ.get("DEAD_LETTER_BATCH_SIZE", 50))
+# 꺼낸 이벤트를 다른 스케줄러가 가져가지 못하게 하는 시간 (함수 타임아웃보다 길게)
+DEAD_LETTER_LEASE = float(os.environ.get("DEAD_LETTER_LEASE", 600))
+
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+
+PENDING = 'pending'
+PARKED = 'parked'
+
+# 응답 상태 코드로 판단할 때 다시 시도할 만한 코드 (그 밖의 4xx는 permanent)
+TRANSIENT_STATUS = (408, 425, 429, 500, 502, 503, 504)
+# 상태 코드가 없는 예외는 클래스 이름(상속 포함)으로 판단합니다. 선택 의존성(aiohttp, google-api-core)을
+# import하지 않고도 분류할 수 있게 이름으로 비교합니다.
+TRANSIENT_ERRORS = (
+    'ConnectionError', 'Timeout', 'TimeoutError', 'ChunkedEncodingError', 'CircuitOpenError',
+    'ClientConnectionError', 'ServerDisconnectedError', 'TransportError', 'RefreshError',
+    'ServiceUnavailable', 'TooManyRequests', 'InternalServerError', 'GatewayTimeout', 'DeadlineExceeded',
+)
+PERMANENT_ERRORS = (
+    'UnidentifiedImageError', 'DecompressionBombError', 'ValueError', 'KeyError', 'TypeError', 'NotFound',
+)
+
+
+def _status_code(error):
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status is None:
+        # aiohttp.ClientResponseError.status, google.api_core 예외의 code
+        status = getattr(error, 'status', None) or getattr(error, 'code', None)
+    return status if isinstance(status, int) else None
+
+
+def classify(error):
+    """
+    예외를 TRANSIENT 또는 PERMANENT로 분류합니다. 판단할 수 없으면 TRANSIENT로 보고
+    최대 시도 횟수 안에서 다시 시도합니다.
+    """
+    names = {cls.__name__ for cls in type(error).__mro__}
+    if names & set(TRANSIENT_ERRORS):
+        return TRANSIENT
+    status = _status_code(error)
+    if status is not None:
+        return TRANSIENT if status in TRANSIENT_STATUS or status >= 500 else PERMANENT
+    if names & set(PERMANENT_ERRORS):
+        return PERMANENT
+    return TRANSIENT
+
+
+def retry_delay(attempts, base=None, maximum=None):
+    """
+    attempts번 실패한 뒤 다음 시도까지 기다릴 시간(초).
+    같은 장애로 함께 실패한 이벤트들이 같은 시각에 몰리지 않도록 절반은 지터로 흩뜨립니다.
+    """
+    base = DEAD_LETTER_BASE_DELAY if base is None else base
+    maximum = DEAD_LETTER_MAX_DELAY if maximum is None else maximum
+    delay = min(maximum, base * (2 ** max(0, attempts - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class StoredEvent:
+    """
+    저장된 이벤트를 핸들러에 다시 넘기기 위한 CloudEvent 대역 (event["id"], event["type"], event.data).
+    """
+
+    def __init__(self, attributes, data):
+        self._attributes = dict(attributes)
+        self.data = data
+
+    def __getitem__(self, key):
+        return self._attributes[key]
+
+    def get(self, key, default=None):
+        return self._attributes.get(key, default)
+
+
+def _event_attributes(cloud_event):
+    attributes = {}
+    for key in ('id', 'type', 'source', 'subject', 'time'):
+        try:
+            value = cloud_event[key]
+        except KeyError:
+            continue
+        if value is not None:
+            attributes[key] = value
+    return attributes
+
+
+def failed_record(previous, cloud_event, error, now, max_attempts=None):
+    """
+    실패 한 번을 반영한 저장 기록을 만듭니다. previous는 같은 이벤트의 기존 기록(없으면 None)입니다.
+    """
+    max_attempts = max_attempts or DEAD_LETTER_MAX_ATTEMPTS
+    classification = classify(error)
+    attempts = (previous['attempts'] if previous else 0) + 1
+    record = {
+        'eventId': cloud_event['id'],
+        'event': {'attributes': _event_attributes(cloud_event), 'data': cloud_event.data},
+        'classification': classification,
+        'error': f"{type(error).__name__}: {error}",
+        'attempts': attempts,
+        'firstFailedAt': previous['firstFailedAt'] if previous else now,
+        'lastFailedAt': now,
+        'leaseUntil': 0,
+    }
+    if classification == PERMANENT or attempts >= max_attempts:
+        record.update(state=PARKED, nextAttemptAt=None)
+    else:
+        record.update(state=PENDING, nextAttemptAt=now + retry_delay(attempts))
+    return record
+
+
+def _is_due(record, now):
+    return record['state'] == PENDING and record['nextAttemptAt'] <= now and record.get('leaseUntil', 0) <= now
+
+
+def _doc_id(event_id):
+    return hashlib.sha256(event_id.encode('utf-8')).hexdigest()
+
+
+class FileDeadLetterStore:
+    """
+    디렉터리 기반 dead-letter 저장소. 이벤트마다 JSON 파일 하나를 두고 flock으로 읽기-수정-쓰기를 직렬화합니다.
+    로컬 실행과 테스트용입니다. Cloud Run에서는 인스턴스가 내려가면 저장된 이벤트도 사라지고 drain 함수가
+    다른 인스턴스에서 돌면 보이지도 않으므로, create_dead_letter_store()가 거부합니다.
+    """
+
+    def __init__(self, path=None, clock=time.time):
+        self.path = path or DEAD_LETTER_PATH
+        self._clock = clock
+        self._thread_lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        self._lock_path = os.path.join(self.path, '.lock')
+
+    def _file(self, event_id):
+        return os.path.join(self.path, _doc_id(event_id) + '.json')
+
+    @contextmanager
+    def _locked(self):
+        # 스레드 간에는 threading.Lock, 프로세스 간에는 flock으로 직렬화합니다.
+        with self._thread_lock:
+            fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+    def _read_file(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write(self, record):
+        target = self._file(record['eventId'])
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(record, f, default=str)
+        os.replace(tmp, target)
+
+    def _records(self):
+        for name in sorted(os.listdir(self.path)):
+            if name.endswith('.json'):
+                record = self._read_file(os.path.join(self.path, name))
+                if record is not None:
+                    yield record
+
+    def record_failure(self, cloud_event, error):
+        with self._locked():
+            record = failed_record(self._read_file(self._file(cloud_event['id'])), cloud_event, error,
+                                   self._clock())
+            self._write(record)
+            return record
+
+    def lease_due(self, limit, lease=None):
+        """
+        다시 시도할 때가 된 이벤트를 nextAttemptAt 순으로 최대 limit개 꺼내 lease를 걸고 반환합니다.
+        """
+        lease = DEAD_LETTER_LEASE if lease is None else lease
+        with self._locked():
+            now = self._clock()
+            due = sorted((r for r in self._records() if _is_due(r, now)), key=lambda r: r['nextAttemptAt'])[:limit]
+            for record in due:
+                record['leaseUntil'] = now + lease
+                self._write(record)
+            return due
+
+    def release(self, event_id):
+        """
+        시도하지 않은 이벤트의 lease를 풀어 다음 회차에 다시 꺼낼 수 있게 합니다.
+        """
+        with self._locked():
+            record = self._read_file(self._file(event_id))
+            if record is not None:
+                record['leaseUntil'] = 0
+                self._write(record)
+
+    def resolve(self, event_id):
+        with self._locked():
+            try:
+                os.remove(self._file(event_id))
+            except FileNotFoundError:
+                pass
+
+    def requeue(self, event_id):
+        """
+        parked 이벤트를 시도 횟수를 초기화해 바로 다시 시도하도록 되돌립니다. 없으면 False.
+        """
+        with self._locked():
+            record = self._read_file(self._file(event_id))
+            if record is None:
+                return False
+            record.update(state=PENDING, attempts=0, nextAttemptAt=self._clock(), leaseUntil=0)
+            self._write(record)
+            return True
+
+    def list(self, state=None):
+        with self._locked():
+            return [r for r in self._records() if state is None or r['state'] == state]
+
+
+class FirestoreDeadLetterStore:
+    """
+    Firestore 기반 dead-letter 저장소. 여러 인스턴스와 스케줄러가 같은 대기열을 공유합니다.
+    lease_due는 state/nextAttemptAt 복합 색인이 필요합니다.
+    """
+
+    def __init__(self, collection=None, client=None, clock=time.time):
+        if client is None:
+            from google.cloud import firestore
+            client = firestore.Client()
+        self._client = client
+        self.collection = client.collection(collection or DEAD_LETTER_COLLECTION)
+        self._clock = clock
+
+    def _doc(self, event_id):
+        return self.collection.document(_doc_id(event_id))
+
+    def record_failure(self, cloud_event, error):
+        from google.cloud import firestore
+
+        doc_ref = self._doc(cloud_event['id'])
+
+        @firestore.transactional
+        def _record(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            record = failed_record(snapshot.to_dict() if snapshot.exists else None, cloud_event, error,
+                                   self._clock())
+            transaction.set(doc_ref, record)
+            return record
+
+        return _record(self._client.transaction())
+
+    def lease_due(self, limit, lease=None):
+        from google.cloud import firestore
+
+        lease = DEAD_LETTER_LEASE if lease is None else lease
+        now = self._clock()
+        query = (self.collection.where('state', '==', PENDING).where('nextAttemptAt', '<=', now)
+                 .order_by('nextAttemptAt').limit(limit))
+
+        @firestore.transactional
+        def _lease(transaction, doc_ref):
+            # 다른 스케줄러가 먼저 가져갔는지 트랜잭션 안에서 다시 확인합니다.
+            snapshot = doc_ref.get(transaction=transaction)
+            record = snapshot.to_dict() if snapshot.exists else None
+            if record is None or not _is_due(record, now):
+                return None
+            record['leaseUntil'] = now + lease
+            transaction.update(doc_ref, {'leaseUntil': record['leaseUntil']})
+            return record
+
+        leased = []
+        for snapshot in query.stream():
+            record = _lease(self._client.transaction(), snapshot.reference)
+            if record is not None:
+                leased.append(record)
+        return leased
+
+    def release(self, event_id):
+        self._doc(event_id).update({'leaseUntil': 0})
+
+    def resolve(self, event_id):
+        self._doc(event_id).delete()
+
+    def requeue(self, event_id):
+        doc_ref = self._doc(event_id)
+        if not doc_ref.get().exists:
+            return False
+        doc_ref.update({'state': PENDING, 'attempts': 0, 'nextAttemptAt': self._clock(), 'leaseUntil': 0})
+        return True
+
+    def list(self, state=None):
+        query = self.collection.where('state', '==', state) if state else self.collection
+        return [snapshot.to_dict() for snapshot in query.stream()]
+
+
+class RetryScheduler:
+    """
+    dead-letter 저장소에서 시도할 때가 된 이벤트를 꺼내 handler(cloud_event)로 다시 처리합니다.
+
+    - 첫 이벤트를 카나리로 혼자 처리하고, transient 실패면 서비스가 아직 회복되지 않은 것으로 보고
+      나머지는 lease를 풀어 돌려놓습니다.
+    - 나머지는 concurrency개씩 동시에 처리합니다. healthy()가 False가 되면(예: 서킷 브레이커가 열림)
+      아직 시작하지 않은 이벤트는 시도하지 않고 돌려놓습니다.
+    - 성공하면 저장소에서 지우고, 실패하면 시도 횟수를 늘려 백오프 뒤로 미루거나 parked로 보관합니다.
+    """
+
+    def __init__(self, store, handler, healthy=None, concurrency=None, batch_size=None, lease=None):
+        self.store = store
+        self.handler = handler
+        self.healthy = healthy or (lambda: True)
+        self.concurrency = concurrency or DEAD_LETTER_CONCURRENCY
+        self.batch_size = batch_size or DEAD_LETTER_BATCH_SIZE
+        self.lease = DEAD_LETTER_LEASE if lease is None else lease
+
+    def _replay(self, record):
+        attributes = record['event']['attributes']
+        event = StoredEvent(attributes, record['event']['data'])
+        try:
+            self.handler(event)
+        except Exception as e:
+            updated = self.store.record_failure(event, e)
+            print(f"Retry of event {record['eventId']} failed ({updated['classification']}, "
+                  f"attempt {updated['attempts']}, {updated['state']}): {updated['error']}")
+            return updated['state'], updated['classification']
+        self.store.resolve(record['eventId'])
+        return 'resolved', None
+
+    def drain_once(self):
+        """
+        한 회차를 처리하고 {'resolved', 'pending', 'parked', 'deferred'} 건수를 반환합니다.
+        """
+        stats = {'resolved': 0, PENDING: 0, PARKED: 0, 'deferred': 0}
+        if not self.healthy():
+            return stats
+        records = self.store.lease_due(self.batch_size, self.lease)
+        if not records:
+            return stats
+
+        canary, rest = records[0], records[1:]
+        outcome, classification = self._replay(canary)
+        stats[outcome] += 1
+        if classification == TRANSIENT:
+            for record in rest:
+                self.store.release(record['eventId'])
+            stats['deferred'] += len(rest)
+            return stats
+
+        lock = threading.Lock()
+        halted = threading.Event()
+
+        def one(record):
+            if halted.is_set() or not self.healthy():
+                halted.set()
+                self.store.release(record['eventId'])
+                outcome = 'deferred'
+            else:
+                outcome, _ = self._replay(record)
+            with lock:
+                stats[outcome] += 1
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='dead-letter') as pool:
+            list(pool.map(one, rest))
+        return stats
+
+
+def create_dead_letter_store(backend=None):
+    """
+    환경 변수 설정에 맞는 dead-letter 저장소를 만듭니다. 'none'이면 None을 반환합니다.
+    Cloud Run(K_SERVICE가 설정됨)에서 'file'을 고르면 실패 이벤트를 잃게 되므로 ValueError를 발생시킵니다.
+    """
+    backend = (backend or DEAD_LETTER_BACKEND).lower()
+    if backend == 'file':
+        if os.environ.get('K_SERVICE'):
+            raise ValueError("DEAD_LETTER_BACKEND=file is local-only; use firestore on Cloud Run")
+        return FileDeadLetterStore()
+    if backend == 'firestore':
+        return FirestoreDeadLetterStore()
+    return None
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect and drain dead-lettered analysis events")
+    commands = parser.add_subparsers(dest='command', required=True)
+    list_parser = commands.add_parser('list', help="show stored events")
+    list_parser.add_argument('--state', choices=[PENDING, PARKED])
+    drain_parser = commands.add_parser('drain', help="retry due events through analyze_crashed_car")
+    drain_parser.add_argument('--loop', action='store_true', help="keep draining every --interval seconds")
+    drain_parser.add_argument('--interval', type=float, default=60)
+    drain_parser.add_argument('--concurrency', type=int, default=None)
+    requeue_parser = commands.add_parser('requeue', help="retry a parked event on the next drain")
+    requeue_parser.add_argument('event_id')
+    args = parser.parse_args(argv)
+
+    store = create_dead_letter_store()
+    if store is None:
+        parser.error("DEAD_LETTER_BACKEND is not set (file or firestore)")
+
+    if args.command == 'list':
+        for record in store.list(args.state):
+            print(json.dumps({key: record[key] for key in ('eventId', 'state', 'classification', 'attempts',
+                                                           'nextAttemptAt', 'error')}, default=str))
+    elif args.command == 'requeue':
+        if not store.requeue(args.event_id):
+            parser.error(f"no dead-lettered event {args.event_id}")
+    else:
+        import main as handler
+
+        scheduler = handler.create_retry_scheduler(store, concurrency=args.concurrency)
+        while True:
+            print(f"Dead-letter drain: {scheduler.drain_once()}")
+            if not args.loop:
+                break
+            time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
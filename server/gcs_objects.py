@@ -0,0 +1,149 @@
+import os
+import re
+import threading
+
+# 분석에 필요한 객체 필드 (GCS JSON API 리소스 이름)
+# metadata는 carModel을, md5Hash는 예측 캐시 키를, generation은 멱등성 키를 위해 필요합니다.
+REQUIRED_FIELDS = ('generation', 'md5Hash', 'contentType', 'metadata')
+# 객체에 값이 없으면 리소스에서 빠지는 필드 (사용자 메타데이터가 없는 객체, md5Hash가 없는 Composite 객체)
+OPTIONAL_FIELDS = ('md5Hash', 'metadata')
+
+_AUDIT_RESOURCE_RE = re.compile(r'projects/_/buckets/(.*?)/objects/(.*)')
+
+# 시작 직후 백그라운드에서 storage 클라이언트를 미리 만들어 둘지 여부 (기본 켜짐)
+STORAGE_WARMUP = os.environ.get("STORAGE_WARMUP", "1") == "1"
+
+_storage_client = None
+_storage_client_lock = threading.Lock()
+
+
+def get_storage_client():
+    """
+    인스턴스 전체에서 하나의 storage.Client를 공유합니다. (커넥션 풀과 인증 정보 재사용)
+    google.cloud.storage는 import 비용이 커서 첫 호출 시점에 가져옵니다.
+    """
+    global _storage_client
+    if _storage_client is None:
+        with _storage_client_lock:
+            if _storage_client is None:
+                from google.cloud import storage
+
+                _storage_client = storage.Client()
+    return _storage_client
+
+
+def warm_up_storage_client():
+    """
+    데몬 스레드에서 storage 클라이언트를 미리 생성합니다.
+    컨테이너가 포트를 연 뒤(시작 CPU 부스트 구간)에 import가 진행되므로
+    시작 시간에는 포함되지 않고, 보통 첫 이벤트가 오기 전에 끝납니다.
+    실패해도 첫 이벤트에서 다시 시도하므로 예외는 로그만 남깁니다.
+    """
+    def _warm():
+        try:
+            get_storage_client()
+        except Exception as e:
+            print(f"Storage client warm-up failed: {e}")
+
+    thread = threading.Thread(target=_warm, name='storage-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+class ObjectDescriptor:
+    """
+    이벤트에서 해석한 GCS 객체 정보.
+
+    Direct Storage 트리거는 객체 리소스 전체를 이벤트에 담아 보내므로 그대로 사용하고,
+    Audit Log 트리거처럼 빠진 필드가 있을 때만 resolve()에서 객체 메타데이터를 한 번 조회해 채웁니다.
+    """
+
+    def __init__(self, bucket_name, name, source, resource=None):
+        self.bucket_name = bucket_name
+        self.name = name
+        self.source = source
+        self.resource = dict(resource or {})
+        self.fetched_fields = ()
+
+    @property
+    def content_type(self):
+        return self.resource.get('contentType') or ''
+
+    @property
+    def metadata(self):
+        return self.resource.get('metadata') or {}
+
+    @property
+    def generation(self):
+        generation = self.resource.get('generation')
+        return int(generation) if generation is not None else None
+
+    @property
+    def content_hash(self):
+        # crc32c는 32비트 체크섬이라 충돌 시 다른 사용자의 예측 결과를 돌려줄 수 있으므로 쓰지 않습니다.
+        # md5Hash가 없는 객체(Composite 등)는 None으로 두어 예측 캐시를 건너뜁니다.
+        return self.resource.get('md5Hash')
+
+    @property
+    def car_model(self):
+        return self.metadata.get('carModel', 'unknown')
+
+    def missing_fields(self):
+        """
+        이벤트에 없는 필드 목록.
+        Direct Storage 이벤트는 객체 리소스 전체이므로 OPTIONAL_FIELDS가 없으면 값이 없는 것으로 보고 조회하지 않습니다.
+        """
+        optional = OPTIONAL_FIELDS if self.source == 'storage' else ()
+        return [field for field in REQUIRED_FIELDS if field not in self.resource and field not in optional]
+
+    def resolve(self, client=None):
+        """
+        빠진 필드가 있으면 GCS에서 객체 메타데이터를 한 번 조회해 채웁니다. 모두 있으면 네트워크 요청을 하지 않습니다.
+        이벤트에 generation이 있으면 같은 버전을 조회해 중간에 덮어쓴 객체와 섞이지 않게 합니다.
+        객체가 없으면 google.api_core.exceptions.NotFound가 발생합니다.
+        """
+        missing = self.missing_fields()
+        if not missing:
+            return self
+
+        client = client or get_storage_client()
+        blob = client.bucket(self.bucket_name).get_blob(self.name, generation=self.generation)
+        if blob is None:
+            from google.api_core.exceptions import NotFound
+
+            raise NotFound(f"gs://{self.bucket_name}/{self.name} (generation {self.generation}) not found")
+        fetched = {
+            'generation': str(blob.generation),
+            'md5Hash': blob.md5_hash,
+            'contentType': blob.content_type,
+            'metadata': blob.metadata or {},
+        }
+        self.resource.update({field: fetched[field] for field in missing})
+        self.fetched_fields = tuple(missing)
+        return self
+
+    def blob(self, client=None):
+        """
+        다운로드용 Blob을 만듭니다. 해석한 generation을 지정하므로 reload 없이 같은 버전을 내려받습니다.
+        """
+        client = client or get_storage_client()
+        return client.bucket(self.bucket_name).blob(self.name, generation=self.generation)
+
+
+def describe_event(data):
+    """
+    CloudEvent 데이터를 ObjectDescriptor로 바꿉니다. 네트워크 요청은 하지 않습니다.
+    - Audit Log 트리거: protoPayload.resourceName에서 버킷/객체 이름만 얻습니다.
+    - Direct Storage 트리거: 이벤트의 객체 리소스(metadata, generation, 해시 등)를 그대로 씁니다.
+    resourceName을 해석할 수 없으면 ValueError를 발생시킵니다.
+    """
+    if "protoPayload" in data:
+        resource_name = data["protoPayload"]["resourceName"]
+        # resource_name format: projects/_/buckets/{bucket}/objects/{name}
+        match = _AUDIT_RESOURCE_RE.search(resource_name)
+        if not match:
+            raise ValueError(f"Could not parse resourceName: {resource_name}")
+        return ObjectDescriptor(match.group(1), match.group(2), source='audit_log')
+
+    resource = {key: value for key, value in data.items() if key in REQUIRED_FIELDS}
+    return ObjectDescriptor(data.get("bucket"), data.get("name"), source='storage', resource=resource)
@@ -0,0 +1,305 @@
+import json
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from io import BytesIO
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import tracing
+
+# 배치 추론 엔드포인트 경로 (AI_BATCH_MODE 사용 시)
+AI_BATCH_PATH = os.environ.get("AI_BATCH_PATH", "/predict/batch")
+
+# 재시도 대상 상태 코드 (AI 서비스 과부하 / 일시적 불가)
+RETRYABLE_STATUS = (429, 503)
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """
+    서킷 브레이커가 열려 있어 요청을 보내지 않고 바로 실패시킬 때 발생합니다.
+    기존 RequestException 처리 경로를 그대로 타도록 하위 클래스로 정의합니다.
+    """
+
+
+class CircuitBreaker:
+    """
+    연속 실패가 failure_threshold 이상이면 reset_timeout 동안 요청을 차단합니다.
+    시간이 지나면 half-open 상태로 한 건만 통과시키고, 성공하면 다시 닫습니다.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def allow(self):
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            # HALF_OPEN: 시험 요청은 한 번에 하나만 허용
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def cooling_down(self):
+        """
+        열린 뒤 reset_timeout이 아직 지나지 않았는지 확인합니다. allow()와 달리 시험 요청을 소비하지 않습니다.
+        """
+        with self._lock:
+            return self._state == self.OPEN and self._clock() - self._opened_at < self.reset_timeout
+
+    def available(self):
+        """
+        지금 allow()를 부르면 통과할지 확인합니다. 시험 요청을 소비하지 않습니다.
+        닫혀 있거나, 열린 뒤 reset_timeout이 지났거나, half-open에서 시험 요청이 아직 나가지 않았으면 True.
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                return self._clock() - self._opened_at >= self.reset_timeout
+            return not self._trial_in_flight
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._trial_in_flight = False
+
+
+def parse_retry_after(value, now=None):
+    """
+    Retry-After 헤더(초 또는 HTTP-date)를 대기 초로 변환합니다. 해석할 수 없으면 None.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, when.timestamp() - now)
+
+
+def _rewind(files):
+    # 재시도 시 같은 파일 객체를 다시 보내기 위해 시작 위치를 기억해 둡니다.
+    # files는 requests와 같이 dict 또는 (필드명, 값) 튜플 리스트입니다.
+    values = files.values() if isinstance(files, dict) else [v for _, v in (files or [])]
+    positions = []
+    for value in values:
+        fileobj = value[1] if isinstance(value, tuple) else value
+        if hasattr(fileobj, 'seek') and hasattr(fileobj, 'tell'):
+            positions.append((fileobj, fileobj.tell()))
+    return positions
+
+
+class AIServiceClient:
+    """
+    AI 서비스(/predict) 호출용 공유 HTTP 클라이언트.
+
+    - 커넥션 풀 + keep-alive 세션을 재사용하여 매 요청의 TCP/TLS 핸드셰이크를 제거합니다.
+    - connect/read 타임아웃으로 느린 인스턴스가 함수를 붙잡지 못하게 합니다.
+    - 429/503 응답은 Retry-After를 존중하며 지터가 있는 지수 백오프로 재시도합니다.
+    - 서킷 브레이커가 열리면 재시도를 쌓지 않고 즉시 실패합니다.
+    """
+
+    def __init__(self, base_url, token_provider=None, connect_timeout=None, read_timeout=None,
+                 max_retries=None, backoff_base=0.5, backoff_max=None, pool_size=None,
+                 breaker=None, session=None, sleep=time.sleep):
+        self.base_url = base_url
+        self.token_provider = token_provider
+        self.connect_timeout = connect_timeout if connect_timeout is not None else _env_float('AI_CONNECT_TIMEOUT', 3.05)
+        self.read_timeout = read_timeout if read_timeout is not None else _env_float('AI_READ_TIMEOUT', 60.0)
+        self.max_retries = max_retries if max_retries is not None else _env_int('AI_MAX_RETRIES', 3)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max if backoff_max is not None else _env_float('AI_BACKOFF_MAX', 10.0)
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=_env_int('AI_BREAKER_THRESHOLD', 5),
+            reset_timeout=_env_float('AI_BREAKER_RESET', 30.0),
+        )
+        self._sleep = sleep
+
+        if session is None:
+            pool_size = pool_size or _env_int('AI_HTTP_POOL_SIZE', 16)
+            session = requests.Session()
+            # 재시도는 직접 처리하므로 urllib3 재시도는 끕니다.
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        self.session = session
+
+    @property
+    def predict_url(self):
+        return self.base_url.rstrip('/') + '/predict'
+
+    @property
+    def predict_batch_url(self):
+        return self.base_url.rstrip('/') + AI_BATCH_PATH
+
+    def _backoff(self, attempt):
+        # Full jitter: 0 ~ min(max, base * 2^attempt)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _headers(self, extra):
+        headers = dict(extra or {})
+        if self.token_provider is not None:
+            with tracing.stage('token'):
+                headers['Authorization'] = f"Bearer {self.token_provider.get(self.base_url)}"
+        return headers
+
+    def post(self, url, files=None, data=None, headers=None):
+        """
+        재시도/서킷 브레이커를 적용하여 POST 요청을 보내고 Response를 반환합니다.
+        최종 응답이 오류면 raise_for_status()의 HTTPError가 발생합니다.
+        """
+        positions = _rewind(files)
+
+        def build_request():
+            for fileobj, pos in positions:
+                fileobj.seek(pos)
+            return {'files': files, 'data': data, 'headers': dict(headers or {})}
+
+        return self._send(url, build_request)
+
+    def post_stream(self, url, upload):
+        """
+        StreamingUpload 본문을 chunked 전송으로 보냅니다.
+        제너레이터는 재사용할 수 없으므로 시도마다 upload.body()로 새로 만듭니다.
+        """
+        def build_request():
+            return {'data': upload.body(), 'headers': {'Content-Type': upload.content_type}}
+
+        return self._send(url, build_request)
+
+    def _send(self, url, build_request):
+        refreshed_token = False
+        attempt = 0
+
+        while True:
+            # 토큰 발급과 본문 준비는 브레이커 밖에서 합니다. 여기서 난 오류는 AI 서비스와 무관하고,
+            # allow() 뒤에 나면 half-open 시험 요청이 결과 없이 남아 브레이커가 다시 닫히지 않습니다.
+            kwargs = build_request()
+            kwargs['headers'] = self._headers(kwargs.get('headers'))
+
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"AI service circuit is open; rejecting request to {url}")
+
+            try:
+                response = self.session.post(
+                    url,
+                    timeout=(self.connect_timeout, self.read_timeout),
+                    **kwargs,
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            except BaseException:
+                # ChunkedEncodingError, 스트리밍 본문(GCS) 읽기 오류 등 응답을 받지 못한 시도는 모두 실패로 기록합니다.
+                self.breaker.record_failure()
+                raise
+            else:
+                if response.status_code == 401 and self.token_provider is not None and not refreshed_token:
+                    # 캐시된 토큰이 거부되면 한 번만 새로 발급받아 재시도
+                    refreshed_token = True
+                    tracing.add('token_refreshes')
+                    self.breaker.record_success()
+                    self.token_provider.invalidate(self.base_url)
+                    response.close()
+                    continue
+
+                if response.status_code not in RETRYABLE_STATUS:
+                    if response.status_code >= 500:
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success()
+                    response.raise_for_status()
+                    return response
+
+                self.breaker.record_failure()
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if attempt >= self.max_retries or (retry_after is not None and retry_after > self.backoff_max):
+                    # 서버가 요구하는 대기 시간이 너무 길면 기다리지 않고 부하를 덜어줍니다.
+                    response.raise_for_status()
+                delay = self._backoff(attempt)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                response.close()
+
+            attempt += 1
+            tracing.add('retries')
+            print(f"Retrying AI request in {delay:.2f}s (attempt {attempt}/{self.max_retries})")
+            self._sleep(delay)
+
+    def predict(self, files, data):
+        """
+        /predict 엔드포인트를 호출하여 JSON 결과를 반환합니다.
+        """
+        return self.post(self.predict_url, files=files, data=data).json()
+
+    def predict_batch(self, items):
+        """
+        여러 이미지를 한 번의 multipart 요청으로 보냅니다.
+        'files' 필드를 이미지 수만큼 반복하고, 이미지별 폼 필드는 같은 순서의 JSON 배열('items')로 보냅니다.
+        응답은 {"results": [...]} 형식이며 요청 순서와 같은 결과 리스트를 반환합니다.
+        """
+        files = [('files', (item.filename, BytesIO(item.data), item.mime_type)) for item in items]
+        data = {'items': json.dumps([item.fields for item in items])}
+        return self.post(self.predict_batch_url, files=files, data=data).json()['results']
+
+    def predict_stream(self, upload):
+        """
+        이미지를 메모리에 모두 올리지 않고 청크 단위로 /predict에 전송합니다.
+        """
+        return self.post_stream(self.predict_url, upload).json()
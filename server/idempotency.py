@@ -0,0 +1,227 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# 멱등성 장부 설정 (환경 변수로 조정)
+# 백엔드: memory | file | firestore
+IDEMPOTENCY_BACKEND = os.environ.get("IDEMPOTENCY_BACKEND", "memory").lower()
+IDEMPOTENCY_PATH = os.environ.get("IDEMPOTENCY_PATH", "/tmp/idempotency")
+# 처리 중 lease 시간. 함수 타임아웃보다 길게 잡아야 정상 처리 중인 이벤트를 빼앗지 않습니다.
+IDEMPOTENCY_LEASE = float(os.environ.get("IDEMPOTENCY_LEASE", 600))
+# 완료 기록 보관 시간 (Eventarc 재전송 기간보다 길게)
+IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL", 7 * 24 * 3600))
+
+CLAIMED = 'claimed'
+IN_PROGRESS = 'in_progress'
+COMPLETED = 'completed'
+
+
+class ClaimInProgressError(Exception):
+    """
+    같은 이벤트나 객체를 다른 실행이 아직 처리 중일 때 발생합니다.
+    그 실행이 타임아웃되거나 인스턴스가 종료되면 아무도 처리하지 않게 되므로, 중복으로 보고 응답하지 않고
+    예외를 그대로 발생시켜 플랫폼이 나중에 다시 전달하게 합니다. (lease가 끝나면 재전달된 이벤트가 가져갑니다)
+    """
+
+
+def event_key(event_id):
+    return f"event:{event_id}"
+
+
+def object_key(bucket, name, generation):
+    """
+    같은 객체 버전에 대해 Audit Log 트리거와 Storage 트리거가 모두 와도 하나로 묶이는 키.
+    """
+    return f"object:{bucket}/{name}#{generation}"
+
+
+def new_owner():
+    return uuid.uuid4().hex
+
+
+def _decide(record, owner, now, lease):
+    """
+    현재 기록을 보고 (결과 상태, 새로 저장할 기록)을 결정합니다. 저장할 게 없으면 기록은 None.
+    """
+    if record is not None:
+        if record['state'] == COMPLETED and now < record['expires_at']:
+            return COMPLETED, None
+        if record['state'] == IN_PROGRESS and now < record['expires_at'] and record['owner'] != owner:
+            return IN_PROGRESS, None
+    # 기록이 없거나, 만료되었거나, lease가 끝난 처리(인스턴스 종료 등)는 새로 가져갑니다.
+    return CLAIMED, {'state': IN_PROGRESS, 'owner': owner, 'expires_at': now + lease}
+
+
+class InMemoryLedger:
+    """
+    인스턴스 내부 멱등성 장부. 같은 인스턴스로 동시에 들어온 중복 이벤트를 하나로 합칩니다.
+    """
+
+    def __init__(self, lease=None, ttl=None, clock=time.time):
+        self.lease = IDEMPOTENCY_LEASE if lease is None else lease
+        self.ttl = IDEMPOTENCY_TTL if ttl is None else ttl
+        self._clock = clock
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key, owner):
+        now = self._clock()
+        with self._lock:
+            status, record = _decide(self._records.get(key), owner, now, self.lease)
+            if record is not None:
+                self._records[key] = record
+            if len(self._records) > 10000:
+                self._purge(now)
+            return status
+
+    def complete(self, key, owner):
+        with self._lock:
+            self._records[key] = {'state': COMPLETED, 'owner': owner, 'expires_at': self._clock() + self.ttl}
+
+    def release(self, key, owner):
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None and record['state'] == IN_PROGRESS and record['owner'] == owner:
+                del self._records[key]
+
+    def _purge(self, now):
+        for key in [k for k, r in self._records.items() if r['expires_at'] <= now]:
+            del self._records[key]
+
+
+class FileLedger:
+    """
+    디렉터리 기반 멱등성 장부. 키마다 JSON 파일 하나를 두고, flock으로 읽기-수정-쓰기를 원자적으로 처리합니다.
+    로컬에서 여러 프로세스(예: functions-framework 워커 여러 개)가 같은 장부를 공유할 때 사용합니다.
+    """
+
+    def __init__(self, path=None, lease=None, ttl=None, clock=time.time):
+        self.path = path or IDEMPOTENCY_PATH
+        self.lease = IDEMPOTENCY_LEASE if lease is None else lease
+        self.ttl = IDEMPOTENCY_TTL if ttl is None else ttl
+        self._clock = clock
+        self._thread_lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        self._lock_path = os.path.join(self.path, '.lock')
+
+    def _file(self, key):
+        return os.path.join(self.path, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+
+    @contextmanager
+    def _locked(self):
+        # 스레드 간에는 threading.Lock, 프로세스 간에는 flock으로 직렬화합니다.
+        with self._thread_lock:
+            fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+    def _read(self, key):
+        try:
+            with open(self._file(key)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write(self, key, record):
+        target = self._file(key)
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(dict(record, key=key), f)
+        os.replace(tmp, target)
+
+    def claim(self, key, owner):
+        with self._locked():
+            status, record = _decide(self._read(key), owner, self._clock(), self.lease)
+            if record is not None:
+                self._write(key, record)
+            return status
+
+    def complete(self, key, owner):
+        with self._locked():
+            self._write(key, {'state': COMPLETED, 'owner': owner, 'expires_at': self._clock() + self.ttl})
+
+    def release(self, key, owner):
+        with self._locked():
+            record = self._read(key)
+            if record is not None and record['state'] == IN_PROGRESS and record['owner'] == owner:
+                os.remove(self._file(key))
+
+
+class FirestoreLedger:
+    """
+    Firestore 트랜잭션 기반 멱등성 장부. 여러 Cloud Run 인스턴스 사이의 중복 전달을 하나로 합칩니다.
+    완료 기록은 expiresAt 필드에 Firestore TTL 정책을 걸어 정리합니다.
+    """
+
+    def __init__(self, collection='event_ledger', lease=None, ttl=None, client=None, clock=time.time):
+        if client is None:
+            from google.cloud import firestore
+            client = firestore.Client()
+        self._client = client
+        self.collection = client.collection(collection)
+        self.lease = IDEMPOTENCY_LEASE if lease is None else lease
+        self.ttl = IDEMPOTENCY_TTL if ttl is None else ttl
+        self._clock = clock
+
+    def _doc(self, key):
+        return self.collection.document(hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+    def _record(self, key, record):
+        from datetime import datetime, timezone
+
+        return dict(record, key=key, expiresAt=datetime.fromtimestamp(record['expires_at'], tz=timezone.utc))
+
+    def claim(self, key, owner):
+        from google.cloud import firestore
+
+        doc_ref = self._doc(key)
+
+        @firestore.transactional
+        def _claim(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            current = snapshot.to_dict() if snapshot.exists else None
+            status, record = _decide(current, owner, self._clock(), self.lease)
+            if record is not None:
+                transaction.set(doc_ref, self._record(key, record))
+            return status
+
+        return _claim(self._client.transaction())
+
+    def complete(self, key, owner):
+        record = {'state': COMPLETED, 'owner': owner, 'expires_at': self._clock() + self.ttl}
+        self._doc(key).set(self._record(key, record))
+
+    def release(self, key, owner):
+        from google.cloud import firestore
+
+        doc_ref = self._doc(key)
+
+        @firestore.transactional
+        def _release(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            record = snapshot.to_dict() if snapshot.exists else None
+            if record is not None and record['state'] == IN_PROGRESS and record['owner'] == owner:
+                transaction.delete(doc_ref)
+
+        _release(self._client.transaction())
+
+
+def create_ledger(backend=None):
+    """
+    환경 변수 설정에 맞는 멱등성 장부를 만듭니다.
+    """
+    backend = (backend or IDEMPOTENCY_BACKEND).lower()
+    if backend == 'file':
+        return FileLedger()
+    if backend == 'firestore':
+        return FirestoreLedger()
+    return InMemoryLedger()
@@ -0,0 +1,119 @@
+import os
+import time
+from collections import namedtuple
+from io import BytesIO
+
+# 정규화 설정 (환경 변수로 조정)
+IMAGE_NORMALIZE = os.environ.get("IMAGE_NORMALIZE", "1") not in ("0", "false", "False")
+IMAGE_MAX_SIDE = int(os.environ.get("IMAGE_MAX_SIDE", 1280))
+IMAGE_QUALITY = int(os.environ.get("IMAGE_QUALITY", 85))
+IMAGE_MIN_QUALITY = int(os.environ.get("IMAGE_MIN_QUALITY", 60))
+# 0이면 용량 목표 없이 IMAGE_QUALITY로 한 번만 인코딩
+IMAGE_TARGET_BYTES = int(os.environ.get("IMAGE_TARGET_BYTES", 0))
+
+# EXIF Orientation 태그 번호
+_EXIF_ORIENTATION = 0x0112
+
+NormalizedImage = namedtuple(
+    'NormalizedImage',
+    ['data', 'mime_type', 'size', 'original_size', 'original_bytes', 'decode_ms', 'resize_ms', 'encode_ms', 'changed'],
+)
+
+
+def sniff_image_type(head):
+    """
+    파일 앞부분의 시그니처(매직 넘버)로 실제 이미지 형식을 판별합니다.
+    확장자와 무관하게 MIME 타입을 반환하며, 알 수 없으면 None.
+    """
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if head[4:8] == b'ftyp' and head[8:12] in (b'heic', b'heix', b'mif1', b'msf1', b'hevc'):
+        return 'image/heic'
+    if head.startswith(b'BM'):
+        return 'image/bmp'
+    return None
+
+
+def _unchanged(raw, mime_type, size, decode_ms=0.0):
+    return NormalizedImage(raw, mime_type, size, size, len(raw), decode_ms, 0.0, 0.0, False)
+
+
+def normalize_image(raw, max_side=None, quality=None, target_bytes=None, min_quality=None):
+    """
+    추론 전에 이미지를 정규화합니다.
+
+    1. JPEG은 draft 모드로 DCT 단계에서 축소 디코딩하여 원본 해상도 디코드를 건너뜁니다.
+    2. EXIF Orientation에 맞게 회전합니다. (모델에는 회전 정보가 전달되지 않음)
+    3. 긴 변이 max_side를 넘으면 비율을 유지하며 축소합니다.
+    4. JPEG으로 재인코딩하고, target_bytes가 있으면 그 크기 이하가 될 때까지 품질을 낮춥니다.
+
+    재인코딩이 필요 없거나 결과가 원본보다 크면 원본 바이트를 그대로 돌려줍니다.
+    Pillow가 열 수 없는 형식(예: 플러그인 없는 HEIC)도 원본을 그대로 반환합니다.
+    """
+    from PIL import Image, ImageOps
+
+    max_side = max_side or IMAGE_MAX_SIDE
+    quality = quality or IMAGE_QUALITY
+    min_quality = min_quality or IMAGE_MIN_QUALITY
+    target_bytes = IMAGE_TARGET_BYTES if target_bytes is None else target_bytes
+    mime_type = sniff_image_type(raw[:32]) or 'application/octet-stream'
+
+    started = time.perf_counter()
+    try:
+        img = Image.open(BytesIO(raw))
+        original_size = img.size
+        orientation = img.getexif().get(_EXIF_ORIENTATION, 1)
+        needs_resize = max(original_size) > max_side
+        needs_encode = (
+            needs_resize
+            or orientation not in (0, 1)
+            or mime_type != 'image/jpeg'
+            or (target_bytes and len(raw) > target_bytes)
+        )
+        if not needs_encode:
+            return _unchanged(raw, mime_type, original_size)
+
+        if img.format == 'JPEG' and needs_resize:
+            # draft는 요청 크기 이상을 유지하는 가장 작은 1/2, 1/4, 1/8 스케일을 고릅니다.
+            img.draft('RGB', (max_side, max_side))
+        img.load()
+    except Exception as e:
+        print(f"Warning: could not decode image for normalization, sending original: {e}")
+        return _unchanged(raw, mime_type, None, (time.perf_counter() - started) * 1000)
+    decode_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    img = ImageOps.exif_transpose(img)
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        img = background
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+    if max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+    resize_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    q = quality
+    while True:
+        out = BytesIO()
+        img.save(out, 'JPEG', quality=q, optimize=True)
+        data = out.getvalue()
+        if not target_bytes or len(data) <= target_bytes or q <= min_quality:
+            break
+        q = max(min_quality, q - 10)
+    encode_ms = (time.perf_counter() - started) * 1000
+
+    rotated = orientation not in (0, 1)
+    if len(data) >= len(raw) and not rotated and mime_type == 'image/jpeg':
+        return _unchanged(raw, mime_type, original_size, decode_ms)
+
+    return NormalizedImage(data, 'image/jpeg', img.size, original_size, len(raw), decode_ms, resize_ms, encode_ms, True)
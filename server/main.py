@@ -1,16 +1,54 @@
 import functions_framework
-from datetime import datetime
-import re
+from datetime import datetime, timezone
 import os
 import json
+from io import BytesIO
 import requests
-from google.cloud import storage
-import google.auth.transport.requests
-import google.oauth2.id_token
+
+import tracing
+from auth import IdTokenProvider
+from batching import AI_BATCH_MODE, create_batcher
+from dead_letter import RetryScheduler, create_dead_letter_store
+from gcs_objects import STORAGE_WARMUP, describe_event, warm_up_storage_client
+from http_client import AIServiceClient
+from idempotency import CLAIMED, COMPLETED, ClaimInProgressError, create_ledger, event_key, new_owner, object_key
+from imaging import IMAGE_NORMALIZE, normalize_image, sniff_image_type
+from prediction_cache import cache_key, create_prediction_cache
+from results_sink import create_results_sink, result_doc_id
+from tracing import traced
+from upload import blob_upload
 
 # AI 서비스 URL (환경 변수에서 가져옴)
 AI_SERVICE_URL = os.environ.get("AI_SERVICE_URL", "https://YOUR_AI_SERVICE_URL_HERE")
 
+# 인스턴스 전체에서 공유하는 ID Token 캐시 (audience별로 보관, 만료 전 자동 갱신)
+token_provider = IdTokenProvider()
+
+# 인스턴스 전체에서 공유하는 /predict 클라이언트 (커넥션 풀, 타임아웃, 재시도, 서킷 브레이커)
+ai_client = AIServiceClient(AI_SERVICE_URL, token_provider=token_provider)
+
+# 마이크로 배치 모드 (AI_BATCH_MODE=1일 때만 사용, buffered 업로드에만 적용)
+predict_batcher = create_batcher(ai_client) if AI_BATCH_MODE else None
+
+# 이미지 내용 해시 기반 예측 결과 캐시 (로컬 LRU + 선택적 공유 캐시)
+prediction_cache = create_prediction_cache()
+
+# 분석 결과 저장소 (기본은 damage_analyses에 배치 커밋, 로컬 실행은 RESULTS_SINK=memory/none)
+results_sink = create_results_sink()
+
+# 이벤트 중복 처리 방지용 멱등성 장부 (CloudEvent id / 객체 버전 기준)
+event_ledger = create_ledger()
+
+# 처리 실패 이벤트의 dead-letter 저장소 (DEAD_LETTER_BACKEND=file/firestore일 때만, 기본은 플랫폼 재시도)
+dead_letters = create_dead_letter_store()
+
+# google.cloud.storage는 첫 이벤트 전에 백그라운드에서 미리 import (시작 경로에서는 제외)
+if STORAGE_WARMUP:
+    warm_up_storage_client()
+
+# 업로드 방식: 'buffered'(기본, 전체 다운로드 후 전송) 또는 'streaming'(청크 단위 파이프)
+AI_UPLOAD_MODE = os.environ.get("AI_UPLOAD_MODE", "buffered").lower()
+
 def parse_filename(filename):
     """
     파일명에서 사용자 UID를 추출합니다.
@@ -27,6 +65,76 @@ def parse_filename(filename):
         return parts[0]
     return None
 
+def image_url(bucket_name, file_basename):
+    """
+    앱에서 원본 이미지를 보여줄 Firebase Storage 다운로드 URL.
+    """
+    return f"https://firebasestorage.googleapis.com/v0/b/{bucket_name}/o/crashed_car_picture%2F{file_basename}?alt=media"
+
+def check_target(file_name, content_type):
+    """
+    분석 대상 이미지인지 확인하고 (file_basename, uid)를 반환합니다.
+    대상이 아니면 이유를 로그와 trace에 남기고 uid 자리에 None을 반환합니다.
+    """
+    # 1. 파일 경로 및 이름 검증 ('crashed_car_picture/' 폴더 내의 파일인지 확인)
+    if not file_name.startswith("crashed_car_picture/"):
+        print(f"Skipping file not in target folder: {file_name}")
+        tracing.skip('not_target_folder')
+        return None, None
+
+    # 2. 이미지 파일 검증
+    is_image_type = content_type.startswith("image/")
+    is_image_ext = file_name.lower().endswith(('.jpg', '.jpeg', '.png'))
+
+    if not (is_image_type or is_image_ext):
+        print(f"Skipping non-image file: {file_name} (Type: {content_type})")
+        tracing.skip('not_image')
+        return None, None
+
+    # 3. 파일명에서 UID 추출
+    # name은 'crashed_car_picture/user123_20240122.jpg' 형태
+    file_basename = file_name.split('/')[-1]
+    uid = parse_filename(file_basename)
+
+    if not uid:
+        print(f"Could not extract UID from filename: {file_basename}")
+        tracing.skip('no_uid')
+    return file_basename, uid
+
+def result_record(prediction_result, uid, car_model, file_name, event_id):
+    """
+    결과 저장소에 기록할 문서 (예측 결과 + 앱이 조회에 쓰는 필드).
+    """
+    record = dict(prediction_result)
+    record.update({
+        'userId': uid,
+        'carModel': car_model,
+        'sourceObject': file_name,
+        'eventId': event_id,
+        'timestamp': datetime.now(timezone.utc),
+    })
+    return record
+
+def prepare_image(raw, filename):
+    """
+    추론 전 전처리 단계: EXIF 회전, 크기 제한 축소, 재인코딩을 적용합니다.
+    (data, filename, mime_type)을 반환하며, MIME 타입은 확장자가 아닌 실제 시그니처로 판별합니다.
+    """
+    if not IMAGE_NORMALIZE:
+        return raw, filename, sniff_image_type(raw[:32]) or 'application/octet-stream'
+
+    result = normalize_image(raw)
+    if result.changed:
+        print(
+            f"Normalized {filename}: {result.original_size} -> {result.size}, "
+            f"{result.original_bytes} -> {len(result.data)} bytes "
+            f"(decode {result.decode_ms:.1f}ms, resize {result.resize_ms:.1f}ms, encode {result.encode_ms:.1f}ms)"
+        )
+        if result.mime_type == 'image/jpeg':
+            filename = filename.rsplit('.', 1)[0] + '.jpg'
+    return result.data, filename, result.mime_type
+
+@traced('predict_damage')
 def predict_damage(image_path, user_id=None, car_model='unknown'):
     """
     외부 AI Cloud Run 서비스에 이미지를 전송하여 분석 결과를 받아옵니다.
@@ -38,87 +146,159 @@ def predict_damage(image_path, user_id=None, car_model='unknown'):
 
     print(f"Sending image to AI Service: {AI_SERVICE_URL}")
     
-    # 1. 인증 토큰(ID Token) 생성
-    # Cloud Run을 호출하기 위한 '출입증'을 만듭니다.
-    auth_req = google.auth.transport.requests.Request()
+    # 1. 인증 토큰(ID Token)은 ai_client가 token_provider 캐시에서 가져와 헤더에 담습니다.
     try:
-        id_token = google.oauth2.id_token.fetch_id_token(auth_req, AI_SERVICE_URL)
-    except Exception as e:
-        print(f"Warning: Could not fetch ID token. Local emulation or missing permissions? Error: {e}")
-        # 로컬 테스트나 인증이 필요 없는 경우를 위해 None으로 처리하거나 예외를 던질 수 있음
-        # 여기서는 예외를 던져서 명확히 실패하게 함 (Cloud 환경 가정)
-        raise e
+        with tracing.stage('read'), open(image_path, 'rb') as img_file:
+            raw = img_file.read()
+        tracing.add('bytes_read', len(raw))
 
-    # 헤더에 토큰을 담습니다.
-    headers = {
-        "Authorization": f"Bearer {id_token}"
-    }
-    
-    try:
-        with open(image_path, 'rb') as img_file:
-            # 2. 데이터 구성
-            # 파일명과 MIME 타입(image/jpeg 등)을 명시적으로 지정
-            mime_type = 'image/jpeg' if image_path.lower().endswith(('.jpg', '.jpeg')) else 'image/png'
-            files = {'file': (os.path.basename(image_path), img_file, mime_type)}
-            data = {'car_model': car_model}
-            if user_id:
-                data['user_id'] = user_id
-
-            # 3. 요청 전송 (헤더 포함)
-            # URL 끝에 /predict 추가 (중복 슬래시 방지)
-            target_url = AI_SERVICE_URL.rstrip('/') + '/predict'
-            
-            response = requests.post(
-                target_url, 
-                files=files, 
-                data=data,
-                headers=headers
-            )
-            
-        response.raise_for_status() 
-        return response.json()
+        # 2. 데이터 구성
+        # 전처리 후 파일명과 MIME 타입(image/jpeg 등)을 명시적으로 지정
+        with tracing.stage('normalize'):
+            image_bytes, filename, mime_type = prepare_image(raw, os.path.basename(image_path))
+        tracing.add('bytes_uploaded', len(image_bytes))
+        files = {'file': (filename, BytesIO(image_bytes), mime_type)}
+        data = {'car_model': car_model}
+        if user_id:
+            data['user_id'] = user_id
+
+        # 3. 요청 전송 (풀링된 세션 + 타임아웃 + 재시도)
+        with tracing.stage('predict'):
+            return ai_client.predict(files=files, data=data)
     except requests.exceptions.RequestException as e:
         print(f"Error calling AI service: {e}")
         if hasattr(e, 'response') and e.response is not None:
              print(f"Server Response: {e.response.text}")
         raise
 
+def run_inference(blob, file_name, file_basename, uid, car_model):
+    """
+    GCS Blob을 AI 서비스로 보내 분석 결과를 받아옵니다. (buffered / streaming 모드)
+    """
+    # AI 추론 실행 (외부 서비스 호출)
+    if not AI_SERVICE_URL or "YOUR_AI_SERVICE_URL_HERE" in AI_SERVICE_URL:
+         raise ValueError("AI_SERVICE_URL not configured")
+
+    # ID Token은 ai_client가 캐시에서 가져오며, prefetch 중이면 완료될 때까지 대기
+    data = {'car_model': car_model, 'user_id': uid}
+
+    print(f"Sending request to {ai_client.predict_url} with user_id={uid}, car_model={car_model} (mode={AI_UPLOAD_MODE})")
+
+    if AI_UPLOAD_MODE == 'streaming':
+        # GCS에서 청크 단위로 읽어 바로 /predict로 흘려보냄 (전체 이미지를 메모리에 두지 않음)
+        # 스트리밍 모드에서는 전체 디코드가 필요한 정규화를 건너뛰고 첫 청크로 형식만 판별
+        upload = blob_upload(blob, data, file_basename)
+        with tracing.stage('stream_predict'):
+            prediction_result = ai_client.predict_stream(upload)
+        tracing.add('bytes_uploaded', upload.bytes_sent)
+        print(f"Streamed {upload.bytes_sent} bytes of {file_name}")
+    else:
+        # 이미지를 메모리(BytesIO)에 다운로드
+        image_data = BytesIO()
+        with tracing.stage('download'):
+            blob.download_to_file(image_data)
+        image_data.seek(0) # 파일 포인터를 처음으로 이동
+        tracing.add('bytes_downloaded', image_data.getbuffer().nbytes)
+
+        print(f"Downloaded {file_name} to memory")
+
+        with tracing.stage('normalize'):
+            image_bytes, upload_name, mime_type = prepare_image(image_data.getvalue(), file_basename)
+        tracing.add('bytes_uploaded', len(image_bytes))
+        if predict_batcher is not None:
+            # 동시에 들어온 다른 이벤트와 묶어서 배치 추론 (대기 시간 포함)
+            with tracing.stage('batch_predict'):
+                prediction_result = predict_batcher.predict(upload_name, image_bytes, mime_type, data)
+        else:
+            files = {'file': (upload_name, BytesIO(image_bytes), mime_type)}
+            with tracing.stage('predict'):
+                prediction_result = ai_client.predict(files=files, data=data)
+    return prediction_result
+
+def park_failure(cloud_event, error):
+    """
+    실패한 이벤트를 dead-letter 저장소에 넣습니다. 저장했으면 True를 반환하고,
+    저장소가 없거나 저장에 실패하면 False를 반환해 호출자가 예외를 다시 발생시키도록 합니다(플랫폼 재시도).
+    """
+    if dead_letters is None or isinstance(error, ClaimInProgressError):
+        # 다른 실행이 처리 중인 이벤트는 저장하지 않고 플랫폼 재시도에 맡깁니다.
+        return False
+    try:
+        record = dead_letters.record_failure(cloud_event, error)
+    except Exception as e:
+        print(f"Failed to dead-letter event {cloud_event['id']}: {e}")
+        return False
+    print(f"Dead-lettered event {record['eventId']} ({record['classification']}, "
+          f"attempt {record['attempts']}, {record['state']})")
+    return True
+
+
+def create_retry_scheduler(store=None, concurrency=None):
+    """
+    dead-letter 이벤트를 process_event로 다시 처리하는 스케줄러.
+    AI 서비스 서킷 브레이커가 요청을 받지 않는 동안(열려 있거나 half-open 시험 요청이 진행 중)에는 재처리를 시작하지
+    않습니다. reset_timeout이 지나면 카나리 이벤트가 시험 요청이 되어 서비스가 회복되었는지 확인합니다.
+    """
+    return RetryScheduler(store or dead_letters, process_event, healthy=ai_client.breaker.available,
+                          concurrency=concurrency)
+
+
 @functions_framework.cloud_event
 def analyze_crashed_car(cloud_event):
     """
     Google Cloud Storage에 파일이 업로드될 때 트리거되는 Cloud Function
     Support both Direct Storage Triggers and Cloud Audit Log Triggers.
     """
+    try:
+        process_event(cloud_event)
+    except Exception as e:
+        if not park_failure(cloud_event, e):
+            raise
+
+
+@functions_framework.cloud_event
+def drain_dead_letters(cloud_event):
+    """
+    Cloud Scheduler(Pub/Sub)로 주기적으로 트리거되어 다시 시도할 때가 된 dead-letter 이벤트를 재처리합니다.
+    """
+    if dead_letters is None:
+        print("DEAD_LETTER_BACKEND is not set; nothing to drain.")
+        return
+    print(f"Dead-letter drain: {create_retry_scheduler().drain_once()}")
+
+
+@traced('analyze_crashed_car')
+def process_event(cloud_event):
+    """
+    analyze_crashed_car의 본문. 실패하면 예외를 그대로 발생시킵니다 (dead-letter 재처리에서도 사용).
+    """
     data = cloud_event.data
     
     event_id = cloud_event["id"]
     event_type = cloud_event["type"]
     timeCreated = data.get("timeCreated", datetime.now().isoformat())
+    tracing.set_fields(event_id=event_id, event_type=event_type)
     
     # Audit Log Trigger vs Direct Storage Trigger handling
-    if "protoPayload" in data:
+    # 이벤트에 담긴 객체 정보를 그대로 쓰고, 빠진 필드는 검증을 통과한 뒤에만 조회합니다.
+    try:
+        descriptor = describe_event(data)
+    except ValueError as e:
+        print(f"Error: {e}")
+        tracing.skip('unparsable_resource')
+        return
+    if descriptor.source == 'audit_log':
         # Case 1: Cloud Audit Log Trigger
         print("Processing as Cloud Audit Log event...")
-        resource_name = data["protoPayload"]["resourceName"]
-        # resource_name format: projects/_/buckets/{bucket}/objects/{name}
-        match = re.search(r'projects/_/buckets/(.*?)/objects/(.*)', resource_name)
-        if match:
-            bucket_name = match.group(1)
-            file_name = match.group(2)
-        else:
-            print(f"Error: Could not parse resourceName: {resource_name}")
-            return
-        # Audit logs don't typically carry contentType in the top level. 
-        # We'll assume it's valid if it matched the path pattern, or fetch metadata if strictly needed.
-        contentType = "image/unknown" 
-        metadata = {} # Audit Log에서는 메타데이터 추출이 복잡하므로 생략하거나 별도 조회 필요
     else:
         # Case 2: Direct Storage Trigger (Legacy/Standard)
         print("Processing as Direct Storage event...")
-        bucket_name = data.get("bucket")
-        file_name = data.get("name")
-        contentType = data.get("contentType", "")
-        metadata = data.get("metadata", {}) # 메타데이터 추출
+    bucket_name = descriptor.bucket_name
+    file_name = descriptor.name
+    # Audit logs don't carry contentType; it is validated by extension until resolved.
+    contentType = descriptor.content_type or "image/unknown"
+    metadata = descriptor.metadata
+    tracing.set_fields(source=descriptor.source, bucket=bucket_name, object=file_name)
 
     print(f"Event ID: {event_id}")
     print(f"Event Type: {event_type}")
@@ -131,97 +311,94 @@ def analyze_crashed_car(cloud_event):
 
     if not bucket_name or not file_name:
         print("Error: Bucket or Name not found in event data.")
+        tracing.skip('missing_object_name')
         return
 
-    # 1. 파일 경로 및 이름 검증 ('crashed_car_picture/' 폴더 내의 파일인지 확인)
-    if not file_name.startswith("crashed_car_picture/"):
-        print(f"Skipping file not in target folder: {file_name}")
-        return
-
-    # 2. 이미지 파일 검증
-    is_image_type = contentType.startswith("image/")
-    is_image_ext = file_name.lower().endswith(('.jpg', '.jpeg', '.png'))
-    
-    if not (is_image_type or is_image_ext):
-        print(f"Skipping non-image file: {file_name} (Type: {contentType})")
-        return
-
-    # 3. 파일명에서 UID 추출
-    # name은 'crashed_car_picture/user123_20240122.jpg' 형태
-    file_basename = file_name.split('/')[-1]
-    uid = parse_filename(file_basename)
-
+    # 1~3. 대상 폴더 / 이미지 여부 검증 및 파일명에서 UID 추출
+    file_basename, uid = check_target(file_name, contentType)
     if not uid:
-        print(f"Could not extract UID from filename: {file_basename}")
         return
 
     print(f"Detected UID: {uid}")
 
-    storage_client = storage.Client()
+    # 중복 전달된 이벤트(같은 CloudEvent id)는 한 번만 처리
+    owner = new_owner()
+    claimed_keys = [event_key(event_id)]
+    with tracing.stage('claim'):
+        status = event_ledger.claim(claimed_keys[0], owner)
+    if status == COMPLETED:
+        print(f"Skipping duplicate event {event_id} ({status})")
+        tracing.skip(f'duplicate_event_{status}')
+        return
+    if status != CLAIMED:
+        raise ClaimInProgressError(f"Event {event_id} is still being processed by another run")
+
+    # 콜드 스타트 시 토큰 발급을 GCS 다운로드와 동시에 진행
+    if AI_SERVICE_URL and "YOUR_AI_SERVICE_URL_HERE" not in AI_SERVICE_URL:
+        token_provider.prefetch(AI_SERVICE_URL)
 
     try:
-        # 4. GCS에서 이미지 다운로드 및 메타데이터 조회
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(file_name)
-        
-        # 메타데이터를 확실하게 가져오기 위해 reload 호출
-        blob.reload()
+        # 4. 객체 메타데이터 확정: 이벤트에 없는 필드만 fields 제한 요청 한 번으로 조회
+        with tracing.stage('resolve'):
+            descriptor.resolve()
+        tracing.set_fields(fetched_fields=list(descriptor.fetched_fields))
+        if descriptor.fetched_fields:
+            print(f"Fetched missing object fields: {','.join(descriptor.fetched_fields)}")
+        blob = descriptor.blob()
+
+        # Audit Log 트리거와 Storage 트리거가 같은 객체 버전에 대해 모두 온 경우 하나만 처리
+        object_claim = object_key(bucket_name, file_name, blob.generation)
+        with tracing.stage('claim'):
+            status = event_ledger.claim(object_claim, owner)
+        if status == COMPLETED:
+            print(f"Skipping {file_name} generation {blob.generation}: already {status} by another event")
+            event_ledger.complete(claimed_keys[0], owner)
+            tracing.skip(f'duplicate_object_{status}')
+            return
+        if status != CLAIMED:
+            # 다른 이벤트가 아직 처리 중: 이 이벤트의 claim은 아래에서 해제되고 플랫폼이 다시 전달합니다.
+            raise ClaimInProgressError(f"{file_name} generation {blob.generation} is still being processed by another event")
+        claimed_keys.append(object_claim)
         
         # 메타데이터에서 차종 추출
-        car_model = 'unknown'
-        if blob.metadata:
-            car_model = blob.metadata.get('carModel', 'unknown')
-            
-        print(f"Detected Car Model from Blob Metadata: {car_model}")
-        
-        # 이미지를 메모리(BytesIO)에 다운로드
-        
-        # 이미지를 메모리(BytesIO)에 다운로드
-        from io import BytesIO
-        image_data = BytesIO()
-        blob.download_to_file(image_data)
-        image_data.seek(0) # 파일 포인터를 처음으로 이동
-        
-        print(f"Downloaded {file_name} to memory")
+        car_model = descriptor.car_model
+        print(f"Detected Car Model from Object Metadata: {car_model}")
 
-        # 6. AI 추론 실행 (외부 서비스 호출)
-        if not AI_SERVICE_URL or "YOUR_AI_SERVICE_URL_HERE" in AI_SERVICE_URL:
-             raise ValueError("AI_SERVICE_URL not configured")
-        
-        # ID Token 생성
-        auth_req = google.auth.transport.requests.Request()
-        id_token = google.oauth2.id_token.fetch_id_token(auth_req, AI_SERVICE_URL)
-        headers = {"Authorization": f"Bearer {id_token}"}
-        
-        # 요청 전송
-        target_url = AI_SERVICE_URL.rstrip('/') + '/predict'
-        
-        mime_type = 'image/jpeg' if file_name.lower().endswith(('.jpg', '.jpeg')) else 'image/png'
-        files = {'file': (file_basename, image_data, mime_type)}
-        data = {'car_model': car_model, 'user_id': uid}
-        
-        print(f"Sending request to {target_url} with user_id={uid}, car_model={car_model}")
-        
-        response = requests.post(
-            target_url,
-            files=files,
-            data=data,
-            headers=headers
-        )
-        
-        response.raise_for_status()
-        prediction_result = response.json()
+        # 5. 같은 사용자의 같은 사진(내용 해시 + 차종)의 이전 결과가 있으면 다운로드와 추론을 모두 건너뜀
+        result_key = cache_key(descriptor.content_hash, car_model, uid)
+        with tracing.stage('cache_lookup'):
+            prediction_result = prediction_cache.get(result_key)
+        if prediction_result is not None:
+            tracing.set_fields(cache='hit')
+            print(f"Prediction cache hit for {file_name} (stats={prediction_cache.snapshot()})")
+        else:
+            tracing.set_fields(cache='miss' if result_key else 'no_hash')
+            prediction_result = run_inference(blob, file_name, file_basename, uid, car_model)
+            with tracing.stage('cache_store'):
+                prediction_cache.set(result_key, prediction_result)
         
         # 원래 이미지 URL 추가
-        download_url = f"https://firebasestorage.googleapis.com/v0/b/{bucket_name}/o/crashed_car_picture%2F{file_basename}?alt=media"
-        prediction_result['imageUrl'] = download_url
+        prediction_result['imageUrl'] = image_url(bucket_name, file_basename)
         
-        # 7. 결과 로그 출력
+        # 6. 결과 로그 출력
         print(f"Analysis completed for user: {uid}")
         print(f"Prediction Result: {prediction_result}")
 
+        # 7. 결과 저장: 앱이 폴링하지 않고 구독할 수 있도록 Firestore에 기록 (커밋될 때까지 대기)
+        if results_sink is not None:
+            record = result_record(prediction_result, uid, car_model, file_name, event_id)
+            with tracing.stage('persist'):
+                results_sink.write(result_doc_id(bucket_name, file_name, blob.generation), record)
+
+        with tracing.stage('complete'):
+            for key in claimed_keys:
+                event_ledger.complete(key, owner)
+
     except Exception as e:
         print(f"Error processing image: {e}")
+        # 재시도 시 다시 처리할 수 있도록 claim을 해제
+        for key in claimed_keys:
+            event_ledger.release(key, owner)
         raise e
 
 
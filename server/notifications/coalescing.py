@@ -0,0 +1,252 @@
+import os
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+# 정비소별 알림 묶음 창 (초). 0이면 요청마다 바로 보냅니다. (기본 꺼짐)
+NOTIFY_COALESCE_WINDOW = float(os.environ.get("NOTIFY_COALESCE_WINDOW", 0))
+# 창 상태 저장소: firestore(인스턴스 간 공유) | memory(테스트/로컬용)
+NOTIFY_COALESCE_BACKEND = os.environ.get("NOTIFY_COALESCE_BACKEND", "firestore").lower()
+# 창을 연 인스턴스가 죽었다고 보고 다른 이벤트가 넘겨받기까지의 추가 유예 시간 (초)
+NOTIFY_COALESCE_GRACE = float(os.environ.get("NOTIFY_COALESCE_GRACE", 30))
+# 요약에 남길 최근 요청 수
+NOTIFY_COALESCE_MAX_ITEMS = int(os.environ.get("NOTIFY_COALESCE_MAX_ITEMS", 10))
+
+OWNER = 'owner'
+JOINED = 'joined'
+
+# count는 창에 들어온 전체 요청 수, items는 그중 최근 max_items개의 요약, window_id는 confirm()에 넘길 창 ID
+CoalescedBatch = namedtuple('CoalescedBatch', ['count', 'items', 'window_id'], defaults=(None,))
+
+
+def _new_window(window_id, now):
+    return {'windowId': window_id, 'openedAt': now, 'closedAt': None, 'count': 0, 'items': [], 'keys': []}
+
+
+def _merge(target, other, max_items):
+    return dict(target, count=target['count'] + other['count'], items=(target['items'] + other['items'])[-max_items:],
+                keys=target['keys'] + other['keys'])
+
+
+def _join(record, window_id, key, item, now, window, grace, max_items):
+    """
+    현재 창 기록을 보고 (상태, 창 ID, 새 기록)을 결정합니다.
+    기록은 {'open': 열린 창 또는 None, 'sending': {창 ID: 닫고 보내는 중인 창}} 형식입니다.
+
+    - 열린 창이 없으면 새로 열어 owner가 되고, 열려 있으면 합류합니다.
+    - owner가 창을 닫을 시간을 한참 넘긴 창은 owner가 사라진 것으로 보고 넘겨받습니다(쌓인 요청은 유지).
+    - 보내는 중인 창이 grace 안에 confirm되지 않았거나, 그 창에 든 이벤트가 다시 전달되었으면(전송 실패 후
+      플랫폼 재시도) 전송이 실패한 것으로 보고 그 요청들을 열린 창으로 되돌려 다시 보내게 합니다.
+    같은 key(이벤트 ID)는 한 번만 셉니다.
+    """
+    record = record or {}
+    open_window = record.get('open')
+    sending = dict(record.get('sending') or {})
+
+    recovered = None
+    for sending_id, batch in list(sending.items()):
+        if key in batch['keys'] or now >= batch['closedAt'] + grace:
+            del sending[sending_id]
+            recovered = batch if recovered is None else _merge(recovered, batch, max_items)
+    if open_window is not None and now >= open_window['openedAt'] + window + grace:
+        recovered = open_window if recovered is None else _merge(recovered, open_window, max_items)
+        open_window = None
+
+    status = JOINED
+    if open_window is None:
+        status = OWNER
+        open_window = _new_window(window_id, now)
+    if recovered is not None:
+        open_window = _merge(open_window, recovered, max_items)
+    if key not in open_window['keys'] and not any(key in batch['keys'] for batch in sending.values()):
+        open_window = _merge(open_window, {'count': 1, 'items': [item], 'keys': [key]}, max_items)
+    return status, open_window['windowId'], {'open': open_window, 'sending': sending}
+
+
+def _close(record, window_id, now):
+    """
+    열린 창이 window_id이면 보내는 중으로 옮기고 (CoalescedBatch, 새 기록)을 반환합니다.
+    다른 이벤트가 넘겨받았으면 (None, None).
+    """
+    open_window = (record or {}).get('open')
+    if open_window is None or open_window['windowId'] != window_id:
+        return None, None
+    sending = dict(record.get('sending') or {})
+    sending[window_id] = dict(open_window, closedAt=now)
+    batch = CoalescedBatch(open_window['count'], open_window['items'], window_id)
+    return batch, {'open': None, 'sending': sending}
+
+
+def _confirm(record, window_id):
+    """
+    보낸 창을 지운 새 기록을 반환합니다. 남은 창이 없으면 None(문서 삭제), 바꿀 게 없으면 record 그대로.
+    """
+    sending = dict((record or {}).get('sending') or {})
+    if window_id not in sending:
+        return record
+    del sending[window_id]
+    if record.get('open') is None and not sending:
+        return None
+    return dict(record, sending=sending)
+
+
+class InMemoryWindowStore:
+    """
+    인스턴스 내부 창 저장소. 테스트와 로컬 실행용입니다.
+    """
+
+    def __init__(self, window=None, grace=None, max_items=None, clock=time.time):
+        self.window = NOTIFY_COALESCE_WINDOW if window is None else window
+        self.grace = NOTIFY_COALESCE_GRACE if grace is None else grace
+        self.max_items = max_items or NOTIFY_COALESCE_MAX_ITEMS
+        self._clock = clock
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def join(self, shop_id, key, item):
+        window_id = uuid.uuid4().hex
+        with self._lock:
+            status, window_id, record = _join(self._records.get(shop_id), window_id, key, item, self._clock(),
+                                              self.window, self.grace, self.max_items)
+            self._records[shop_id] = record
+        return status, window_id
+
+    def close(self, shop_id, window_id):
+        """
+        자기 창이면 닫고 CoalescedBatch를 반환합니다. 다른 이벤트가 넘겨받았으면 None.
+        닫은 창의 요청은 confirm()할 때까지 남겨 두므로, 보내다 실패하면 다음 이벤트가 다시 보냅니다.
+        """
+        with self._lock:
+            batch, record = _close(self._records.get(shop_id), window_id, self._clock())
+            if record is not None:
+                self._records[shop_id] = record
+        return batch
+
+    def confirm(self, shop_id, window_id):
+        with self._lock:
+            record = _confirm(self._records.get(shop_id), window_id)
+            if record is None:
+                self._records.pop(shop_id, None)
+            else:
+                self._records[shop_id] = record
+
+
+class FirestoreWindowStore:
+    """
+    Firestore 트랜잭션 기반 창 저장소. 여러 함수 인스턴스에 흩어진 같은 정비소 알림을 하나로 묶습니다.
+    """
+
+    def __init__(self, collection='notification_windows', window=None, grace=None, max_items=None,
+                 client=None, clock=time.time):
+        if client is None:
+            from google.cloud import firestore
+            client = firestore.Client()
+        self._client = client
+        self.collection = client.collection(collection)
+        self.window = NOTIFY_COALESCE_WINDOW if window is None else window
+        self.grace = NOTIFY_COALESCE_GRACE if grace is None else grace
+        self.max_items = max_items or NOTIFY_COALESCE_MAX_ITEMS
+        self._clock = clock
+
+    def join(self, shop_id, key, item):
+        from google.cloud import firestore
+
+        doc_ref = self.collection.document(shop_id)
+        window_id = uuid.uuid4().hex
+
+        @firestore.transactional
+        def _txn(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            current = snapshot.to_dict() if snapshot.exists else None
+            status, current_id, record = _join(current, window_id, key, item, self._clock(),
+                                               self.window, self.grace, self.max_items)
+            transaction.set(doc_ref, record)
+            return status, current_id
+
+        return _txn(self._client.transaction())
+
+    def close(self, shop_id, window_id):
+        from google.cloud import firestore
+
+        doc_ref = self.collection.document(shop_id)
+
+        @firestore.transactional
+        def _txn(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            batch, record = _close(snapshot.to_dict() if snapshot.exists else None, window_id, self._clock())
+            if record is not None:
+                transaction.set(doc_ref, record)
+            return batch
+
+        return _txn(self._client.transaction())
+
+    def confirm(self, shop_id, window_id):
+        from google.cloud import firestore
+
+        doc_ref = self.collection.document(shop_id)
+
+        @firestore.transactional
+        def _txn(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            current = snapshot.to_dict() if snapshot.exists else None
+            record = _confirm(current, window_id)
+            if record is None:
+                if current is not None:
+                    transaction.delete(doc_ref)
+            elif record is not current:
+                transaction.set(doc_ref, record)
+
+        _txn(self._client.transaction())
+
+
+class NotificationCoalescer:
+    """
+    정비소별로 window초 동안 들어온 알림을 하나로 묶습니다.
+
+    submit()은 창을 연 이벤트(owner)에서만 window초를 기다린 뒤 CoalescedBatch를 반환하고,
+    창에 합류한 이벤트에서는 None을 반환합니다(owner가 대신 보냄).
+    owner는 보낸 뒤 confirm()을 호출해야 하며, 그 전에 실패하면 묶인 요청은 재시도된 owner 이벤트나
+    grace가 지난 뒤의 다음 이벤트가 다시 보냅니다.
+    owner는 창이 닫힐 때까지 함수 실행을 붙잡고 있으므로 창은 몇 초 이내로 짧게 잡습니다.
+    window가 0이면 묶지 않고 바로 1건짜리 묶음을 반환합니다.
+    """
+
+    def __init__(self, store, window=None, sleep=time.sleep):
+        self.store = store
+        self.window = NOTIFY_COALESCE_WINDOW if window is None else window
+        self._sleep = sleep
+
+    def submit(self, shop_id, key, item):
+        """
+        key는 재전달된 같은 이벤트를 한 번만 세기 위한 이벤트 ID입니다.
+        """
+        if self.window <= 0:
+            return CoalescedBatch(1, [item])
+        status, window_id = self.store.join(shop_id, key, item)
+        if status != OWNER:
+            return None
+        self._sleep(self.window)
+        return self.store.close(shop_id, window_id)
+
+    def confirm(self, shop_id, batch):
+        """
+        묶음을 보냈으면(또는 보낼 대상이 없으면) 창 기록을 지웁니다.
+        """
+        if self.window <= 0 or batch.window_id is None:
+            return
+        self.store.confirm(shop_id, batch.window_id)
+
+
+def create_coalescer(client=None, backend=None):
+    """
+    환경 변수 설정에 맞는 NotificationCoalescer를 만듭니다. 창이 0이면 저장소를 만들지 않습니다.
+    """
+    if NOTIFY_COALESCE_WINDOW <= 0:
+        return NotificationCoalescer(store=None, window=0)
+    backend = (backend or NOTIFY_COALESCE_BACKEND).lower()
+    if backend == 'memory':
+        store = InMemoryWindowStore()
+    else:
+        store = FirestoreWindowStore(client=client)
+    return NotificationCoalescer(store)
@@ -0,0 +1,121 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# FCM 멀티캐스트 한 번에 보낼 수 있는 최대 토큰 수는 500
+FCM_CHUNK_SIZE = min(int(os.environ.get("FCM_CHUNK_SIZE", 500)), 500)
+# 동시에 전송할 청크 수
+FCM_MAX_WORKERS = int(os.environ.get("FCM_MAX_WORKERS", 4))
+# Firestore 'in' 쿼리 값 개수 제한과 WriteBatch 최대 쓰기 수
+_IN_QUERY_LIMIT = 30
+_BATCH_WRITE_LIMIT = 500
+
+# 더 이상 전송할 수 없는 토큰으로 보는 FCM 오류 (삭제 대상)
+DEAD_TOKEN_ERRORS = ('UnregisteredError', 'SenderIdMismatchError')
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def is_dead_token_error(exc):
+    """
+    전송 실패 원인이 토큰 자체(앱 삭제, 만료, 형식 오류)인지 판별합니다.
+    일시적 오류(할당량, 서버 오류)는 False로, 토큰을 지우지 않고 다음 요청 때 다시 보냅니다.
+    """
+    if exc is None:
+        return False
+    if type(exc).__name__ in DEAD_TOKEN_ERRORS:
+        return True
+    # 잘못된 토큰은 INVALID_ARGUMENT로 오며, 메시지 본문 오류와 구분하기 위해 내용을 확인합니다.
+    code = getattr(exc, 'code', None)
+    return code == 'INVALID_ARGUMENT' and 'registration token' in str(exc).lower()
+
+
+class FanoutResult:
+    def __init__(self):
+        self.success_count = 0
+        self.failure_count = 0
+        self.chunks = 0
+        self.dead_tokens = []
+        self.failures = []
+
+    def add(self, tokens, response):
+        self.chunks += 1
+        self.success_count += response.success_count
+        self.failure_count += response.failure_count
+        for token, resp in zip(tokens, response.responses):
+            if resp.success:
+                continue
+            self.failures.append((token, resp.exception))
+            if is_dead_token_error(resp.exception):
+                self.dead_tokens.append(token)
+
+
+def fan_out(messaging, make_message, tokens, chunk_size=None, max_workers=None, executor=None):
+    """
+    토큰을 chunk_size개씩 나눠 send_each_for_multicast로 동시에 전송하고 FanoutResult를 반환합니다.
+
+    make_message(tokens)는 해당 청크용 MulticastMessage를 만들어야 합니다.
+    청크 하나의 전송이 예외로 실패하면(네트워크 오류 등) 그 청크의 토큰은 모두 실패로 집계하고
+    다른 청크는 계속 보냅니다. 예외는 죽은 토큰으로 보지 않습니다.
+    """
+    tokens = list(dict.fromkeys(tokens))
+    chunk_size = chunk_size or FCM_CHUNK_SIZE
+    chunks = list(chunked(tokens, chunk_size))
+    result = FanoutResult()
+    if not chunks:
+        return result
+
+    def send(chunk):
+        return messaging.send_each_for_multicast(make_message(chunk))
+
+    if len(chunks) == 1:
+        outcomes = [(chunks[0], _call(send, chunks[0]))]
+    else:
+        own_executor = executor is None
+        executor = executor or ThreadPoolExecutor(max_workers=min(len(chunks), max_workers or FCM_MAX_WORKERS),
+                                                  thread_name_prefix='fcm-fanout')
+        try:
+            futures = [(chunk, executor.submit(_call, send, chunk)) for chunk in chunks]
+            outcomes = [(chunk, future.result()) for chunk, future in futures]
+        finally:
+            if own_executor:
+                executor.shutdown(wait=False)
+
+    for chunk, (response, error) in outcomes:
+        if error is not None:
+            result.chunks += 1
+            result.failure_count += len(chunk)
+            result.failures.extend((token, error) for token in chunk)
+        else:
+            result.add(chunk, response)
+    return result
+
+
+def _call(send, chunk):
+    try:
+        return send(chunk), None
+    except Exception as e:
+        return None, e
+
+
+def prune_dead_tokens(db, tokens):
+    """
+    tokens를 fcmToken으로 가진 users 문서에서 토큰 필드를 지웁니다.
+    'in' 쿼리로 찾아 WriteBatch로 한꺼번에 지우며, 삭제한 문서 수를 반환합니다.
+    (users 문서 변경은 sync_mechanic_tokens 트리거가 정비소 토큰 목록에도 반영합니다.)
+    """
+    from google.cloud import firestore
+
+    refs = []
+    for group in chunked(list(dict.fromkeys(tokens)), _IN_QUERY_LIMIT):
+        for doc in db.collection("users").where("fcmToken", "in", group).stream():
+            refs.append(doc.reference)
+
+    for group in chunked(refs, _BATCH_WRITE_LIMIT):
+        batch = db.batch()
+        for ref in group:
+            batch.update(ref, {"fcmToken": firestore.DELETE_FIELD})
+        batch.commit()
+    return len(refs)
@@ -2,6 +2,10 @@ import functions_framework
 from firebase_admin import credentials, messaging, initialize_app, firestore
 import google.cloud.firestore
 
+from coalescing import create_coalescer
+from fanout import fan_out, prune_dead_tokens
+from token_index import MechanicTokenIndex
+
 # Firebase Admin SDK 초기화 (환경 변수 또는 기본 서비스 계정 사용)
 try:
     initialize_app()
@@ -11,6 +15,12 @@ except ValueError:
 
 db = firestore.client()
 
+# 정비소별 정비사 토큰 조회 (TTL 캐시 + users 쿼리, 또는 TOKEN_LOOKUP=denormalized일 때 정비소별 토큰 목록 문서)
+token_index = MechanicTokenIndex(db)
+
+# 정비소별 알림 묶음 (NOTIFY_COALESCE_WINDOW > 0일 때만, 창 상태는 Firestore에 공유)
+coalescer = create_coalescer(client=db)
+
 @functions_framework.cloud_event
 def send_estimate_notification(cloud_event):
     """
@@ -29,45 +39,86 @@ def send_estimate_notification(cloud_event):
     user_request = data.get("userRequest", {}).get("stringValue", "새로운 수리 요청이 있습니다.")
     damage_type = data.get("damageType", {}).get("stringValue", "차량 파손")
 
-    # 1. 해당 정비소(shopId)를 담당하는 정비사들을 찾습니다.
-    # users 컬렉션에서 serviceCenterId가 shop_id인 사용자들을 조회합니다.
-    users_ref = db.collection("users")
-    query = users_ref.where("serviceCenterId", "==", shop_id).where("role", "==", "mechanic")
-    mechanics = query.stream()
+    # 짧은 시간에 같은 정비소로 들어온 요청은 창을 연 이벤트가 모아서 한 번만 보냅니다.
+    batch = coalescer.submit(shop_id, cloud_event["id"], {"userRequest": user_request, "damageType": damage_type})
+    if batch is None:
+        print(f"Coalesced estimate notification for shop: {shop_id}")
+        return
 
-    tokens = []
-    for doc in mechanics:
-        user_data = doc.to_dict()
-        token = user_data.get("fcmToken")
-        if token:
-            tokens.append(token)
+    # 1. 해당 정비소(shopId)를 담당하는 정비사들의 토큰을 찾습니다.
+    # 캐시에 없으면 users 쿼리(또는 비정규화된 토큰 목록 문서)를 읽습니다.
+    tokens = token_index.tokens(shop_id)
 
     if not tokens:
         print(f"No FCM tokens found for shop: {shop_id}")
+        coalescer.confirm(shop_id, batch)
         return
 
-    # 2. FCM 메시지 구성
-    message_title = f"🔔 새로운 견적 요청: {damage_type}"
-    message_body = f"요청 사항: {user_request}"
-
-    # 3. 멀티캐스트 메시지 전송 (여러 기기에 한 번에 전송)
-    multicast_message = messaging.MulticastMessage(
-        notification=messaging.Notification(
-            title=message_title,
-            body=message_body,
-        ),
-        tokens=tokens,
-        data={
-            "shopId": shop_id,
-            "type": "new_estimate_request"
-        }
-    )
-
-    response = messaging.send_multicast(multicast_message)
-    print(f"Successfully sent {response.success_count} messages; failed {response.failure_count} messages.")
-
-    if response.failure_count > 0:
-        responses = response.responses
-        for idx, resp in enumerate(responses):
-            if not resp.success:
-                print(f"Token {tokens[idx]} failed with error: {resp.exception}")
+    # 2. FCM 메시지 구성 (여러 건이 묶였으면 요약)
+    if batch.count == 1:
+        message_title = f"🔔 새로운 견적 요청: {damage_type}"
+        message_body = f"요청 사항: {user_request}"
+    else:
+        damage_types = list(dict.fromkeys(item["damageType"] for item in batch.items))
+        message_title = f"🔔 새로운 견적 요청 {batch.count}건"
+        message_body = f"파손 유형: {', '.join(damage_types)}"
+
+    # 3. 멀티캐스트 메시지 전송 (500개 이하 청크로 나눠 동시에 전송)
+    def make_message(chunk):
+        return messaging.MulticastMessage(
+            notification=messaging.Notification(
+                title=message_title,
+                body=message_body,
+            ),
+            tokens=chunk,
+            data={
+                "shopId": shop_id,
+                "type": "new_estimate_request",
+                "count": str(batch.count),
+            }
+        )
+
+    result = fan_out(messaging, make_message, tokens)
+    # 보낸 뒤에만 창 기록을 지웁니다. 그 전에 실패하면 재시도된 이 이벤트가 묶인 요청까지 다시 보냅니다.
+    coalescer.confirm(shop_id, batch)
+    print(f"Successfully sent {result.success_count} messages; failed {result.failure_count} messages "
+          f"({result.chunks} chunks).")
+
+    for token, error in result.failures:
+        print(f"Token {token} failed with error: {error}")
+
+    # 4. 삭제되었거나 잘못된 토큰은 정리해서 다음 요청부터 보내지 않음
+    if result.dead_tokens:
+        token_index.remove_tokens(shop_id, result.dead_tokens)
+        pruned = prune_dead_tokens(db, result.dead_tokens)
+        print(f"Pruned {len(result.dead_tokens)} dead tokens from {pruned} user documents")
+
+
+@functions_framework.cloud_event
+def sync_mechanic_tokens(cloud_event):
+    """
+    Firestore 문서 쓰기 트리거: users/{uid}
+    정비사의 fcmToken / serviceCenterId / role 변경을 shop_mechanic_tokens/{shopId}.mechanicTokens에 반영합니다.
+    send_estimate_notification 인스턴스의 토큰 캐시는 TOKEN_CACHE_TTL이 지나면 이 목록을 다시 읽습니다.
+
+    TOKEN_LOOKUP=denormalized는 이 트리거가 배포된 뒤에만 켭니다. 두 함수 모두 같은 설정으로 배포합니다.
+
+        gcloud functions deploy sync_mechanic_tokens --gen2 --region=asia-northeast3 --runtime=python311 \
+            --source=server/notifications --entry-point=sync_mechanic_tokens \
+            --trigger-event-filters=type=google.cloud.firestore.document.v1.written \
+            --trigger-event-filters=database='(default)' \
+            --trigger-event-filters-path-pattern=document='users/{uid}' \
+            --set-env-vars=TOKEN_LOOKUP=denormalized
+        gcloud functions deploy send_estimate_notification ... --update-env-vars=TOKEN_LOOKUP=denormalized
+
+    shop_mechanic_tokens 컬렉션은 서버 전용이므로 Firestore 보안 규칙에서 클라이언트 접근을 막습니다.
+
+        match /shop_mechanic_tokens/{shopId} { allow read, write: if false; }
+    """
+    data = cloud_event.data or {}
+    old_fields = (data.get("oldValue") or {}).get("fields")
+    new_fields = (data.get("value") or {}).get("fields")
+
+    changed = token_index.on_user_change(old_fields, new_fields)
+    if changed:
+        print(f"Updated mechanic tokens for shops: {', '.join(changed)}")
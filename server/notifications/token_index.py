@@ -0,0 +1,209 @@
+import os
+import threading
+import time
+
+# 정비사 토큰 조회 방식: query(users 컬렉션 쿼리) | denormalized(토큰 목록 문서 하나 읽기)
+# denormalized는 users/{uid} 쓰기 트리거(sync_mechanic_tokens)가 배포되어 있어야 새 정비사/갱신된 토큰이 반영됩니다.
+# (배포 방법은 notifications/main.py의 sync_mechanic_tokens 참고) 트리거 없이 켜면 목록이 처음 채운 상태로 굳습니다.
+TOKEN_LOOKUP = os.environ.get("TOKEN_LOOKUP", "query").lower()
+# 정비소별 토큰 캐시 유지 시간 (0이면 캐시 사용 안 함)
+# 캐시는 인스턴스마다 따로 있으므로, 다른 인스턴스에서 바뀐 토큰은 최대 이 시간만큼 늦게 반영됩니다.
+TOKEN_CACHE_TTL = float(os.environ.get("TOKEN_CACHE_TTL", 60))
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", 1024))
+# 정비소별 토큰 목록 문서({컬렉션}/{shopId})를 두는 서버 전용 컬렉션.
+# FCM 토큰은 앱이 널리 읽는 service_centers 문서에 두지 않으며, 보안 규칙에서 클라이언트 읽기/쓰기를 막아야 합니다.
+MECHANIC_TOKENS_COLLECTION = os.environ.get("MECHANIC_TOKENS_COLLECTION", "shop_mechanic_tokens")
+# 토큰 목록 문서에 비정규화해 두는 토큰 목록 필드
+SHOP_TOKENS_FIELD = "mechanicTokens"
+# 토큰 목록이 아직 없는 정비소에 정비사 변경이 있었음을 남기는 카운터 (진행 중인 채우기 트랜잭션을 다시 실행시킴)
+SHOP_TOKENS_VERSION_FIELD = "mechanicTokensVersion"
+
+
+class TokenCache:
+    """
+    정비소(shopId)별 FCM 토큰 목록 캐시. TTL이 지나면 다시 조회합니다.
+    인스턴스 로컬 캐시라서 invalidate()는 같은 프로세스의 항목만 버립니다. 전송 실패로 뺀 토큰은 보낸 인스턴스에서
+    바로 반영되지만, 다른 인스턴스(예: sync_mechanic_tokens)에서의 변경은 TTL이 지나야 보입니다.
+    """
+
+    def __init__(self, ttl=None, max_entries=None, clock=time.monotonic):
+        self.ttl = TOKEN_CACHE_TTL if ttl is None else ttl
+        self.max_entries = max_entries or TOKEN_CACHE_SIZE
+        self._clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, shop_id):
+        with self._lock:
+            entry = self._entries.get(shop_id)
+            if entry is None or self._clock() >= entry[1]:
+                self._entries.pop(shop_id, None)
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            return list(entry[0])
+
+    def set(self, shop_id, tokens):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if len(self._entries) >= self.max_entries and shop_id not in self._entries:
+                # 가장 먼저 만료되는 항목을 버립니다.
+                oldest = min(self._entries, key=lambda key: self._entries[key][1])
+                del self._entries[oldest]
+            self._entries[shop_id] = (list(tokens), self._clock() + self.ttl)
+
+    def invalidate(self, shop_id):
+        with self._lock:
+            if self._entries.pop(shop_id, None) is not None:
+                self.stats['invalidations'] += 1
+
+
+def _string_field(fields, name):
+    # Firestore 이벤트(JSON) 형식: {"name": {"stringValue": "..."}}
+    return (fields or {}).get(name, {}).get("stringValue")
+
+
+def mechanic_entry(fields):
+    """
+    users 문서 필드에서 (shopId, fcmToken)을 꺼냅니다. 정비사가 아니거나 값이 없으면 None.
+    """
+    if _string_field(fields, "role") != "mechanic":
+        return None
+    shop_id = _string_field(fields, "serviceCenterId")
+    token = _string_field(fields, "fcmToken")
+    if not shop_id or not token:
+        return None
+    return shop_id, token
+
+
+class MechanicTokenIndex:
+    """
+    정비소별 정비사 FCM 토큰 조회.
+
+    - query: users 컬렉션을 serviceCenterId/role로 쿼리하고 fcmToken을 모읍니다. (기존 방식)
+    - denormalized: MECHANIC_TOKENS_COLLECTION/{shopId}.mechanicTokens 문서 하나만 읽습니다.
+      필드가 아직 없는 정비소는 트랜잭션 안에서 query로 한 번 조회한 뒤 그 결과를 문서에 채워 둡니다.
+      이후의 변경은 sync_mechanic_tokens 트리거(on_user_change)가 반영합니다.
+    두 방식 모두 앞단의 TokenCache를 거치므로, 요청이 몰려도 TTL 동안은 Firestore를 읽지 않습니다.
+    (그만큼 토큰 변경은 최대 TOKEN_CACHE_TTL 늦게 반영됩니다)
+    """
+
+    def __init__(self, db, mode=None, cache=None, collection=None):
+        self.db = db
+        self.mode = (mode or TOKEN_LOOKUP).lower()
+        self.cache = cache if cache is not None else TokenCache()
+        self.collection = collection or MECHANIC_TOKENS_COLLECTION
+
+    def tokens(self, shop_id):
+        tokens = self.cache.get(shop_id)
+        if tokens is not None:
+            return tokens
+        if self.mode == 'denormalized':
+            tokens = self._read_shop_tokens(shop_id)
+        else:
+            tokens = self._query_tokens(shop_id)
+        self.cache.set(shop_id, tokens)
+        return tokens
+
+    def _query_tokens(self, shop_id):
+        query = self.db.collection("users").where("serviceCenterId", "==", shop_id).where("role", "==", "mechanic")
+        tokens = []
+        for doc in query.stream():
+            token = doc.to_dict().get("fcmToken")
+            if token and token not in tokens:
+                tokens.append(token)
+        return tokens
+
+    def _tokens_ref(self, shop_id):
+        return self.db.collection(self.collection).document(shop_id)
+
+    def _read_shop_tokens(self, shop_id):
+        tokens_ref = self._tokens_ref(shop_id)
+        snapshot = tokens_ref.get()
+        current = snapshot.to_dict() if snapshot.exists else None
+        if current is not None and SHOP_TOKENS_FIELD in current:
+            return list(current[SHOP_TOKENS_FIELD] or [])
+        return self._backfill_shop_tokens(tokens_ref, shop_id)
+
+    def _backfill_shop_tokens(self, tokens_ref, shop_id):
+        """
+        아직 비정규화되지 않은 정비소: 쿼리 결과로 목록을 채워 다음부터는 문서 하나만 읽게 합니다.
+        토큰 목록 문서를 트랜잭션으로 읽어 두므로(없는 문서도 포함), 쿼리와 쓰기 사이에 _update_shop_tokens가
+        문서를 건드리면 트랜잭션이 다시 실행되어 그 정비사의 토큰까지 포함한 목록을 씁니다.
+        """
+        from google.cloud import firestore
+
+        @firestore.transactional
+        def _backfill(transaction):
+            snapshot = tokens_ref.get(transaction=transaction)
+            current = snapshot.to_dict() if snapshot.exists else None
+            if current is not None and SHOP_TOKENS_FIELD in current:
+                # 다른 인스턴스가 먼저 채웠으면 그 목록을 씁니다.
+                return list(current[SHOP_TOKENS_FIELD] or [])
+            tokens = self._query_tokens(shop_id)
+            transaction.set(tokens_ref, {SHOP_TOKENS_FIELD: tokens}, merge=True)
+            return tokens
+
+        return _backfill(self.db.transaction())
+
+    def on_user_change(self, old_fields, new_fields):
+        """
+        users 문서 변경 이벤트를 반영합니다. 토큰/소속 정비소/역할이 바뀌었으면
+        정비소 토큰 목록 문서를 고치고, 이 인스턴스의 해당 정비소 캐시를 버립니다.
+        (알림을 보내는 다른 인스턴스의 캐시는 TOKEN_CACHE_TTL이 지나야 새 목록을 읽습니다)
+        변경된 정비소 ID 목록을 반환합니다.
+        """
+        old = mechanic_entry(old_fields)
+        new = mechanic_entry(new_fields)
+        if old == new:
+            return []
+
+        from google.cloud import firestore
+
+        changed = []
+        if old is not None:
+            self._update_shop_tokens(old[0], firestore.ArrayRemove([old[1]]))
+            changed.append(old[0])
+        if new is not None:
+            self._update_shop_tokens(new[0], firestore.ArrayUnion([new[1]]))
+            if new[0] not in changed:
+                changed.append(new[0])
+        for shop_id in changed:
+            self.cache.invalidate(shop_id)
+        return changed
+
+    def remove_tokens(self, shop_id, tokens):
+        """
+        전송할 수 없는 토큰을 정비소 토큰 목록(denormalized일 때)과 캐시에서 바로 뺍니다.
+        (users 문서 정리는 별도로 하며, 그 변경 이벤트가 와도 결과는 같습니다.)
+        """
+        if not tokens:
+            return
+        if self.mode == 'denormalized':
+            from google.cloud import firestore
+
+            self._update_shop_tokens(shop_id, firestore.ArrayRemove(list(tokens)))
+        self.cache.invalidate(shop_id)
+
+    def _update_shop_tokens(self, shop_id, transform):
+        """
+        이미 채워진 토큰 목록에만 변경을 적용합니다.
+        목록이 없는 문서에 ArrayUnion을 쓰면 일부 토큰만 담긴 목록이 생기므로 목록은 건드리지 않고
+        버전 카운터만 올립니다(문서가 없으면 만듭니다). 같은 문서를 읽은 채우기 트랜잭션이 진행 중이면 충돌로
+        다시 실행되어 이 변경이 반영된 쿼리 결과를 쓰고, 아니면 다음 조회 때 쿼리로 전체 목록을 채웁니다.
+        """
+        from google.cloud import firestore
+
+        tokens_ref = self._tokens_ref(shop_id)
+
+        @firestore.transactional
+        def _update(transaction):
+            snapshot = tokens_ref.get(transaction=transaction)
+            if snapshot.exists and SHOP_TOKENS_FIELD in (snapshot.to_dict() or {}):
+                transaction.update(tokens_ref, {SHOP_TOKENS_FIELD: transform})
+            else:
+                transaction.set(tokens_ref, {SHOP_TOKENS_VERSION_FIELD: firestore.Increment(1)}, merge=True)
+
+        _update(self.db.transaction())
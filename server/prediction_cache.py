@@ -0,0 +1,225 @@
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# 캐시 설정 (환경 변수로 조정)
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", 24 * 3600))
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", 1024))
+# 공유 캐시 백엔드: none | sqlite | firestore
+PREDICTION_CACHE_BACKEND = os.environ.get("PREDICTION_CACHE_BACKEND", "none").lower()
+PREDICTION_CACHE_PATH = os.environ.get("PREDICTION_CACHE_PATH", "/tmp/prediction_cache.sqlite3")
+# 모델을 교체하면 값을 바꿔 이전 결과를 무효화합니다.
+PREDICTION_CACHE_NAMESPACE = os.environ.get("PREDICTION_CACHE_NAMESPACE", "v1")
+
+
+def cache_key(content_hash, car_model, user_id, namespace=None):
+    """
+    이미지 내용 해시(GCS md5Hash), 차종, 사용자 ID로 캐시 키를 만듭니다.
+    파일명이 달라도 같은 사용자의 같은 사진이면 같은 키가 됩니다.
+    /predict에는 user_id도 함께 보내므로, 다른 사용자가 올린 같은 사진의 결과는 재사용하지 않습니다.
+    """
+    if not content_hash or not user_id:
+        return None
+    namespace = PREDICTION_CACHE_NAMESPACE if namespace is None else namespace
+    return f"{namespace}:{user_id}:{content_hash}:{car_model}"
+
+
+class LRUTier:
+    """
+    인스턴스 내부 메모리 캐시. 최대 max_entries개를 유지하며 TTL이 지난 항목은 버립니다.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, clock=time.time):
+        self.max_entries = max_entries or PREDICTION_CACHE_SIZE
+        self.ttl = PREDICTION_CACHE_TTL if ttl is None else ttl
+        self._clock = clock
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if self._clock() >= expires_at:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (value, self._clock() + self.ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SQLiteTier:
+    """
+    파일 기반 공유 캐시. 로컬 테스트나 한 머신의 여러 프로세스가 캐시를 공유할 때 사용합니다.
+    max_entries를 넘으면 가장 오래전에 사용된 항목부터 지웁니다.
+    """
+
+    def __init__(self, path=None, ttl=None, max_entries=100000, clock=time.time):
+        self.path = path or PREDICTION_CACHE_PATH
+        self.ttl = PREDICTION_CACHE_TTL if ttl is None else ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+
+    def get(self, key):
+        now = self._clock()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM predictions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now >= row[1]:
+                self._conn.execute("DELETE FROM predictions WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE predictions SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = self._clock()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO predictions (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM predictions WHERE expires_at <= ?", (now,))
+        self._conn.execute(
+            "DELETE FROM predictions WHERE key IN ("
+            " SELECT key FROM predictions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+
+class FirestoreTier:
+    """
+    Firestore 기반 공유 캐시. 여러 Cloud Run 인스턴스가 같은 결과를 재사용합니다.
+    만료된 문서는 읽을 때 무시하며, 실제 삭제는 expiresAt 필드에 Firestore TTL 정책을 걸어 처리합니다.
+    """
+
+    def __init__(self, collection='prediction_cache', ttl=None, client=None, clock=time.time):
+        if client is None:
+            from google.cloud import firestore
+            client = firestore.Client()
+        self.collection = client.collection(collection)
+        self.ttl = PREDICTION_CACHE_TTL if ttl is None else ttl
+        self._clock = clock
+
+    def _doc(self, key):
+        # base64 md5에는 '/'가 들어갈 수 있어 문서 ID로 쓸 수 있게 바꿉니다.
+        return self.collection.document(key.replace('/', '_'))
+
+    def get(self, key):
+        snapshot = self._doc(key).get()
+        if not snapshot.exists:
+            return None
+        doc = snapshot.to_dict()
+        if self._clock() >= doc.get('expiresAtEpoch', 0):
+            return None
+        return doc.get('value')
+
+    def set(self, key, value):
+        from datetime import datetime, timezone
+
+        expires_at = self._clock() + self.ttl
+        self._doc(key).set({
+            'value': value,
+            'expiresAtEpoch': expires_at,
+            'expiresAt': datetime.fromtimestamp(expires_at, tz=timezone.utc),
+        })
+
+
+class PredictionCache:
+    """
+    로컬 LRU + 선택적 공유 캐시로 이루어진 2단계 예측 결과 캐시.
+    공유 캐시에서 찾은 값은 로컬에도 올려 두며, 히트/미스 횟수를 집계합니다.
+    공유 캐시 오류는 추론을 막지 않도록 경고만 남기고 미스로 처리합니다.
+    """
+
+    def __init__(self, local=None, shared=None):
+        self.local = local if local is not None else LRUTier()
+        self.shared = shared
+        self._lock = threading.Lock()
+        self.stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'sets': 0, 'errors': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def get(self, key):
+        if key is None:
+            return None
+        value = self.local.get(key)
+        if value is not None:
+            self._count('local_hits')
+            return copy.deepcopy(value)
+
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception as e:
+                print(f"Warning: shared prediction cache read failed: {e}")
+                self._count('errors')
+                value = None
+            if value is not None:
+                self.local.set(key, value)
+                self._count('shared_hits')
+                return copy.deepcopy(value)
+
+        self._count('misses')
+        return None
+
+    def set(self, key, value):
+        if key is None:
+            return
+        value = copy.deepcopy(value)
+        self.local.set(key, value)
+        self._count('sets')
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value)
+            except Exception as e:
+                print(f"Warning: shared prediction cache write failed: {e}")
+                self._count('errors')
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+
+def create_prediction_cache(backend=None):
+    """
+    환경 변수 설정에 맞는 PredictionCache를 만듭니다.
+    """
+    backend = (backend or PREDICTION_CACHE_BACKEND).lower()
+    if backend == 'sqlite':
+        shared = SQLiteTier()
+    elif backend == 'firestore':
+        shared = FirestoreTier()
+    else:
+        shared = None
+    return PredictionCache(shared=shared)
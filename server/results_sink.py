@@ -0,0 +1,235 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+# 분석 결과 저장 설정 (환경 변수로 조정)
+# 백엔드: firestore(기본, 배포 환경) | memory | none (memory/none은 로컬 실행용, none은 로그만 출력)
+RESULTS_SINK = os.environ.get("RESULTS_SINK", "firestore").lower()
+# 앱(home_screen)이 구독하는 컬렉션
+RESULTS_COLLECTION = os.environ.get("RESULTS_COLLECTION", "damage_analyses")
+# bulk 모드: 동시에 처리 중인 이벤트의 쓰기를 모아 한 번의 WriteBatch로 커밋
+RESULTS_BULK = os.environ.get("RESULTS_BULK", "1") in ("1", "true", "True")
+# Firestore WriteBatch는 최대 500건까지 허용
+RESULTS_BATCH_MAX_SIZE = min(int(os.environ.get("RESULTS_BATCH_MAX_SIZE", 100)), 500)
+RESULTS_BATCH_MAX_WAIT_MS = float(os.environ.get("RESULTS_BATCH_MAX_WAIT_MS", 20))
+# 커밋을 기다리는 쓰기가 이만큼 쌓이면 새 쓰기는 자리가 날 때까지 대기 (backpressure)
+RESULTS_MAX_PENDING = int(os.environ.get("RESULTS_MAX_PENDING", 1000))
+# 쓰기 하나가 커밋될 때까지 기다리는 최대 시간 (대기열 대기 포함)
+RESULTS_FLUSH_TIMEOUT = float(os.environ.get("RESULTS_FLUSH_TIMEOUT", 10))
+
+
+def result_doc_id(bucket, name, generation):
+    """
+    객체 버전별 결과 문서 ID. 같은 이벤트가 재시도되어도 같은 문서를 덮어씁니다.
+    문서 ID에는 '/'를 쓸 수 없으므로 '_'로 바꿉니다.
+    """
+    return f"{bucket}_{name}_{generation}".replace('/', '_')
+
+
+class FirestoreWriter:
+    """
+    (문서 ID, 데이터) 목록을 Firestore WriteBatch 하나로 커밋합니다.
+    merge로 쓰므로 재처리(backfill)처럼 일부 필드만 보낸 쓰기는 나머지 필드를 유지합니다.
+    google.cloud.firestore는 import 비용이 커서 첫 커밋 시점에 클라이언트를 만듭니다. (콜드 스타트 제외)
+    """
+
+    def __init__(self, collection=None, client=None):
+        self._client = client
+        self._collection_name = collection or RESULTS_COLLECTION
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from google.cloud import firestore
+
+                    self._client = firestore.Client()
+        return self._client
+
+    def commit(self, writes):
+        client = self.client
+        collection = client.collection(self._collection_name)
+        batch = client.batch()
+        for doc_id, data in writes:
+            batch.set(collection.document(doc_id), data, merge=True)
+        batch.commit()
+
+
+class InMemoryWriter:
+    """
+    GCP 없이 쓰기 처리량/지연을 측정하기 위한 Firestore 대역.
+    커밋마다 commit_latency_ms, 문서마다 per_write_ms만큼 지연을 흉내 내며,
+    동시에 진행할 수 있는 커밋 수를 slots로 제한합니다.
+    """
+
+    def __init__(self, commit_latency_ms=0.0, per_write_ms=0.0, slots=8, sleep=time.sleep):
+        self.commit_latency = commit_latency_ms / 1000.0
+        self.per_write = per_write_ms / 1000.0
+        self.documents = {}
+        self.commits = 0
+        self._slots = threading.BoundedSemaphore(slots)
+        self._lock = threading.Lock()
+        self._sleep = sleep
+
+    def commit(self, writes):
+        with self._slots:
+            delay = self.commit_latency + self.per_write * len(writes)
+            if delay:
+                self._sleep(delay)
+        with self._lock:
+            for doc_id, data in writes:
+                self.documents[doc_id] = dict(self.documents.get(doc_id) or {}, **data)
+            self.commits += 1
+
+
+class DirectSink:
+    """
+    쓰기마다 바로 커밋합니다. (bulk 모드를 끈 경우와 벤치마크 기준선)
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.stats = {'batches': 0, 'writes': 0, 'errors': 0}
+        self._lock = threading.Lock()
+
+    def write(self, doc_id, data, timeout=None):
+        try:
+            self.writer.commit([(doc_id, data)])
+        except Exception:
+            with self._lock:
+                self.stats['errors'] += 1
+            raise
+        with self._lock:
+            self.stats['batches'] += 1
+            self.stats['writes'] += 1
+
+
+class _PendingWrite:
+    __slots__ = ('doc_id', 'data', 'future', 'enqueued_at')
+
+    def __init__(self, doc_id, data):
+        self.doc_id = doc_id
+        self.data = data
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class BulkSink:
+    """
+    같은 인스턴스에서 동시에 처리 중인 이벤트들의 쓰기를 최대 max_size건 또는 max_wait_ms까지 모아
+    한 번에 커밋합니다.
+
+    - write()는 자기 쓰기가 포함된 배치가 커밋될 때까지 기다리므로, 함수가 응답한 뒤
+      (Cloud Run이 CPU를 제한한 뒤) 쓰기가 남아 있는 일이 없습니다.
+    - 동시에 진행하는 커밋은 max_in_flight개로 제한되고, 그동안 쓰기는 대기열에 남습니다. 대기열은 max_pending건으로
+      제한되어, 저장소가 느려지면 새 쓰기가 자리가 날 때까지 기다립니다.
+    - timeout(기본 RESULTS_FLUSH_TIMEOUT) 안에 커밋되지 않으면 TimeoutError를 발생시킵니다.
+      호출 쪽에서 이벤트를 실패 처리하면 플랫폼 재시도 때 같은 문서 ID로 다시 씁니다.
+    - 배치 커밋이 실패하면 그 배치의 모든 쓰기가 같은 예외로 실패합니다.
+    """
+
+    def __init__(self, writer, max_size=None, max_wait_ms=None, max_pending=None, flush_timeout=None,
+                 max_in_flight=2):
+        self.writer = writer
+        self.max_size = max_size or RESULTS_BATCH_MAX_SIZE
+        self.max_wait = (RESULTS_BATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000.0
+        self.flush_timeout = RESULTS_FLUSH_TIMEOUT if flush_timeout is None else flush_timeout
+        self._queue = queue.Queue(maxsize=max_pending or RESULTS_MAX_PENDING)
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='results-sink')
+        # executor의 작업 큐는 크기 제한이 없으므로, 커밋 자리가 날 때까지 다음 배치를 꺼내지 않습니다.
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.stats = {'batches': 0, 'writes': 0, 'errors': 0, 'max_batch': 0}
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='results-sink', daemon=True)
+                self._thread.start()
+
+    def submit(self, doc_id, data, timeout=None):
+        """
+        쓰기를 대기열에 넣고 커밋 완료를 알려줄 Future를 반환합니다.
+        대기열이 가득 차 timeout 안에 들어가지 못하면 TimeoutError를 발생시킵니다.
+        """
+        timeout = self.flush_timeout if timeout is None else timeout
+        pending = _PendingWrite(doc_id, data)
+        self._ensure_started()
+        try:
+            self._queue.put(pending, timeout=timeout)
+        except queue.Full:
+            raise TimeoutError(f"results sink is full ({self._queue.maxsize} pending writes)")
+        return pending.future
+
+    def write(self, doc_id, data, timeout=None):
+        timeout = self.flush_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        future = self.submit(doc_id, data, timeout)
+        try:
+            return future.result(max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            raise TimeoutError(f"result write for {doc_id} was not committed within {timeout:.1f}s")
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            self._in_flight.acquire()
+            batch = self._collect()
+            self._executor.submit(self._commit, batch)
+
+    def _commit(self, batch):
+        # 같은 배치 안에 같은 문서가 두 번 있으면 WriteBatch에서는 마지막 값이 남으므로 미리 합칩니다.
+        writes = {}
+        for pending in batch:
+            writes[pending.doc_id] = pending.data
+        try:
+            self.writer.commit(list(writes.items()))
+        except Exception as e:
+            with self._lock:
+                self.stats['errors'] += 1
+            for pending in batch:
+                pending.future.set_exception(e)
+            return
+        finally:
+            self._in_flight.release()
+
+        with self._lock:
+            self.stats['batches'] += 1
+            self.stats['writes'] += len(batch)
+            self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+        for pending in batch:
+            pending.future.set_result(None)
+
+
+def create_results_sink(backend=None, bulk=None):
+    """
+    환경 변수 설정에 맞는 결과 저장소를 만듭니다. 'none'이면 None을 반환합니다.
+    """
+    backend = (backend or RESULTS_SINK).lower()
+    if backend == 'firestore':
+        writer = FirestoreWriter()
+    elif backend == 'memory':
+        writer = InMemoryWriter()
+    else:
+        return None
+    bulk = RESULTS_BULK if bulk is None else bulk
+    return BulkSink(writer) if bulk else DirectSink(writer)
@@ -0,0 +1,45 @@
+"""
+서버 모듈(main.py와 같은 디렉터리의 최상위 모듈)과 notifications 함수 모듈을 그대로 import할 수 있게 합니다.
+두 디렉터리 모두 main.py가 있으므로 테스트에서는 main을 import하지 않습니다.
+Firestore가 필요한 테스트는 fake_firestore 픽스처로 benchmarks/fake_firebase 대역을 씁니다.
+
+    cd server && python -m pytest -q tests
+"""
+import os
+import sys
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+sys.path.insert(1, os.path.join(SERVER_DIR, 'notifications'))
+sys.path.append(os.path.join(SERVER_DIR, 'benchmarks'))
+
+# fake_firebase.install()이 바꾸는 모듈
+FAKE_FIREBASE_MODULES = ('google', 'google.cloud', 'google.cloud.firestore', 'firebase_admin',
+                         'firebase_admin.firestore', 'firebase_admin.credentials', 'firebase_admin.messaging')
+
+
+@pytest.fixture
+def fake_firestore():
+    """
+    google.cloud.firestore를 가짜 Firestore로 바꾸고 그 DB(FakeFirestore)를 반환합니다. 테스트가 끝나면 되돌립니다.
+    """
+    import fake_firebase
+
+    saved = {name: sys.modules.get(name) for name in FAKE_FIREBASE_MODULES}
+    google_cloud = saved['google.cloud']
+    saved_firestore = getattr(google_cloud, 'firestore', None)
+    db = fake_firebase.FakeFirestore()
+    fake_firebase.install(db, fake_firebase.FakeMessaging())
+    yield db
+    for name, module in saved.items():
+        if module is None:
+            sys.modules.pop(name, None)
+        else:
+            sys.modules[name] = module
+    if google_cloud is not None:
+        if saved_firestore is None:
+            vars(google_cloud).pop('firestore', None)
+        else:
+            google_cloud.firestore = saved_firestore
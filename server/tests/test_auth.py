@@ -0,0 +1,125 @@
+import base64
+import json
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import pytest
+
+from auth import DEFAULT_TOKEN_LIFETIME, IdTokenProvider, _token_expiry
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def jwt(exp, name='token'):
+    payload = base64.urlsafe_b64encode(json.dumps({'exp': exp, 'sub': name}).encode()).rstrip(b'=').decode()
+    return f"header.{payload}.signature"
+
+
+class Fetcher:
+    """
+    fetch 호출을 세고, gate가 열릴 때까지 붙잡아 둘 수 있는 fetcher 대역입니다.
+    """
+
+    def __init__(self, clock, lifetime=3600):
+        self.clock = clock
+        self.lifetime = lifetime
+        self.calls = 0
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, audience):
+        self.calls += 1
+        name = f"{audience}-{self.calls}"
+        self.gate.wait(5)
+        return jwt(self.clock() + self.lifetime, name)
+
+
+def test_token_expiry_reads_exp_without_verifying():
+    assert _token_expiry(jwt(2000), now=1000) == 2000
+    assert _token_expiry('not-a-jwt', now=1000) == 1000 + DEFAULT_TOKEN_LIFETIME
+
+
+def test_cached_token_is_reused_until_the_refresh_margin():
+    clock = FakeClock()
+    fetcher = Fetcher(clock)
+    provider = IdTokenProvider(fetcher, refresh_margin=300, min_validity=30, clock=clock)
+
+    token = provider.get('https://ai.test')
+    assert provider.get('https://ai.test') == token
+    assert fetcher.calls == 1
+
+    provider.invalidate('https://ai.test')
+    assert provider.get('https://ai.test') != token
+    assert fetcher.calls == 2
+
+
+def test_expiring_token_is_returned_while_refreshing():
+    clock = FakeClock()
+    fetcher = Fetcher(clock)
+    provider = IdTokenProvider(fetcher, refresh_margin=300, min_validity=30, clock=clock)
+    token = provider.get('https://ai.test')
+
+    clock.now += 3600 - 100
+    assert provider.get('https://ai.test') == token
+
+    provider._entry('https://ai.test').pending.result(5)
+    assert provider.get('https://ai.test') != token
+    assert fetcher.calls == 2
+
+
+def test_concurrent_waiters_share_one_fetch():
+    clock = FakeClock()
+    fetcher = Fetcher(clock)
+    fetcher.gate.clear()
+    provider = IdTokenProvider(fetcher, clock=clock)
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(provider.get('https://ai.test', timeout=5)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    fetcher.gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(results) == 4
+    assert len(set(results)) == 1
+    assert fetcher.calls == 1
+
+
+def test_waiter_times_out_and_the_next_call_fetches_again():
+    clock = FakeClock()
+    fetcher = Fetcher(clock)
+    fetcher.gate.clear()
+    provider = IdTokenProvider(fetcher, clock=clock, fetch_timeout=0.1)
+
+    with pytest.raises(FutureTimeoutError):
+        provider.get('https://ai.test')
+
+    fetcher.gate.set()
+    assert provider.get('https://ai.test')
+    assert fetcher.calls == 2
+
+
+def test_fetch_error_reaches_the_waiter_and_is_not_cached():
+    clock = FakeClock()
+    calls = []
+
+    def fetcher(audience):
+        calls.append(audience)
+        if len(calls) == 1:
+            raise RuntimeError("metadata server down")
+        return jwt(clock() + 3600)
+
+    provider = IdTokenProvider(fetcher, clock=clock)
+
+    with pytest.raises(RuntimeError):
+        provider.get('https://ai.test', timeout=5)
+    assert provider.get('https://ai.test', timeout=5)
+    assert len(calls) == 2
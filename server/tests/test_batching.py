@@ -0,0 +1,126 @@
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import pytest
+
+from batching import PredictBatcher, create_batcher, request_deadline
+
+
+class UnsupportedError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.response = type('Response', (), {'status_code': status_code})()
+
+
+class Recorder:
+    """
+    send_batch/send_single 대역. gate가 열릴 때까지 전송을 붙잡아 둘 수 있습니다.
+    """
+
+    def __init__(self, batch_error=None):
+        self.batch_error = batch_error
+        self.batches = []
+        self.singles = []
+        self.started = threading.Semaphore(0)
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def send_batch(self, items):
+        self.batches.append([item.filename for item in items])
+        self.started.release()
+        self.gate.wait(5)
+        if self.batch_error is not None:
+            raise self.batch_error
+        return [{'name': item.filename} for item in items]
+
+    def send_single(self, item):
+        self.singles.append(item.filename)
+        self.started.release()
+        self.gate.wait(5)
+        return {'name': item.filename}
+
+
+def make_batcher(recorder, **kwargs):
+    kwargs.setdefault('max_size', 4)
+    kwargs.setdefault('max_wait_ms', 50)
+    return PredictBatcher(recorder.send_batch, recorder.send_single, **kwargs)
+
+
+def test_concurrent_requests_share_a_batch():
+    recorder = Recorder()
+    batcher = make_batcher(recorder)
+
+    futures = [batcher.submit(f"{i}.jpg", b'x', 'image/jpeg', {}) for i in range(3)]
+
+    assert [f.result(5) for f in futures] == [{'name': f"{i}.jpg"} for i in range(3)]
+    assert recorder.batches == [['0.jpg', '1.jpg', '2.jpg']]
+    assert batcher.stats == {'batches': 1, 'items': 3, 'single_items': 0}
+
+
+def test_unsupported_batch_endpoint_falls_back_to_single_requests():
+    recorder = Recorder(batch_error=UnsupportedError(404))
+    batcher = make_batcher(recorder)
+
+    futures = [batcher.submit(f"{i}.jpg", b'x', 'image/jpeg', {}) for i in range(2)]
+
+    assert [f.result(5) for f in futures] == [{'name': '0.jpg'}, {'name': '1.jpg'}]
+    assert not batcher.batch_supported
+    assert batcher.predict('2.jpg', b'x', 'image/jpeg', {}) == {'name': '2.jpg'}
+    assert recorder.singles == ['0.jpg', '1.jpg', '2.jpg']
+
+
+def test_batch_error_fails_every_item():
+    recorder = Recorder(batch_error=UnsupportedError(500))
+    batcher = make_batcher(recorder)
+
+    futures = [batcher.submit(f"{i}.jpg", b'x', 'image/jpeg', {}) for i in range(2)]
+
+    for future in futures:
+        with pytest.raises(UnsupportedError):
+            future.result(5)
+    assert batcher.batch_supported
+
+
+def test_in_flight_dispatches_are_bounded():
+    recorder = Recorder()
+    recorder.gate.clear()
+    batcher = make_batcher(recorder, max_size=1, max_wait_ms=0, max_in_flight=1)
+
+    first = batcher.submit('0.jpg', b'x', 'image/jpeg', {})
+    assert recorder.started.acquire(timeout=5)
+    second = batcher.submit('1.jpg', b'x', 'image/jpeg', {})
+
+    # 전송 자리가 없으면 다음 요청은 풀에 넘어가지 않고 대기열에 남습니다.
+    assert not recorder.started.acquire(timeout=0.1)
+    assert batcher._queue.qsize() == 1
+
+    recorder.gate.set()
+    assert first.result(5) == {'name': '0.jpg'}
+    assert second.result(5) == {'name': '1.jpg'}
+
+
+def test_predict_times_out_and_cancels_the_queued_request():
+    recorder = Recorder()
+    recorder.gate.clear()
+    batcher = make_batcher(recorder, max_size=1, max_wait_ms=0, max_in_flight=1, result_timeout=0.1)
+
+    first = batcher.submit('0.jpg', b'x', 'image/jpeg', {})
+    assert recorder.started.acquire(timeout=5)
+    with pytest.raises(FutureTimeoutError):
+        batcher.predict('1.jpg', b'x', 'image/jpeg', {})
+
+    recorder.gate.set()
+    assert first.result(5) == {'name': '0.jpg'}
+    assert batcher.predict('2.jpg', b'x', 'image/jpeg', {}, timeout=5) == {'name': '2.jpg'}
+    # 취소된 요청은 전송하지 않습니다.
+    assert recorder.singles == ['0.jpg', '2.jpg']
+
+
+def test_result_timeout_follows_the_client_settings():
+    client = type('Client', (), {
+        'connect_timeout': 3.0, 'read_timeout': 60.0, 'max_retries': 3, 'backoff_max': 10.0,
+        'predict_batch': None,
+    })()
+
+    assert request_deadline(client) == 5 * 63.0 + 3 * 10.0
+    assert create_batcher(client).result_timeout >= request_deadline(client)
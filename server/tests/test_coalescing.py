@@ -0,0 +1,124 @@
+from coalescing import JOINED, OWNER, InMemoryWindowStore, NotificationCoalescer
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_store(clock, window=5, grace=30):
+    return InMemoryWindowStore(window=window, grace=grace, max_items=10, clock=clock)
+
+
+def item(n):
+    return {'userRequest': f"request {n}", 'damageType': 'scratch'}
+
+
+def test_first_event_owns_the_window_and_later_events_join():
+    store = make_store(FakeClock())
+
+    status, window_id = store.join('shop', 'e1', item(1))
+    assert status == OWNER
+    assert store.join('shop', 'e2', item(2)) == (JOINED, window_id)
+
+    batch = store.close('shop', window_id)
+    assert batch.count == 2
+    assert [i['userRequest'] for i in batch.items] == ['request 1', 'request 2']
+
+
+def test_redelivered_event_is_counted_once():
+    store = make_store(FakeClock())
+    _, window_id = store.join('shop', 'e1', item(1))
+    store.join('shop', 'e2', item(2))
+    store.join('shop', 'e2', item(2))
+
+    assert store.close('shop', window_id).count == 2
+
+
+def test_confirmed_window_is_gone():
+    store = make_store(FakeClock())
+    _, window_id = store.join('shop', 'e1', item(1))
+    store.close('shop', window_id)
+    store.confirm('shop', window_id)
+
+    status, next_id = store.join('shop', 'e2', item(2))
+    assert status == OWNER
+    assert store.close('shop', next_id).count == 1
+
+
+def test_owner_retry_resends_joined_requests_after_failed_send():
+    store = make_store(FakeClock())
+    _, window_id = store.join('shop', 'e1', item(1))
+    store.join('shop', 'e2', item(2))
+    store.join('shop', 'e3', item(3))
+    assert store.close('shop', window_id).count == 3
+    # 보내기 전에 실패해 confirm하지 않았고, 플랫폼이 owner 이벤트를 다시 전달합니다.
+
+    status, retry_id = store.join('shop', 'e1', item(1))
+    assert status == OWNER
+    assert store.close('shop', retry_id).count == 3
+
+
+def test_unconfirmed_window_is_taken_over_after_grace():
+    clock = FakeClock()
+    store = make_store(clock, grace=30)
+    _, window_id = store.join('shop', 'e1', item(1))
+    store.join('shop', 'e2', item(2))
+    store.close('shop', window_id)
+
+    clock.now += 10
+    status, other_id = store.join('shop', 'e3', item(3))
+    assert status == OWNER
+    assert store.close('shop', other_id).count == 1
+
+    clock.now += 31
+    status, late_id = store.join('shop', 'e4', item(4))
+    assert status == OWNER
+    # e3의 창도 confirm되지 않았으므로 함께 다시 보냅니다.
+    assert store.close('shop', late_id).count == 4
+
+
+def test_event_joining_while_owner_sends_opens_a_new_window():
+    store = make_store(FakeClock())
+    _, first_id = store.join('shop', 'e1', item(1))
+    store.close('shop', first_id)
+
+    status, second_id = store.join('shop', 'e2', item(2))
+    assert status == OWNER
+    store.confirm('shop', first_id)
+    assert store.close('shop', second_id).count == 1
+
+
+def test_stale_owner_is_taken_over_with_its_requests():
+    clock = FakeClock()
+    store = make_store(clock, window=5, grace=30)
+    _, window_id = store.join('shop', 'e1', item(1))
+
+    clock.now += 36
+    status, new_id = store.join('shop', 'e2', item(2))
+    assert status == OWNER
+    assert new_id != window_id
+    assert store.close('shop', window_id) is None
+    assert store.close('shop', new_id).count == 2
+
+
+def test_coalescer_without_window_sends_immediately():
+    coalescer = NotificationCoalescer(store=None, window=0)
+
+    batch = coalescer.submit('shop', 'e1', item(1))
+    assert (batch.count, batch.items) == (1, [item(1)])
+    coalescer.confirm('shop', batch)
+
+
+def test_coalescer_owner_waits_and_confirms():
+    store = make_store(FakeClock())
+    slept = []
+    coalescer = NotificationCoalescer(store, window=5, sleep=slept.append)
+
+    batch = coalescer.submit('shop', 'e1', item(1))
+    coalescer.confirm('shop', batch)
+    assert slept == [5]
+    assert store.join('shop', 'e2', item(2))[0] == OWNER
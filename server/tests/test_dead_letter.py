@@ -0,0 +1,224 @@
+import pytest
+
+from dead_letter import (
+    DEAD_LETTER_MAX_DELAY, PARKED, PENDING, PERMANENT, TRANSIENT, FileDeadLetterStore, RetryScheduler,
+    StoredEvent, classify, create_dead_letter_store,
+)
+from http_client import CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.response = type('Response', (), {'status_code': status_code})()
+
+
+class UnknownError(Exception):
+    pass
+
+
+def event(event_id):
+    return StoredEvent({'id': event_id, 'type': 'google.cloud.storage.object.v1.finalized'},
+                       {'bucket': 'b', 'name': f"{event_id}.jpg"})
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    return FileDeadLetterStore(path=str(tmp_path / 'dead_letters'), clock=clock)
+
+
+@pytest.mark.parametrize('error, expected', [
+    (ConnectionError("reset"), TRANSIENT),
+    (TimeoutError(), TRANSIENT),
+    (CircuitOpenError(), TRANSIENT),
+    (HTTPError(503), TRANSIENT),
+    (HTTPError(429), TRANSIENT),
+    (HTTPError(400), PERMANENT),
+    (HTTPError(404), PERMANENT),
+    (ValueError("AI_SERVICE_URL not configured"), PERMANENT),
+    (UnknownError(), TRANSIENT),
+])
+def test_classify(error, expected):
+    assert classify(error) == expected
+
+
+def test_transient_failure_is_pending_until_backoff(store, clock):
+    record = store.record_failure(event('e1'), ConnectionError("reset"))
+
+    assert record['state'] == PENDING
+    assert record['attempts'] == 1
+    assert record['nextAttemptAt'] > clock.now
+    assert store.lease_due(10) == []
+
+    clock.now += DEAD_LETTER_MAX_DELAY + 1
+    leased = store.lease_due(10)
+    assert [r['eventId'] for r in leased] == ['e1']
+    assert leased[0]['event']['data'] == {'bucket': 'b', 'name': 'e1.jpg'}
+
+
+def test_repeated_failure_keeps_first_failure_time(store, clock):
+    store.record_failure(event('e1'), ConnectionError("reset"))
+    clock.now += 10
+    record = store.record_failure(event('e1'), ConnectionError("reset"))
+
+    assert record['attempts'] == 2
+    assert record['firstFailedAt'] == 1000.0
+    assert record['lastFailedAt'] == 1010.0
+
+
+def test_permanent_failure_is_parked(store):
+    record = store.record_failure(event('e1'), ValueError("bad image"))
+
+    assert record['state'] == PARKED
+    assert record['nextAttemptAt'] is None
+    assert [r['eventId'] for r in store.list(PARKED)] == ['e1']
+    assert store.list(PENDING) == []
+
+
+def test_lease_hides_event_until_release_or_expiry(store, clock):
+    store.record_failure(event('e1'), ConnectionError("reset"))
+    clock.now += DEAD_LETTER_MAX_DELAY + 1
+
+    assert len(store.lease_due(10, lease=60)) == 1
+    assert store.lease_due(10, lease=60) == []
+
+    store.release('e1')
+    assert len(store.lease_due(10, lease=60)) == 1
+
+    clock.now += 61
+    assert len(store.lease_due(10, lease=60)) == 1
+
+
+def test_lease_due_respects_limit_and_order(store, clock):
+    for event_id in ('e1', 'e2', 'e3'):
+        store.record_failure(event(event_id), ConnectionError("reset"))
+        clock.now += 1
+    clock.now += DEAD_LETTER_MAX_DELAY + 1
+
+    leased = store.lease_due(2)
+    assert len(leased) == 2
+    assert leased[0]['nextAttemptAt'] <= leased[1]['nextAttemptAt']
+
+
+def test_resolve_and_requeue(store, clock):
+    store.record_failure(event('e1'), ValueError("bad image"))
+
+    assert store.requeue('e1')
+    leased = store.lease_due(10)
+    assert [r['eventId'] for r in leased] == ['e1']
+    assert leased[0]['attempts'] == 0
+
+    store.resolve('e1')
+    assert store.list() == []
+    assert not store.requeue('e1')
+    store.resolve('e1')
+
+
+def test_file_backend_is_refused_on_cloud_run(monkeypatch):
+    monkeypatch.setenv('K_SERVICE', 'analyze-crashed-car')
+
+    with pytest.raises(ValueError):
+        create_dead_letter_store('file')
+
+
+def due_events(store, clock, *event_ids):
+    for event_id in event_ids:
+        store.record_failure(event(event_id), ConnectionError("reset"))
+    clock.now += DEAD_LETTER_MAX_DELAY + 1
+
+
+def test_drain_resolves_successful_events(store, clock):
+    due_events(store, clock, 'e1', 'e2', 'e3')
+    handled = []
+
+    stats = RetryScheduler(store, lambda e: handled.append(e['id']), concurrency=2).drain_once()
+
+    assert stats == {'resolved': 3, PENDING: 0, PARKED: 0, 'deferred': 0}
+    assert sorted(handled) == ['e1', 'e2', 'e3']
+    assert store.list() == []
+
+
+def test_canary_transient_failure_defers_the_rest(store, clock):
+    due_events(store, clock, 'e1', 'e2', 'e3')
+    handled = []
+
+    def handler(e):
+        handled.append(e['id'])
+        raise ConnectionError("still down")
+
+    stats = RetryScheduler(store, handler).drain_once()
+
+    assert stats == {'resolved': 0, PENDING: 1, PARKED: 0, 'deferred': 2}
+    assert len(handled) == 1
+    # 돌려놓은 이벤트는 lease 없이 바로 다시 꺼낼 수 있습니다.
+    assert sorted(r['eventId'] for r in store.lease_due(10)) == sorted({'e1', 'e2', 'e3'} - set(handled))
+
+
+def test_unhealthy_service_halts_the_batch(store, clock):
+    due_events(store, clock, 'e1', 'e2', 'e3')
+    health = {'ok': True}
+    handled = []
+
+    def handler(e):
+        handled.append(e['id'])
+        health['ok'] = False
+
+    stats = RetryScheduler(store, handler, healthy=lambda: health['ok']).drain_once()
+
+    assert stats == {'resolved': 1, PENDING: 0, PARKED: 0, 'deferred': 2}
+    assert len(handled) == 1
+    assert len(store.list(PENDING)) == 2
+
+
+def test_unhealthy_service_skips_the_round(store, clock):
+    due_events(store, clock, 'e1')
+
+    stats = RetryScheduler(store, lambda e: None, healthy=lambda: False).drain_once()
+
+    assert stats == {'resolved': 0, PENDING: 0, PARKED: 0, 'deferred': 0}
+    assert len(store.lease_due(10)) == 1
+
+
+def test_permanent_failure_on_retry_is_parked(store, clock):
+    due_events(store, clock, 'e1', 'e2')
+
+    def handler(e):
+        if e['id'] == 'e2':
+            raise ValueError("bad image")
+
+    stats = RetryScheduler(store, handler).drain_once()
+
+    assert stats['resolved'] == 1
+    assert stats[PARKED] == 1
+    assert [r['eventId'] for r in store.list(PARKED)] == ['e2']
+
+
+def test_breaker_with_trial_in_flight_skips_the_round(store, clock):
+    due_events(store, clock, 'e1', 'e2')
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    handled = []
+
+    stats = RetryScheduler(store, lambda e: handled.append(e['id']), healthy=breaker.available).drain_once()
+
+    assert stats == {'resolved': 0, PENDING: 0, PARKED: 0, 'deferred': 0}
+    assert handled == []
@@ -0,0 +1,106 @@
+from fanout import chunked, fan_out, is_dead_token_error, prune_dead_tokens
+
+
+class UnregisteredError(Exception):
+    pass
+
+
+class InvalidArgumentError(Exception):
+    code = 'INVALID_ARGUMENT'
+
+
+class QuotaExceededError(Exception):
+    code = 'RESOURCE_EXHAUSTED'
+
+
+class SendResponse:
+    def __init__(self, exception=None):
+        self.exception = exception
+        self.success = exception is None
+
+
+class BatchResponse:
+    def __init__(self, responses):
+        self.responses = responses
+        self.success_count = sum(1 for r in responses if r.success)
+        self.failure_count = len(responses) - self.success_count
+
+
+class Messaging:
+    """
+    토큰별 오류(errors)를 돌려주고, chunk_errors에 있는 첫 토큰의 청크는 통째로 예외를 발생시킵니다.
+    """
+
+    def __init__(self, errors=None, chunk_errors=None):
+        self.errors = errors or {}
+        self.chunk_errors = chunk_errors or {}
+        self.sent = []
+
+    def send_each_for_multicast(self, message):
+        self.sent.append(list(message))
+        if message[0] in self.chunk_errors:
+            raise self.chunk_errors[message[0]]
+        return BatchResponse([SendResponse(self.errors.get(token)) for token in message])
+
+
+def test_chunked():
+    assert list(chunked([1, 2, 3, 4, 5], 2)) == [[1, 2], [3, 4], [5]]
+    assert list(chunked([], 2)) == []
+
+
+def test_is_dead_token_error():
+    assert is_dead_token_error(UnregisteredError("gone"))
+    assert is_dead_token_error(InvalidArgumentError("The registration token is not a valid FCM registration token"))
+    assert not is_dead_token_error(InvalidArgumentError("Message payload too large"))
+    assert not is_dead_token_error(QuotaExceededError("quota"))
+    assert not is_dead_token_error(None)
+
+
+def test_fan_out_splits_dedupes_and_collects_dead_tokens():
+    messaging = Messaging(errors={'t2': UnregisteredError("gone"), 't4': QuotaExceededError("quota")})
+
+    result = fan_out(messaging, list, ['t1', 't2', 't1', 't3', 't4', 't5'], chunk_size=2, max_workers=2)
+
+    assert sorted(messaging.sent) == [['t1', 't2'], ['t3', 't4'], ['t5']]
+    assert result.chunks == 3
+    assert result.success_count == 3
+    assert result.failure_count == 2
+    assert result.dead_tokens == ['t2']
+    assert [token for token, _ in result.failures] == ['t2', 't4']
+
+
+def test_failed_chunk_does_not_stop_the_others():
+    error = ConnectionError("reset")
+    messaging = Messaging(chunk_errors={'t3': error})
+
+    result = fan_out(messaging, list, ['t1', 't2', 't3', 't4'], chunk_size=2)
+
+    assert result.success_count == 2
+    assert result.failure_count == 2
+    assert result.failures == [('t3', error), ('t4', error)]
+    # 전송 예외는 토큰 문제로 보지 않습니다.
+    assert result.dead_tokens == []
+
+
+def test_no_tokens_sends_nothing():
+    messaging = Messaging()
+
+    result = fan_out(messaging, list, [])
+
+    assert messaging.sent == []
+    assert result.chunks == 0
+
+
+def test_prune_dead_tokens_clears_matching_users(fake_firestore):
+    fake_firestore.data['users'] = {
+        'm1': {'role': 'mechanic', 'fcmToken': 't1'},
+        'm2': {'role': 'mechanic', 'fcmToken': 't2'},
+        'm3': {'role': 'mechanic', 'fcmToken': 't3'},
+    }
+
+    assert prune_dead_tokens(fake_firestore, ['t1', 't3', 't1', 'unknown']) == 2
+
+    users = fake_firestore.data['users']
+    assert users['m1'] == {'role': 'mechanic'}
+    assert users['m2'] == {'role': 'mechanic', 'fcmToken': 't2'}
+    assert users['m3'] == {'role': 'mechanic'}
@@ -0,0 +1,79 @@
+from gcs_objects import describe_event
+
+
+def storage_data(**overrides):
+    data = {
+        'bucket': 'bucket',
+        'name': 'crashed_car_picture/uid_20240122.jpg',
+        'generation': '1700000000000000',
+        'contentType': 'image/jpeg',
+        'md5Hash': 'u+AAQ/que9Kusc4uzcTQyw==',
+        'crc32c': 'u+AAQw==',
+        'metadata': {'carModel': 'sedan'},
+    }
+    data.update(overrides)
+    return {key: value for key, value in data.items() if value is not None}
+
+
+class FakeBlob:
+    def __init__(self, generation, md5_hash=None, content_type='image/jpeg', metadata=None):
+        self.generation = generation
+        self.md5_hash = md5_hash
+        self.content_type = content_type
+        self.metadata = metadata
+
+
+class FakeClient:
+    def __init__(self, blob):
+        self.stored = blob
+        self.requests = []
+
+    def bucket(self, bucket_name):
+        client = self
+
+        class _Bucket:
+            def get_blob(self, name, generation=None):
+                client.requests.append((bucket_name, name, generation))
+                return client.stored
+
+            def blob(self, name, generation=None):
+                return FakeBlob(generation)
+
+        return _Bucket()
+
+
+def test_storage_event_without_optional_fields_needs_no_lookup():
+    descriptor = describe_event(storage_data(metadata=None, md5Hash=None))
+
+    assert descriptor.missing_fields() == []
+    assert descriptor.car_model == 'unknown'
+    assert descriptor.content_hash is None
+
+
+def test_content_hash_ignores_crc32c():
+    assert describe_event(storage_data(md5Hash=None)).content_hash is None
+    assert describe_event(storage_data()).content_hash == 'u+AAQ/que9Kusc4uzcTQyw=='
+
+
+def test_audit_event_resolves_missing_fields_once():
+    data = {'protoPayload': {'resourceName': 'projects/_/buckets/bucket/objects/crashed_car_picture/uid_20240122.jpg'}}
+    descriptor = describe_event(data)
+    client = FakeClient(FakeBlob(1700000000000001, md5_hash='abc', metadata={'carModel': 'suv'}))
+
+    descriptor.resolve(client)
+    descriptor.resolve(client)
+
+    assert client.requests == [('bucket', 'crashed_car_picture/uid_20240122.jpg', None)]
+    assert descriptor.generation == 1700000000000001
+    assert descriptor.content_hash == 'abc'
+    assert descriptor.car_model == 'suv'
+    assert descriptor.blob(client).generation == 1700000000000001
+
+
+def test_audit_event_for_object_without_metadata():
+    data = {'protoPayload': {'resourceName': 'projects/_/buckets/bucket/objects/crashed_car_picture/uid_20240122.jpg'}}
+    descriptor = describe_event(data).resolve(FakeClient(FakeBlob(1)))
+
+    assert descriptor.car_model == 'unknown'
+    assert descriptor.content_hash is None
+    assert descriptor.missing_fields() == []
@@ -0,0 +1,237 @@
+import pytest
+import requests
+
+from http_client import AIServiceClient, CircuitBreaker, CircuitOpenError, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._body = body if body is not None else {}
+        self.closed = False
+
+    def json(self):
+        return self._body
+
+    def close(self):
+        self.closed = True
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error", response=self)
+
+
+class FakeSession:
+    """
+    post() 호출마다 outcomes에서 하나씩 꺼내 응답으로 돌려주거나, 예외면 발생시킵니다.
+    """
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def post(self, url, timeout=None, **kwargs):
+        self.calls.append(kwargs)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+class FakeTokenProvider:
+    def __init__(self, error=None):
+        self.error = error
+        self.issued = 0
+        self.invalidated = 0
+
+    def get(self, audience):
+        if self.error is not None:
+            raise self.error
+        self.issued += 1
+        return f"token-{self.issued}"
+
+    def invalidate(self, audience):
+        self.invalidated += 1
+
+
+def make_client(session, breaker=None, token_provider=None, max_retries=2):
+    delays = []
+    client = AIServiceClient('http://ai.test', token_provider=token_provider, max_retries=max_retries,
+                             backoff_base=0.01, backoff_max=1.0, breaker=breaker or CircuitBreaker(),
+                             session=session, sleep=delays.append)
+    return client, delays
+
+
+def open_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_half_opens_and_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.cooling_down()
+
+    clock.now += 30
+    assert not breaker.cooling_down()
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # 시험 요청은 한 번에 하나만
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens_the_breaker():
+    clock = FakeClock()
+    breaker = open_breaker(clock)
+    clock.now += 30
+
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.cooling_down()
+
+
+def test_success_resets_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, clock=FakeClock())
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_token_failure_does_not_consume_the_trial():
+    clock = FakeClock()
+    breaker = open_breaker(clock)
+    clock.now += 30
+    client, _ = make_client(FakeSession(FakeResponse(200, {'ok': True})), breaker=breaker,
+                            token_provider=FakeTokenProvider(error=RuntimeError("metadata server down")))
+
+    with pytest.raises(RuntimeError):
+        client.predict(files=None, data={})
+
+    client.token_provider = FakeTokenProvider()
+    assert client.predict(files=None, data={}) == {'ok': True}
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_unexpected_error_during_trial_reopens_instead_of_wedging():
+    clock = FakeClock()
+    breaker = open_breaker(clock)
+    clock.now += 30
+    client, _ = make_client(FakeSession(requests.exceptions.ChunkedEncodingError("broken body")), breaker=breaker)
+
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        client.predict(files=None, data={})
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.cooling_down()
+    clock.now += 30
+    assert breaker.allow()
+
+
+def test_open_breaker_rejects_without_sending():
+    session = FakeSession()
+    client, _ = make_client(session, breaker=open_breaker(FakeClock()))
+
+    with pytest.raises(CircuitOpenError):
+        client.predict(files=None, data={})
+    assert session.calls == []
+
+
+def test_retries_503_with_retry_after():
+    session = FakeSession(FakeResponse(503, headers={'Retry-After': '0.5'}), FakeResponse(200, {'ok': True}))
+    client, delays = make_client(session)
+
+    assert client.predict(files=None, data={}) == {'ok': True}
+    assert len(session.calls) == 2
+    assert delays == [pytest.approx(0.5, abs=0.02)]
+
+
+def test_long_retry_after_fails_fast():
+    session = FakeSession(FakeResponse(429, headers={'Retry-After': '120'}))
+    client, delays = make_client(session)
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.predict(files=None, data={})
+    assert delays == []
+
+
+def test_gives_up_after_max_retries():
+    session = FakeSession(*(requests.exceptions.ConnectionError("refused") for _ in range(3)))
+    client, delays = make_client(session, breaker=CircuitBreaker(failure_threshold=10), max_retries=2)
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.predict(files=None, data={})
+    assert len(session.calls) == 3
+    assert len(delays) == 2
+
+
+def test_client_errors_are_not_retried():
+    session = FakeSession(FakeResponse(400))
+    client, delays = make_client(session)
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.predict(files=None, data={})
+    assert len(session.calls) == 1
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_401_refreshes_the_token_once():
+    provider = FakeTokenProvider()
+    session = FakeSession(FakeResponse(401), FakeResponse(200, {'ok': True}))
+    client, _ = make_client(session, token_provider=provider)
+
+    assert client.predict(files=None, data={}) == {'ok': True}
+    assert provider.invalidated == 1
+    assert [call['headers']['Authorization'] for call in session.calls] == ['Bearer token-1', 'Bearer token-2']
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('3') == 3.0
+    assert parse_retry_after('-1') == 0.0
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:10 GMT', now=1445412480) == 10.0
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+
+
+def test_available_does_not_consume_the_trial():
+    clock = FakeClock()
+    breaker = open_breaker(clock)
+
+    assert not breaker.available()
+    clock.now += 30
+    assert breaker.available()
+    assert breaker.available()
+
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # 시험 요청이 진행 중인 half-open은 cooling_down()과 달리 사용할 수 없는 것으로 봅니다.
+    assert not breaker.cooling_down()
+    assert not breaker.available()
+
+    breaker.record_success()
+    assert breaker.available()
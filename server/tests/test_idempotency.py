@@ -0,0 +1,103 @@
+import pytest
+
+from idempotency import CLAIMED, COMPLETED, IN_PROGRESS, FileLedger, InMemoryLedger, event_key
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=['memory', 'file'])
+def ledger_factory(request, tmp_path):
+    def make(clock, lease=60, ttl=3600):
+        if request.param == 'file':
+            return FileLedger(path=str(tmp_path / 'ledger'), lease=lease, ttl=ttl, clock=clock)
+        return InMemoryLedger(lease=lease, ttl=ttl, clock=clock)
+    return make
+
+
+def test_first_claim_wins_and_duplicate_sees_in_progress(ledger_factory):
+    ledger = ledger_factory(FakeClock())
+    key = event_key('e1')
+
+    assert ledger.claim(key, 'a') == CLAIMED
+    assert ledger.claim(key, 'b') == IN_PROGRESS
+
+
+def test_same_owner_can_reclaim(ledger_factory):
+    ledger = ledger_factory(FakeClock())
+    key = event_key('e1')
+
+    assert ledger.claim(key, 'a') == CLAIMED
+    assert ledger.claim(key, 'a') == CLAIMED
+
+
+def test_complete_makes_duplicates_completed_until_ttl(ledger_factory):
+    clock = FakeClock()
+    ledger = ledger_factory(clock, ttl=3600)
+    key = event_key('e1')
+
+    ledger.claim(key, 'a')
+    ledger.complete(key, 'a')
+    assert ledger.claim(key, 'b') == COMPLETED
+
+    clock.now += 3601
+    assert ledger.claim(key, 'b') == CLAIMED
+
+
+def test_release_lets_retry_claim(ledger_factory):
+    ledger = ledger_factory(FakeClock())
+    key = event_key('e1')
+
+    ledger.claim(key, 'a')
+    ledger.release(key, 'a')
+    assert ledger.claim(key, 'b') == CLAIMED
+
+
+def test_release_by_other_owner_is_ignored(ledger_factory):
+    ledger = ledger_factory(FakeClock())
+    key = event_key('e1')
+
+    ledger.claim(key, 'a')
+    ledger.release(key, 'b')
+    assert ledger.claim(key, 'b') == IN_PROGRESS
+
+
+def test_release_does_not_undo_completion(ledger_factory):
+    ledger = ledger_factory(FakeClock())
+    key = event_key('e1')
+
+    ledger.claim(key, 'a')
+    ledger.complete(key, 'a')
+    ledger.release(key, 'a')
+    assert ledger.claim(key, 'b') == COMPLETED
+
+
+def test_expired_lease_is_taken_over(ledger_factory):
+    clock = FakeClock()
+    ledger = ledger_factory(clock, lease=60)
+    key = event_key('e1')
+
+    ledger.claim(key, 'a')
+    clock.now += 59
+    assert ledger.claim(key, 'b') == IN_PROGRESS
+    clock.now += 2
+    assert ledger.claim(key, 'b') == CLAIMED
+    # 새 소유자가 가져간 뒤에는 원래 소유자도 중복으로 봅니다.
+    assert ledger.claim(key, 'a') == IN_PROGRESS
+
+
+def test_file_ledger_is_shared_between_instances(tmp_path):
+    clock = FakeClock()
+    first = FileLedger(path=str(tmp_path), lease=60, clock=clock)
+    second = FileLedger(path=str(tmp_path), lease=60, clock=clock)
+    key = event_key('e1')
+
+    assert first.claim(key, 'a') == CLAIMED
+    assert second.claim(key, 'b') == IN_PROGRESS
+    first.complete(key, 'a')
+    assert second.claim(key, 'b') == COMPLETED
@@ -0,0 +1,85 @@
+from io import BytesIO
+
+from PIL import Image
+
+from imaging import normalize_image, sniff_image_type
+
+
+def encode(img, fmt, **kwargs):
+    out = BytesIO()
+    img.save(out, fmt, **kwargs)
+    return out.getvalue()
+
+
+def noisy(size):
+    # 압축이 잘 안 되는 이미지여야 재인코딩 결과가 원본보다 작아지는지 확인할 수 있습니다.
+    return Image.effect_noise(size, 64).convert('RGB')
+
+
+def test_sniff_image_type():
+    assert sniff_image_type(encode(Image.new('RGB', (4, 4)), 'JPEG')[:32]) == 'image/jpeg'
+    assert sniff_image_type(encode(Image.new('RGB', (4, 4)), 'PNG')[:32]) == 'image/png'
+    assert sniff_image_type(b'RIFF\x00\x00\x00\x00WEBPVP8 ') == 'image/webp'
+    assert sniff_image_type(b'\x00\x00\x00\x18ftypheic') == 'image/heic'
+    assert sniff_image_type(b'not an image') is None
+
+
+def test_small_jpeg_is_passed_through():
+    raw = encode(noisy((64, 48)), 'JPEG', quality=80)
+
+    result = normalize_image(raw, max_side=128, target_bytes=0)
+
+    assert not result.changed
+    assert result.data is raw
+    assert result.size == (64, 48)
+
+
+def test_large_jpeg_is_downscaled():
+    raw = encode(noisy((800, 600)), 'JPEG', quality=95)
+
+    result = normalize_image(raw, max_side=200, quality=80, target_bytes=0)
+
+    assert result.changed
+    assert result.mime_type == 'image/jpeg'
+    assert max(result.size) == 200
+    assert result.original_size == (800, 600)
+    assert Image.open(BytesIO(result.data)).size == result.size
+
+
+def test_exif_orientation_is_applied():
+    exif = Image.Exif()
+    exif[0x0112] = 6  # 시계 방향 90도 회전
+    raw = encode(noisy((80, 40)), 'JPEG', quality=80, exif=exif.tobytes())
+
+    result = normalize_image(raw, max_side=128, target_bytes=0)
+
+    assert result.changed
+    assert result.size == (40, 80)
+
+
+def test_png_with_alpha_is_flattened_to_jpeg():
+    img = Image.new('RGBA', (32, 32), (255, 0, 0, 0))
+    raw = encode(img, 'PNG')
+
+    result = normalize_image(raw, max_side=128, target_bytes=0)
+
+    assert result.mime_type == 'image/jpeg'
+    assert Image.open(BytesIO(result.data)).getpixel((0, 0)) >= (250, 250, 250)
+
+
+def test_target_bytes_lowers_quality():
+    raw = encode(noisy((400, 300)), 'JPEG', quality=95)
+    loose = normalize_image(raw, max_side=400, quality=95, target_bytes=len(raw) - 1, min_quality=90)
+    tight = normalize_image(raw, max_side=400, quality=95, target_bytes=1, min_quality=40)
+
+    assert len(tight.data) < len(loose.data)
+
+
+def test_undecodable_image_is_sent_as_is():
+    raw = b'\xff\xd8\xff' + b'\x00' * 64
+
+    result = normalize_image(raw, max_side=128, target_bytes=0)
+
+    assert not result.changed
+    assert result.data is raw
+    assert result.size is None
@@ -0,0 +1,106 @@
+from prediction_cache import LRUTier, PredictionCache, SQLiteTier, cache_key
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class BrokenTier:
+    def get(self, key):
+        raise RuntimeError("shared cache down")
+
+    def set(self, key, value):
+        raise RuntimeError("shared cache down")
+
+
+def test_cache_key_is_scoped_to_the_user():
+    key = cache_key('md5==', 'sedan', 'uid1', namespace='v1')
+
+    assert key == 'v1:uid1:md5==:sedan'
+    assert cache_key('md5==', 'sedan', 'uid2', namespace='v1') != key
+    assert cache_key('md5==', 'suv', 'uid1', namespace='v1') != key
+    assert cache_key('md5==', 'sedan', 'uid1', namespace='v2') != key
+
+
+def test_cache_key_bypasses_without_hash_or_user():
+    assert cache_key(None, 'sedan', 'uid1') is None
+    assert cache_key('md5==', 'sedan', None) is None
+
+
+def test_lru_tier_expires_and_evicts_least_recently_used():
+    clock = FakeClock()
+    tier = LRUTier(max_entries=2, ttl=60, clock=clock)
+
+    tier.set('a', 1)
+    tier.set('b', 2)
+    assert tier.get('a') == 1
+    tier.set('c', 3)
+
+    assert tier.get('b') is None
+    assert tier.get('a') == 1
+    clock.now += 60
+    assert tier.get('a') is None
+
+
+def test_sqlite_tier_round_trips_and_expires(tmp_path):
+    clock = FakeClock()
+    tier = SQLiteTier(path=str(tmp_path / 'cache.sqlite3'), ttl=60, max_entries=2, clock=clock)
+
+    tier.set('a', {'damage_type': 'scratch'})
+    assert tier.get('a') == {'damage_type': 'scratch'}
+
+    clock.now += 1
+    tier.set('b', {'n': 2})
+    clock.now += 1
+    tier.set('c', {'n': 3})
+    assert tier.get('a') is None
+
+    clock.now += 60
+    assert tier.get('c') is None
+
+
+def test_shared_hits_are_promoted_to_the_local_tier(tmp_path):
+    clock = FakeClock()
+    shared = SQLiteTier(path=str(tmp_path / 'cache.sqlite3'), ttl=60, clock=clock)
+    shared.set('k', {'damage_type': 'dent'})
+    cache = PredictionCache(local=LRUTier(ttl=60, clock=clock), shared=shared)
+
+    assert cache.get('k') == {'damage_type': 'dent'}
+    assert cache.get('k') == {'damage_type': 'dent'}
+    assert cache.get('other') is None
+    assert cache.snapshot() == {'local_hits': 1, 'shared_hits': 1, 'misses': 1, 'sets': 0, 'errors': 0}
+
+
+def test_cached_values_are_copies():
+    cache = PredictionCache()
+    result = {'damage_type': 'scratch'}
+    cache.set('k', result)
+
+    result['imageUrl'] = 'https://example.test/a.jpg'
+    hit = cache.get('k')
+    hit['imageUrl'] = 'https://example.test/b.jpg'
+
+    assert cache.get('k') == {'damage_type': 'scratch'}
+
+
+def test_none_key_is_never_cached():
+    cache = PredictionCache()
+
+    cache.set(None, {'damage_type': 'scratch'})
+
+    assert cache.get(None) is None
+    assert cache.snapshot()['sets'] == 0
+
+
+def test_shared_tier_errors_fall_back_to_a_miss():
+    cache = PredictionCache(shared=BrokenTier())
+
+    assert cache.get('k') is None
+    cache.set('k', {'damage_type': 'scratch'})
+
+    assert cache.get('k') == {'damage_type': 'scratch'}
+    assert cache.snapshot()['errors'] == 2
@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+
+from results_sink import BulkSink, DirectSink, InMemoryWriter, result_doc_id
+
+
+class GatedWriter(InMemoryWriter):
+    """
+    gate가 열릴 때까지 커밋을 붙잡아 두는 저장소 대역.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+        self.started = threading.Semaphore(0)
+        self.batches = []
+
+    def commit(self, writes):
+        self.started.release()
+        self.gate.wait(5)
+        self.batches.append([doc_id for doc_id, _ in writes])
+        super().commit(writes)
+
+
+class FailingWriter:
+    def commit(self, writes):
+        raise RuntimeError("commit failed")
+
+
+def test_result_doc_id_has_no_slashes():
+    assert result_doc_id('bucket', 'uploads/u1/car.jpg', 7) == 'bucket_uploads_u1_car.jpg_7'
+
+
+def test_bulk_sink_batches_concurrent_writes():
+    writer = InMemoryWriter()
+    sink = BulkSink(writer, max_size=10, max_wait_ms=50)
+
+    futures = [sink.submit(f"doc{i}", {'i': i}) for i in range(5)]
+    for future in futures:
+        future.result(5)
+
+    assert writer.commits == 1
+    assert sink.stats['writes'] == 5
+    assert writer.documents['doc3'] == {'i': 3}
+
+
+def test_bulk_sink_merges_duplicate_documents_in_a_batch():
+    writer = InMemoryWriter()
+    sink = BulkSink(writer, max_size=10, max_wait_ms=50)
+
+    futures = [sink.submit('doc', {'step': 1}), sink.submit('doc', {'step': 2})]
+    for future in futures:
+        future.result(5)
+
+    assert writer.documents == {'doc': {'step': 2}}
+
+
+def test_failed_commit_fails_every_write_in_the_batch():
+    sink = BulkSink(FailingWriter(), max_size=10, max_wait_ms=50)
+
+    futures = [sink.submit(f"doc{i}", {}) for i in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(5)
+    assert sink.stats['errors'] == 1
+
+
+def test_submit_blocks_then_rejects_when_commits_are_saturated():
+    writer = GatedWriter()
+    sink = BulkSink(writer, max_size=1, max_wait_ms=0, max_pending=2, max_in_flight=1)
+
+    first = sink.submit('doc0', {})
+    assert writer.started.acquire(timeout=5)
+    # 커밋 자리가 없으므로 다음 쓰기들은 대기열에 남고, 대기열이 차면 submit이 막힙니다.
+    queued = [sink.submit('doc1', {}), sink.submit('doc2', {})]
+
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        sink.submit('doc3', {}, timeout=0.1)
+    assert time.monotonic() - started >= 0.1
+
+    writer.gate.set()
+    for future in [first] + queued:
+        future.result(5)
+    assert writer.batches == [['doc0'], ['doc1'], ['doc2']]
+
+
+def test_write_times_out_when_commit_is_slow():
+    writer = GatedWriter()
+    sink = BulkSink(writer, max_size=1, max_wait_ms=0)
+
+    with pytest.raises(TimeoutError):
+        sink.write('doc', {}, timeout=0.1)
+    writer.gate.set()
+
+
+def test_direct_sink_commits_each_write():
+    writer = InMemoryWriter()
+    sink = DirectSink(writer)
+
+    sink.write('a', {'x': 1})
+    sink.write('b', {'x': 2})
+
+    assert writer.commits == 2
+    assert sink.stats == {'batches': 2, 'writes': 2, 'errors': 0}
@@ -0,0 +1,140 @@
+from token_index import (
+    MECHANIC_TOKENS_COLLECTION, SHOP_TOKENS_FIELD, SHOP_TOKENS_VERSION_FIELD, MechanicTokenIndex, TokenCache,
+    mechanic_entry,
+)
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def user_fields(shop_id, token, role='mechanic'):
+    # Firestore 이벤트(JSON) 형식
+    return {'role': {'stringValue': role}, 'serviceCenterId': {'stringValue': shop_id},
+            'fcmToken': {'stringValue': token}}
+
+
+def add_mechanic(db, uid, shop_id, token):
+    db.data.setdefault('users', {})[uid] = {'role': 'mechanic', 'serviceCenterId': shop_id, 'fcmToken': token}
+
+
+def token_doc(db, shop_id):
+    return db.data.get(MECHANIC_TOKENS_COLLECTION, {}).get(shop_id)
+
+
+def test_token_cache_expires_and_invalidates():
+    clock = FakeClock()
+    cache = TokenCache(ttl=60, clock=clock)
+
+    assert cache.get('shop') is None
+    cache.set('shop', ['t1'])
+    assert cache.get('shop') == ['t1']
+
+    cache.invalidate('shop')
+    assert cache.get('shop') is None
+
+    cache.set('shop', ['t1'])
+    clock.now += 60
+    assert cache.get('shop') is None
+    assert cache.stats == {'hits': 1, 'misses': 3, 'invalidations': 1}
+
+
+def test_token_cache_evicts_the_entry_expiring_first():
+    clock = FakeClock()
+    cache = TokenCache(ttl=60, max_entries=2, clock=clock)
+
+    cache.set('a', ['ta'])
+    clock.now += 1
+    cache.set('b', ['tb'])
+    cache.set('c', ['tc'])
+
+    assert cache.get('a') is None
+    assert cache.get('b') == ['tb']
+    assert cache.get('c') == ['tc']
+
+
+def test_mechanic_entry():
+    assert mechanic_entry(user_fields('shop', 't1')) == ('shop', 't1')
+    assert mechanic_entry(user_fields('shop', 't1', role='consumer')) is None
+    assert mechanic_entry({'role': {'stringValue': 'mechanic'}}) is None
+    assert mechanic_entry(None) is None
+
+
+def test_query_mode_reads_users_and_caches(fake_firestore):
+    add_mechanic(fake_firestore, 'm1', 'shop', 't1')
+    add_mechanic(fake_firestore, 'm2', 'shop', 't2')
+    add_mechanic(fake_firestore, 'm3', 'other', 't3')
+    index = MechanicTokenIndex(fake_firestore, mode='query', cache=TokenCache(ttl=60))
+
+    assert index.tokens('shop') == ['t1', 't2']
+    assert index.tokens('shop') == ['t1', 't2']
+    assert fake_firestore.stats['queries'] == 1
+
+    index.remove_tokens('shop', ['t1'])
+    # query 모드는 토큰 목록 문서를 만들지 않습니다.
+    assert token_doc(fake_firestore, 'shop') is None
+    assert fake_firestore.stats['queries'] == 1
+    index.tokens('shop')
+    assert fake_firestore.stats['queries'] == 2
+
+
+def test_denormalized_mode_backfills_once_into_the_token_collection(fake_firestore):
+    fake_firestore.data['service_centers'] = {'shop': {'name': 'shop'}}
+    add_mechanic(fake_firestore, 'm1', 'shop', 't1')
+    index = MechanicTokenIndex(fake_firestore, mode='denormalized', cache=TokenCache(ttl=0))
+
+    assert index.tokens('shop') == ['t1']
+    assert index.tokens('shop') == ['t1']
+
+    assert fake_firestore.stats['queries'] == 1
+    assert token_doc(fake_firestore, 'shop') == {SHOP_TOKENS_FIELD: ['t1']}
+    # 토큰은 앱이 읽는 정비소 문서에 남기지 않습니다.
+    assert fake_firestore.data['service_centers']['shop'] == {'name': 'shop'}
+
+
+def test_user_changes_update_a_backfilled_list(fake_firestore):
+    add_mechanic(fake_firestore, 'm1', 'shop', 't1')
+    index = MechanicTokenIndex(fake_firestore, mode='denormalized', cache=TokenCache(ttl=60))
+    assert index.tokens('shop') == ['t1']
+
+    assert index.on_user_change(None, user_fields('shop', 't2')) == ['shop']
+    assert index.tokens('shop') == ['t1', 't2']
+
+    # 토큰 갱신: 이전 토큰을 빼고 새 토큰을 넣습니다.
+    assert index.on_user_change(user_fields('shop', 't1'), user_fields('shop', 't1b')) == ['shop']
+    assert index.tokens('shop') == ['t2', 't1b']
+
+    # 다른 정비소로 이동
+    assert index.on_user_change(user_fields('shop', 't2'), user_fields('other', 't2')) == ['shop', 'other']
+    assert index.tokens('shop') == ['t1b']
+
+    assert index.on_user_change(user_fields('shop', 't1b'), user_fields('shop', 't1b')) == []
+
+
+def test_user_change_before_backfill_only_bumps_the_version(fake_firestore):
+    index = MechanicTokenIndex(fake_firestore, mode='denormalized', cache=TokenCache(ttl=60))
+    add_mechanic(fake_firestore, 'm1', 'shop', 't1')
+    add_mechanic(fake_firestore, 'm2', 'shop', 't2')
+
+    index.on_user_change(None, user_fields('shop', 't2'))
+
+    # 일부 토큰만 담긴 목록을 만들지 않고, 다음 조회 때 쿼리로 전체 목록을 채웁니다.
+    assert token_doc(fake_firestore, 'shop') == {SHOP_TOKENS_VERSION_FIELD: 1}
+    assert index.tokens('shop') == ['t1', 't2']
+    assert token_doc(fake_firestore, 'shop')[SHOP_TOKENS_FIELD] == ['t1', 't2']
+
+
+def test_remove_tokens_prunes_the_denormalized_list(fake_firestore):
+    add_mechanic(fake_firestore, 'm1', 'shop', 't1')
+    add_mechanic(fake_firestore, 'm2', 'shop', 't2')
+    index = MechanicTokenIndex(fake_firestore, mode='denormalized', cache=TokenCache(ttl=60))
+    assert index.tokens('shop') == ['t1', 't2']
+
+    index.remove_tokens('shop', ['t1'])
+
+    assert token_doc(fake_firestore, 'shop') == {SHOP_TOKENS_FIELD: ['t2']}
+    assert index.tokens('shop') == ['t2']
@@ -0,0 +1,213 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+# 단계별 지연 히스토그램을 프로세스 안에 모을지 여부 (벤치마크/로컬 분석용)
+TRACE_HISTOGRAM = os.environ.get("TRACE_HISTOGRAM", "0") == "1"
+# 단계별로 보관하는 최근 샘플 수
+TRACE_HISTOGRAM_SAMPLES = int(os.environ.get("TRACE_HISTOGRAM_SAMPLES", 10000))
+
+_current = contextvars.ContextVar('analysis_trace', default=None)
+
+
+def _percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+class LatencyHistogram:
+    """
+    단계 이름별 지연(ms) 샘플을 모아 p50/p95/p99를 계산합니다.
+    단계마다 최근 max_samples개만 유지하므로 오래 떠 있는 인스턴스에서도 메모리가 늘지 않습니다.
+    """
+
+    def __init__(self, max_samples=None):
+        self.max_samples = max_samples or TRACE_HISTOGRAM_SAMPLES
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, value_ms):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.max_samples)
+            samples.append(value_ms)
+
+    def snapshot(self):
+        """
+        {단계: {'count', 'p50', 'p95', 'p99', 'max'}} 형식으로 반환합니다.
+        """
+        with self._lock:
+            items = {name: sorted(samples) for name, samples in self._samples.items()}
+        return {
+            name: {
+                'count': len(ordered),
+                'p50': _percentile(ordered, 50),
+                'p95': _percentile(ordered, 95),
+                'p99': _percentile(ordered, 99),
+                'max': ordered[-1],
+            }
+            for name, ordered in items.items() if ordered
+        }
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    def dump(self, file=None):
+        """
+        벤치마크 하네스에서 사람이 읽을 수 있는 표로 출력합니다.
+        """
+        file = file or sys.stdout
+        print(f"{'stage':<32} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}", file=file)
+        for name, stats in sorted(self.snapshot().items()):
+            print(f"{name:<32} {stats['count']:>7} {stats['p50']:>9.1f} {stats['p95']:>9.1f} "
+                  f"{stats['p99']:>9.1f} {stats['max']:>9.1f}", file=file)
+
+
+histogram = LatencyHistogram() if TRACE_HISTOGRAM else None
+
+
+def enable_histogram(max_samples=None):
+    """
+    히스토그램 수집을 켜고 집계 객체를 반환합니다. 이미 켜져 있으면 기존 객체를 그대로 씁니다.
+    """
+    global histogram
+    if histogram is None:
+        histogram = LatencyHistogram(max_samples)
+    return histogram
+
+
+class Trace:
+    """
+    이벤트 하나의 처리 기록. 단계별 소요 시간, 카운터(바이트 수, 재시도 횟수 등),
+    그 밖의 필드(캐시 결과 등)를 모아 처리가 끝나면 JSON 로그 한 줄로 내보냅니다.
+    """
+
+    def __init__(self, name, clock=time.perf_counter, **fields):
+        self.name = name
+        self.fields = dict(fields)
+        self.stages = {}
+        self.counters = {}
+        self.outcome = 'ok'
+        self._clock = clock
+        self._started = clock()
+
+    @contextmanager
+    def stage(self, name):
+        started = self._clock()
+        try:
+            yield self
+        finally:
+            # 같은 단계가 여러 번 실행되면(재시도 등) 시간을 누적합니다.
+            self.stages[name] = self.stages.get(name, 0.0) + (self._clock() - started) * 1000
+
+    def add(self, key, amount=1):
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def skip(self, reason):
+        self.outcome = 'skipped'
+        self.fields['reason'] = reason
+
+    def record(self):
+        total_ms = (self._clock() - self._started) * 1000
+        record = {
+            # Cloud Logging은 stdout의 JSON 한 줄을 jsonPayload로, severity/message를 로그 필드로 해석합니다.
+            'severity': 'ERROR' if self.outcome == 'error' else 'INFO',
+            'message': f"{self.name} {self.outcome} in {total_ms:.1f}ms",
+            'pipeline': self.name,
+            'outcome': self.outcome,
+            'total_ms': round(total_ms, 2),
+            'stages_ms': {name: round(ms, 2) for name, ms in self.stages.items()},
+        }
+        record.update(self.counters)
+        record.update(self.fields)
+        return record
+
+    def emit(self):
+        record = self.record()
+        print(json.dumps(record, ensure_ascii=False, default=str), flush=True)
+        if histogram is not None:
+            histogram.record(f"{self.name}.total", record['total_ms'])
+            for name, ms in self.stages.items():
+                histogram.record(f"{self.name}.{name}", ms)
+        return record
+
+
+def current_trace():
+    return _current.get()
+
+
+def stage(name):
+    """
+    현재 trace에 단계를 기록하는 컨텍스트 매니저. trace가 없으면 아무것도 하지 않습니다.
+    """
+    trace = _current.get()
+    return trace.stage(name) if trace is not None else nullcontext()
+
+
+def add(key, amount=1):
+    trace = _current.get()
+    if trace is not None:
+        trace.add(key, amount)
+
+
+def set_fields(**fields):
+    trace = _current.get()
+    if trace is not None:
+        trace.set(**fields)
+
+
+def skip(reason):
+    trace = _current.get()
+    if trace is not None:
+        trace.skip(reason)
+
+
+def traced(name):
+    """
+    함수 호출 하나를 trace로 감싸 끝날 때 JSON 로그 한 줄을 남깁니다.
+    예외가 나면 outcome='error'로 기록한 뒤 그대로 다시 발생시킵니다.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            # asyncio 태스크마다 컨텍스트가 복사되므로 동시에 처리 중인 이벤트의 trace가 섞이지 않습니다.
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                trace = Trace(name)
+                token = _current.set(trace)
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    trace.outcome = 'error'
+                    trace.set(error=f"{type(e).__name__}: {e}")
+                    raise
+                finally:
+                    _current.reset(token)
+                    trace.emit()
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = Trace(name)
+            token = _current.set(trace)
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                trace.outcome = 'error'
+                trace.set(error=f"{type(e).__name__}: {e}")
+                raise
+            finally:
+                _current.reset(token)
+                trace.emit()
+        return wrapper
+    return decorator
@@ -0,0 +1,77 @@
+import os
+import uuid
+
+from imaging import sniff_image_type
+
+# GCS ranged read 및 HTTP 청크 크기 (기본 256KB)
+STREAM_CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_SIZE", 256 * 1024))
+
+
+class StreamingUpload:
+    """
+    multipart/form-data 본문을 청크 단위로 생성합니다.
+
+    opener는 호출할 때마다 새 file-like 객체(예: blob.open('rb'))를 반환해야 합니다.
+    mime_type이 None이면 첫 청크의 시그니처로 형식을 판별합니다.
+    재시도 시 처음부터 다시 읽을 수 있도록 본문 생성 때마다 opener를 호출합니다.
+    한 번에 메모리에 올라가는 이미지 데이터는 chunk_size 하나뿐입니다.
+    """
+
+    def __init__(self, fields, filename, mime_type, opener, field_name='file', chunk_size=None):
+        self.fields = fields
+        self.filename = filename
+        self.mime_type = mime_type
+        self.opener = opener
+        self.field_name = field_name
+        self.chunk_size = chunk_size or STREAM_CHUNK_SIZE
+        self.boundary = uuid.uuid4().hex
+        self.bytes_sent = 0
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def _preamble(self, mime_type):
+        parts = []
+        for name, value in self.fields.items():
+            parts.append(
+                f"--{self.boundary}\r\n"
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f"{value}\r\n"
+            )
+        parts.append(
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{self.field_name}"; filename="{self.filename}"\r\n'
+            f"Content-Type: {mime_type}\r\n\r\n"
+        )
+        return "".join(parts).encode('utf-8')
+
+    def body(self):
+        """
+        요청 본문 제너레이터. requests에 data로 넘기면 chunked 전송이 됩니다.
+        """
+        self.bytes_sent = 0
+        with self.opener() as stream:
+            # 시그니처 판별을 위해 첫 청크는 최소 32바이트를 읽습니다.
+            chunk = stream.read(max(self.chunk_size, 32))
+            mime_type = self.mime_type or sniff_image_type(chunk[:32]) or 'application/octet-stream'
+            yield self._preamble(mime_type)
+            while chunk:
+                self.bytes_sent += len(chunk)
+                yield chunk
+                chunk = stream.read(self.chunk_size)
+        yield f"\r\n--{self.boundary}--\r\n".encode('utf-8')
+
+
+def blob_upload(blob, fields, filename, mime_type=None, chunk_size=None):
+    """
+    GCS Blob을 ranged read로 읽어 바로 multipart 본문으로 흘려보내는 StreamingUpload를 만듭니다.
+    """
+    chunk_size = chunk_size or STREAM_CHUNK_SIZE
+    return StreamingUpload(
+        fields,
+        filename,
+        mime_type,
+        opener=lambda: blob.open('rb', chunk_size=chunk_size),
+        chunk_size=chunk_size,
+    )